@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Batch Generation
+
+Generates a flyer for every FlyerProject in a JSONL manifest with a
+bounded pool of workers, compositing QR codes where a project enables
+them. The manifest is streamed and each finished item is appended to a
+JSONL results file straight away, so memory stays flat however long the
+manifest is.
+
+Manifest lines are either {"id": "...", "project": {...}} or a bare
+project dict (models.project_to_dict format); without an id the line
+number is used. Blank lines and lines starting with # are skipped.
+
+Progress is checkpointed in a SQLite job store (job_store.py): re-running
+the same manifest skips items that are done or still in flight and
+retries failed ones up to --max-attempts.
+
+Usage:
+    python batch.py manifest.jsonl                        # OpenAI, 4 workers
+    python batch.py manifest.jsonl --openrouter --workers 8
+    python batch.py manifest.jsonl --mock --output results.jsonl
+    python batch.py manifest.jsonl --state run1.db --max-attempts 5
+"""
+import argparse
+import json
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator, Tuple
+
+import qr_service
+from models import FlyerProject, project_from_dict
+from prompt_builder import FlyerPromptBuilder
+from image_generator import create_generator
+from generation_cache import GenerationCache, DEFAULT_CACHE_DIR
+from cancellation import CancellationToken
+from job_store import (
+    JobStore, JobClaim, job_id, DEFAULT_MAX_ATTEMPTS, DEFAULT_LEASE_SECONDS, DONE, IN_FLIGHT,
+    OUT_OF_ATTEMPTS
+)
+
+
+# Defaults
+DEFAULT_WORKERS = 4
+DEFAULT_OUTPUT = "batch_results.jsonl"
+DEFAULT_OUTPUT_DIR = "batch_output"
+DEFAULT_PROGRESS_EVERY = 10
+DEFAULT_STATE_PATH = "batch_state.db"
+
+
+@dataclass
+class BatchItem:
+    """One manifest line: a project to generate, or why the line was unusable"""
+    item_id: str
+    line_number: int
+    project: Optional[FlyerProject] = None
+    error: Optional[str] = None
+
+
+# How BatchStats.summary describes each skip reason
+SKIP_LABELS = {
+    DONE: "already done",
+    IN_FLIGHT: "in flight or duplicate line",
+    OUT_OF_ATTEMPTS: "out of attempts",
+}
+
+
+@dataclass
+class BatchStats:
+    """Running totals for a batch"""
+    started_at: float
+    succeeded: int = 0
+    failed: int = 0
+    images: int = 0
+    skipped: int = 0     # already done / in flight elsewhere / out of attempts
+    # Skip reason (job_store DONE / IN_FLIGHT / OUT_OF_ATTEMPTS) -> count
+    skipped_by_reason: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def completed(self) -> int:
+        return self.succeeded + self.failed
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def throughput_per_minute(self) -> float:
+        """Finished items (succeeded or failed) per minute so far"""
+        elapsed = self.elapsed_seconds
+        return 60.0 * self.completed / elapsed if elapsed > 0 else 0.0
+
+    def record(self, record: Dict[str, Any]):
+        if record["success"]:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.images += len(record["image_paths"])
+
+    def skip(self, reason: str):
+        self.skipped += 1
+        self.skipped_by_reason[reason] = self.skipped_by_reason.get(reason, 0) + 1
+
+    def summary(self) -> str:
+        skipped = ""
+        if self.skipped:
+            reasons = ", ".join(
+                f"{count} {SKIP_LABELS.get(reason, reason)}"
+                for reason, count in sorted(self.skipped_by_reason.items())
+            )
+            skipped = f", {self.skipped} skipped ({reasons})"
+        return (
+            f"{self.completed} item(s): {self.succeeded} succeeded, {self.failed} failed{skipped}, "
+            f"{self.images} image(s) in {self.elapsed_seconds:.1f}s "
+            f"({self.throughput_per_minute():.1f} items/min)"
+        )
+
+
+def read_manifest(path: str) -> Iterator[BatchItem]:
+    """
+    Stream BatchItems from a JSONL manifest, one line at a time.
+
+    Lines that don't parse are yielded as items with error set, so they
+    show up in the results instead of aborting the batch.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item_id = str(line_number)
+            try:
+                data = json.loads(line)
+                if isinstance(data, dict) and "project" in data:
+                    item_id = str(data.get("id") or item_id)
+                    data = data["project"]
+                yield BatchItem(item_id, line_number, project=project_from_dict(data))
+            except ValueError as e:   # includes json.JSONDecodeError
+                yield BatchItem(item_id, line_number, error=f"Invalid manifest line: {e}")
+
+
+def _output_name(item_id: str) -> str:
+    """Filesystem-safe file stem for an item id"""
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", item_id).strip("._") or "item"
+
+
+def process_item(
+    generator,
+    item: BatchItem,
+    output_dir: Path,
+    apply_qr: bool = True,
+    cancel_token: Optional[CancellationToken] = None
+) -> Dict[str, Any]:
+    """
+    Build the prompt, generate, move the images into output_dir and
+    composite the project's QR code onto them. A QR compositing failure is
+    recorded in qr_error but does not fail the item.
+
+    Args:
+        generator: Generator to render with
+        item: Manifest item
+        output_dir: Where the finished flyers go (<id>.png, <id>_2.png, ...)
+        apply_qr: Composite QR codes for projects with qr_settings enabled
+        cancel_token: Optional cancellation token / deadline for this item
+
+    Returns:
+        The JSON-compatible result record for the item
+    """
+    started = time.monotonic()
+    record: Dict[str, Any] = {
+        "id": item.item_id,
+        "line": item.line_number,
+        "success": False,
+        "image_paths": [],
+        "model": None,
+        "qr_url": None,
+        "qr_error": None,
+        "error": item.error,
+    }
+    if item.project is None:
+        record["elapsed_seconds"] = 0.0
+        return record
+
+    project = item.project
+    package = FlyerPromptBuilder(project).build()
+
+    input_images = [
+        path for path in (project.logo_path, project.user_photo_path)
+        if path and Path(path).exists()
+    ]
+    qr_url = None
+    if apply_qr and project.qr_settings and project.qr_settings.enabled and project.qr_settings.url:
+        qr_url = project.qr_settings.url
+
+    results = generator.generate(
+        prompt=package["main_prompt"],
+        negative_prompt=package["negative_prompt"],
+        model=package["model"],
+        aspect_ratio=package["aspect_ratio"],
+        quality=package["quality"],
+        input_images=input_images or None,
+        cancel_token=cancel_token
+    )
+
+    errors = []
+    qr_errors = []
+    stem = _output_name(item.item_id)
+    for i, result in enumerate(results):
+        record["model"] = record["model"] or result.model_used or None
+        if result.metadata.get("cancelled"):
+            record["cancelled"] = True
+        source = result.wait_until_saved() if result.success else None
+        if not source:
+            errors.append(result.error_message or "Image was not saved")
+            continue
+
+        suffix = "" if i == 0 else f"_{i + 1}"
+        dest = output_dir / f"{stem}{suffix}{Path(source).suffix}"
+        shutil.move(source, dest)
+        if qr_url:
+            try:
+                qr_service.composite_qr_onto_flyer(dest, qr_url)
+            except Exception as e:
+                # The flyer itself is fine; failing the item would pay for a new generation
+                print(f"⚠️  Warning: QR compositing failed for {dest}: {e}")
+                qr_errors.append(f"{dest}: {e}")
+        record["image_paths"].append(str(dest))
+
+    record["qr_url"] = qr_url
+    record["qr_error"] = "; ".join(qr_errors) or None
+    record["success"] = bool(record["image_paths"]) and not errors
+    record["error"] = "; ".join(errors) or None
+    record["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def run_batch(
+    generator,
+    manifest_path: str,
+    output_path: str = DEFAULT_OUTPUT,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    workers: int = DEFAULT_WORKERS,
+    apply_qr: bool = True,
+    item_timeout: Optional[float] = None,
+    progress_every: int = DEFAULT_PROGRESS_EVERY,
+    cancel_token: Optional[CancellationToken] = None,
+    job_store: Optional[JobStore] = None
+) -> BatchStats:
+    """
+    Generate every item in a manifest.
+
+    At most workers items are in flight; the next manifest line is read
+    only when one finishes and its record has been appended to
+    output_path, so memory doesn't grow with the manifest.
+
+    Args:
+        generator: Generator shared by all workers
+        manifest_path: JSONL manifest of projects
+        output_path: JSONL results file (appended to, never truncated)
+        output_dir: Directory for the finished flyers
+        workers: Items generated concurrently
+        apply_qr: Composite QR codes for projects that enable them
+        item_timeout: Per-item deadline in seconds (None = no limit)
+        progress_every: Print throughput every this many items (0 = never)
+        cancel_token: Cancels the whole batch (in-flight items stop early)
+        job_store: Checkpoints each item; items it won't hand out (done,
+            leased by another run or a duplicate line, out of attempts)
+            are skipped and counted by reason in the stats. Item
+            deadlines are capped at its lease so a live run never outlasts one.
+
+    Returns:
+        Final BatchStats
+    """
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers)
+    batch_token = cancel_token or CancellationToken()
+    stats = BatchStats(started_at=time.monotonic())
+    if job_store is not None:
+        lease = job_store.lease_seconds
+        if item_timeout is not None and item_timeout > lease:
+            print(f"⚠️  Warning: item timeout {item_timeout:.0f}s exceeds the {lease:.0f}s lease; using {lease:.0f}s")
+        item_timeout = min(item_timeout or lease, lease)
+    options = {"provider": getattr(generator, "provider", None), "apply_qr": apply_qr}
+
+    def claimed(items: Iterator[BatchItem]) -> Iterator[Tuple[BatchItem, Optional[JobClaim]]]:
+        for item in items:
+            claim = None
+            if job_store is not None and item.project is not None:
+                claim, reason = job_store.try_claim(job_id(item.project, **options), item.item_id)
+                if claim is None:
+                    stats.skip(reason)
+                    continue
+            yield item, claim
+
+    def work(item: BatchItem, claim: Optional[JobClaim]) -> Dict[str, Any]:
+        token = CancellationToken(timeout_seconds=item_timeout, parent=batch_token)
+        try:
+            record = process_item(generator, item, out_dir, apply_qr, token)
+        except Exception as e:
+            record = {
+                "id": item.item_id, "line": item.line_number, "success": False,
+                "image_paths": [], "model": None, "qr_url": None, "qr_error": None,
+                "error": f"{type(e).__name__}: {e}",
+            }
+        if claim is not None:
+            # Checkpoint from the worker, so it holds even if the main thread dies
+            record["job_id"], record["attempt"] = claim.job_id, claim.attempt
+            if record["success"]:
+                job_store.complete(claim, record)
+            elif batch_token.cancelled:
+                job_store.release(claim)
+            else:
+                job_store.fail(claim, record["error"] or "failed", record)
+        return record
+
+    items = claimed(read_manifest(manifest_path))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flyer-batch")
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            running = {executor.submit(work, *entry) for entry in islice(items, workers)}
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    record["completed_at"] = time.time()
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    stats.record(record)
+                    if progress_every and stats.completed % progress_every == 0:
+                        print(f"   📦 {stats.summary()}")
+                    if not batch_token.cancelled:
+                        for entry in islice(items, 1):
+                            running.add(executor.submit(work, *entry))
+    except BaseException:
+        # Stop in-flight items too (e.g. Ctrl+C); they finish as cancelled
+        batch_token.cancel("batch interrupted")
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate flyers for every project in a JSONL manifest")
+    parser.add_argument("manifest", help="JSONL file, one project per line")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, metavar="PATH",
+                        help=f"JSONL results file, appended to (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, metavar="DIR",
+                        help=f"Directory for finished flyers (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Flyers generated concurrently (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--item-timeout", type=float, metavar="SECONDS",
+                        help="Give up on an item after this long")
+    parser.add_argument("--no-qr", action="store_true",
+                        help="Skip QR compositing even for projects that enable it")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, metavar="PATH",
+                        help=f"SQLite job state for resuming (default: {DEFAULT_STATE_PATH})")
+    parser.add_argument("--no-state", action="store_true",
+                        help="Don't track job state (every item is generated)")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Attempts per item across runs (default: {DEFAULT_MAX_ATTEMPTS})")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS, metavar="SECONDS",
+                        help=f"How long an in-flight item is reserved (default: {DEFAULT_LEASE_SECONDS:.0f})")
+    parser.add_argument("--mock", action="store_true",
+                        help="Use mock generator (no API key needed)")
+    parser.add_argument("--openrouter", action="store_true",
+                        help="Use OpenRouter API instead of OpenAI directly")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                        help=f"Reuse results for identical requests (default dir: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+
+    generator = create_generator(
+        mock=args.mock,
+        use_openrouter=args.openrouter,
+        max_concurrency=max(1, args.workers),
+        cache=GenerationCache(args.cache) if args.cache else None
+    )
+
+    print(f"\n📦 Batch: {args.manifest} → {args.output} ({args.workers} workers)")
+    token = CancellationToken()
+    try:
+        stats = run_batch(
+            generator,
+            args.manifest,
+            output_path=args.output,
+            output_dir=args.output_dir,
+            workers=args.workers,
+            apply_qr=not args.no_qr,
+            item_timeout=args.item_timeout,
+            cancel_token=token,
+            job_store=None if args.no_state else JobStore(
+                args.state, max_attempts=args.max_attempts, lease_seconds=args.lease
+            )
+        )
+    except KeyboardInterrupt:
+        print("\n\n👋 Batch interrupted; finished items are in the results file.")
+        return
+    print(f"\n✅ {stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
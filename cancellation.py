@@ -0,0 +1,192 @@
+"""
+Cancellation
+
+Cancellation tokens with an optional deadline, passed to generate() to
+abort a request: in-flight provider calls, image downloads and disk
+writes stop, and partially written files are removed.
+
+Usage:
+    from cancellation import CancellationToken
+
+    token = CancellationToken(timeout_seconds=60)
+    results = generator.generate(prompt, cancel_token=token)
+    # from another thread, e.g. when the client disconnects:
+    token.cancel("client disconnected")
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Callable, Any, Awaitable, List
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a generation once its token is cancelled or past its deadline"""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(f"Cancelled: {reason}")
+
+
+# Cancellation token of the generate() call running in this thread / task.
+# The generators set it per task, so provider calls, rate limit waits,
+# downloads and writes deep in the call stack see it without threading it
+# through every signature.
+current_cancel_token: contextvars.ContextVar = contextvars.ContextVar("flyer_cancel_token", default=None)
+
+
+def current_token() -> Optional["CancellationToken"]:
+    """The token of the generate() call running here, or None"""
+    return current_cancel_token.get()
+
+
+class CancellationToken:
+    """
+    Thread-safe cancel flag plus optional deadline.
+
+    Args:
+        timeout_seconds: Cancel automatically this long from now
+        parent: Also cancelled when parent is (and never outlives its deadline)
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: Optional[float] = None,
+        parent: Optional["CancellationToken"] = None
+    ):
+        self.deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        self.parent = parent
+        self._reason: Optional[str] = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel (idempotent); registered callbacks run once, on this thread"""
+        with self._lock:
+            if self._reason is not None:
+                return
+            self._reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    @property
+    def reason(self) -> Optional[str]:
+        """Why the token is cancelled ("deadline exceeded" once past it), or None"""
+        if self._reason is not None:
+            return self._reason
+        if self.parent is not None and self.parent.cancelled:
+            return self.parent.reason
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "deadline exceeded"
+        return None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the (earliest) deadline; None if there is none"""
+        remaining = None
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining()
+            if parent_remaining is not None:
+                remaining = parent_remaining if remaining is None else min(remaining, parent_remaining)
+        return None if remaining is None else max(remaining, 0.0)
+
+    def raise_if_cancelled(self):
+        reason = self.reason
+        if reason is not None:
+            raise GenerationCancelled(reason)
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call callback on an explicit cancel() (here or on a parent); runs
+        it immediately if already cancelled. Deadlines don't fire callbacks;
+        bound waits with remaining() instead. Returns a function that
+        unregisters it.
+        """
+        with self._lock:
+            registered = self._reason is None
+            if registered:
+                self._callbacks.append(callback)
+        remove_from_parent = self.parent.add_callback(callback) if self.parent is not None else None
+        if not registered:
+            callback()
+
+        def remove():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+            if remove_from_parent is not None:
+                remove_from_parent()
+        return remove
+
+    def sleep(self, seconds: float):
+        """time.sleep that wakes up and raises GenerationCancelled on cancellation"""
+        woke = threading.Event()
+        remove = self.add_callback(woke.set)
+        try:
+            remaining = self.remaining()
+            woke.wait(seconds if remaining is None else min(seconds, remaining))
+        finally:
+            remove()
+        self.raise_if_cancelled()
+
+    async def sleep_async(self, seconds: float):
+        """asyncio.sleep that wakes up and raises GenerationCancelled on cancellation"""
+        await self.run_async(asyncio.sleep(seconds))
+
+    def run(self, call: Callable[[], Any]) -> Any:
+        """
+        Run a blocking call, giving up on it as soon as the token is cancelled.
+
+        A blocking socket read can't be interrupted from outside, so the
+        call runs on a daemon thread; on cancellation it is abandoned (its
+        result is discarded) and GenerationCancelled is raised at once.
+        """
+        self.raise_if_cancelled()
+        future: Future = Future()
+
+        def worker():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(call())
+            except BaseException as e:
+                future.set_exception(e)
+
+        woke = threading.Event()
+        future.add_done_callback(lambda f: woke.set())
+        remove = self.add_callback(woke.set)
+        try:
+            threading.Thread(target=worker, name="flyer-call", daemon=True).start()
+            woke.wait(self.remaining())
+        finally:
+            remove()
+        if future.done():
+            return future.result()
+        raise GenerationCancelled(self.reason or "deadline exceeded")
+
+    async def run_async(self, awaitable: Awaitable[Any]) -> Any:
+        """Await awaitable, cancelling it (and its HTTP request) when the token is"""
+        self.raise_if_cancelled()
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(awaitable)
+        remove = self.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await asyncio.wait_for(task, self.remaining())
+        except asyncio.TimeoutError:
+            if not task.cancelled():
+                raise   # the call's own timeout
+            raise GenerationCancelled(self.reason or "deadline exceeded") from None
+        except asyncio.CancelledError:
+            # Our own cancel(), not the caller's task being cancelled
+            if self.cancelled and not asyncio.current_task().cancelling():
+                raise GenerationCancelled(self.reason) from None
+            raise
+        finally:
+            remove()
@@ -0,0 +1,150 @@
+"""
+Shared API Clients
+
+Process-wide registry of OpenAI / OpenRouter clients keyed by
+(base_url, api_key), so every generator talking to the same provider
+reuses one connection pool instead of paying connection setup per
+instance.
+
+Async clients are additionally scoped to their event loop, since pooled
+connections can't be shared across loops.
+"""
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Tuple
+
+try:
+    from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+# httpx is what the openai SDK uses underneath; with it we can size the pool
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# HTTP/2 multiplexing needs the optional h2 package
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass
+class ClientPoolSettings:
+    """Connection pool configuration applied to newly created clients"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    http2: bool = True          # used only when h2 is installed
+
+
+_settings = ClientPoolSettings()
+_lock = threading.Lock()
+_sync_clients: Dict[Tuple[Optional[str], str], Any] = {}
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def configure_client_pool(settings: ClientPoolSettings):
+    """Set pool settings for clients created from now on"""
+    global _settings
+    with _lock:
+        _settings = settings
+
+
+def _http_client_kwargs() -> Dict[str, Any]:
+    if not HTTPX_AVAILABLE:
+        return {}
+    return {
+        "limits": httpx.Limits(
+            max_connections=_settings.max_connections,
+            max_keepalive_connections=_settings.max_keepalive_connections,
+            keepalive_expiry=_settings.keepalive_expiry,
+        ),
+        "http2": _settings.http2 and HTTP2_AVAILABLE,
+    }
+
+
+def get_openai_client(
+    api_key: str,
+    base_url: Optional[str] = None,
+    default_headers: Optional[Dict[str, str]] = None,
+    max_retries: Optional[int] = None
+):
+    """Shared sync OpenAI client for (base_url, api_key)"""
+    key = (base_url, api_key)
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            kwargs: Dict[str, Any] = {"api_key": api_key}
+            if base_url:
+                kwargs["base_url"] = base_url
+            if default_headers:
+                kwargs["default_headers"] = default_headers
+            if max_retries is not None:
+                kwargs["max_retries"] = max_retries
+            if HTTPX_AVAILABLE:
+                kwargs["http_client"] = DefaultHttpxClient(**_http_client_kwargs())
+            client = OpenAI(**kwargs)
+            _sync_clients[key] = client
+        return client
+
+
+def get_async_openai_client(
+    api_key: str,
+    base_url: Optional[str] = None,
+    default_headers: Optional[Dict[str, str]] = None,
+    max_retries: Optional[int] = None
+):
+    """Shared AsyncOpenAI client for (base_url, api_key) on the running event loop"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    def build():
+        kwargs: Dict[str, Any] = {"api_key": api_key}
+        if base_url:
+            kwargs["base_url"] = base_url
+        if default_headers:
+            kwargs["default_headers"] = default_headers
+        if max_retries is not None:
+            kwargs["max_retries"] = max_retries
+        if HTTPX_AVAILABLE:
+            kwargs["http_client"] = DefaultAsyncHttpxClient(**_http_client_kwargs())
+        return AsyncOpenAI(**kwargs)
+
+    if loop is None:
+        # No loop to scope it to; hand out a private client
+        return build()
+
+    key = (base_url, api_key)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = build()
+            clients[key] = client
+        return client
+
+
+def client_count() -> int:
+    """Number of live shared clients (sync + async)"""
+    with _lock:
+        return len(_sync_clients) + sum(len(c) for c in _async_clients.values())
+
+
+def close_all():
+    """Close every shared sync client and forget all registered clients"""
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+        _async_clients.clear()
+    for client in clients:
+        client.close()
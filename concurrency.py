@@ -0,0 +1,225 @@
+"""
+Adaptive Concurrency
+
+AIMD controller for in-flight API calls per (provider, model): the limit
+grows by one after a full window of healthy calls (successful, latency
+near the baseline) and is cut multiplicatively on 429s, timeouts or
+latency spikes. Current limits and their history are exposed as metrics.
+
+This is the generators' one in-process concurrency limit: a call takes
+its slot here before any rate limit token (see rate_limit.py).
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+from resilience import classify_error
+
+
+# How often async waiters re-check for a free slot
+ASYNC_POLL_SECONDS = 0.02
+
+# Number of limit changes kept per key
+HISTORY_LENGTH = 200
+
+
+@dataclass
+class AIMDConfig:
+    """Tuning for AdaptiveConcurrencyController"""
+    initial_limit: int = 4
+    min_limit: int = 1
+    max_limit: int = 32
+    decrease_factor: float = 0.5
+    # A call slower than this multiple of the baseline counts as a spike
+    latency_spike_ratio: float = 2.0
+    # Smoothing for the baseline latency (EWMA of healthy calls)
+    baseline_alpha: float = 0.1
+    # Don't cut again within this long of the last cut; one overload event
+    # usually fails several in-flight calls at once
+    decrease_cooldown_seconds: float = 2.0
+
+
+class AdaptiveConcurrencyController:
+    """In-flight limit for one (provider, model) key"""
+
+    def __init__(self, key: str, config: Optional[AIMDConfig] = None):
+        self.key = key
+        self.config = config or AIMDConfig()
+        self.limit = self.config.initial_limit
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+
+        self.successes = 0
+        self.increases = 0
+        self.decreases = 0
+        self.history: deque = deque(maxlen=HISTORY_LENGTH)
+        self.history.append((time.time(), self.limit, "initial"))
+
+        self._healthy_in_window = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a slot; False if timeout elapsed first"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < self.limit, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return True
+            return False
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(ASYNC_POLL_SECONDS)
+        return True
+
+    def release(self, latency: Optional[float] = None, error: Optional[BaseException] = None):
+        """Free the slot and feed the outcome of the call into the limit"""
+        with self._condition:
+            self.in_flight -= 1
+            if error is not None:
+                kind = classify_error(error)
+                if kind in ("rate_limit", "timeout"):
+                    self._decrease(kind)
+            elif latency is not None:
+                self._on_success(latency)
+            self._condition.notify_all()
+
+    def _on_success(self, latency: float):
+        self.successes += 1
+        baseline = self.baseline_latency
+        if baseline is not None and latency > baseline * self.config.latency_spike_ratio:
+            self._decrease("latency_spike")
+            return
+
+        alpha = self.config.baseline_alpha
+        self.baseline_latency = latency if baseline is None else baseline + alpha * (latency - baseline)
+
+        # Additive increase: +1 per full window of healthy calls at the current limit
+        self._healthy_in_window += 1
+        if self._healthy_in_window >= self.limit and self.limit < self.config.max_limit:
+            self.limit += 1
+            self.increases += 1
+            self._healthy_in_window = 0
+            self.history.append((time.time(), self.limit, "increase"))
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        self._healthy_in_window = 0
+        if now - self._last_decrease < self.config.decrease_cooldown_seconds:
+            return
+        new_limit = max(self.config.min_limit, int(self.limit * self.config.decrease_factor))
+        self._last_decrease = now
+        if new_limit != self.limit:
+            self.limit = new_limit
+            self.decreases += 1
+            self.history.append((time.time(), self.limit, reason))
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "baseline_latency": (
+                    round(self.baseline_latency, 3) if self.baseline_latency is not None else None
+                ),
+                "successes": self.successes,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "history": list(self.history),
+            }
+
+
+@dataclass
+class ConcurrencySlot:
+    """An in-flight slot held by one call; its latency is timed from started"""
+    controller: AdaptiveConcurrencyController
+    started: float
+
+    def restart_clock(self):
+        """Time the call from now (e.g. after waiting for a rate limit token)"""
+        self.started = time.monotonic()
+
+
+class AdaptiveConcurrency:
+    """One AdaptiveConcurrencyController per (provider, model)"""
+
+    def __init__(self, config: Optional[AIMDConfig] = None):
+        self.config = config or AIMDConfig()
+        self._controllers: Dict[str, AdaptiveConcurrencyController] = {}
+        self._lock = threading.Lock()
+
+    def controller(self, provider: str, model: str) -> AdaptiveConcurrencyController:
+        key = f"{provider}|{model}"
+        with self._lock:
+            controller = self._controllers.get(key)
+            if controller is None:
+                controller = AdaptiveConcurrencyController(key, self.config)
+                self._controllers[key] = controller
+            return controller
+
+    @contextmanager
+    def slot(self, provider: str, model: str, timeout: Optional[float] = None):
+        """
+        Hold an in-flight slot for one call (yields a ConcurrencySlot). The
+        call's latency, or the error it raised, adjusts the limit.
+
+        Raises:
+            TimeoutError: if no slot frees up within timeout
+        """
+        controller = self.controller(provider, model)
+        if not controller.acquire(timeout):
+            raise TimeoutError(f"No concurrency slot for {controller.key} within {timeout:.1f}s")
+        slot = ConcurrencySlot(controller, time.monotonic())
+        try:
+            yield slot
+        except BaseException as e:
+            controller.release(error=e)
+            raise
+        controller.release(latency=time.monotonic() - slot.started)
+
+    @asynccontextmanager
+    async def slot_async(self, provider: str, model: str, timeout: Optional[float] = None):
+        controller = self.controller(provider, model)
+        if not await controller.acquire_async(timeout):
+            raise TimeoutError(f"No concurrency slot for {controller.key} within {timeout:.1f}s")
+        slot = ConcurrencySlot(controller, time.monotonic())
+        try:
+            yield slot
+        except BaseException as e:
+            controller.release(error=e)
+            raise
+        controller.release(latency=time.monotonic() - slot.started)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Current limit, in-flight count, counters and limit history per key"""
+        with self._lock:
+            controllers = list(self._controllers.values())
+        return {controller.key: controller.metrics() for controller in controllers}
+
+
+# Process-wide controller shared by all generators
+_default_concurrency: Optional[AdaptiveConcurrency] = None
+_default_lock = threading.Lock()
+
+
+def get_default_concurrency() -> AdaptiveConcurrency:
+    """The shared AdaptiveConcurrency (created on first use)"""
+    global _default_concurrency
+    with _default_lock:
+        if _default_concurrency is None:
+            _default_concurrency = AdaptiveConcurrency()
+        return _default_concurrency
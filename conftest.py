@@ -0,0 +1,222 @@
+"""
+Shared pytest fixtures: a fake OpenAI client and generators wired to it.
+
+The fake client answers images.generate and chat.completions.create with a
+1x1 PNG (after an optional delay) and counts calls; tests queue errors to
+be raised first. It also runs Batch API jobs (files / batches)
+synchronously on create, and FakeAsyncClient wraps it for
+AsyncFlyerImageGenerator. Each
+generator gets its own retry policy, concurrency controller and circuit
+breakers so no state leaks between tests through the process-wide defaults.
+"""
+import asyncio
+import base64
+import contextlib
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+from image_generator import FlyerImageGenerator, AsyncFlyerImageGenerator
+from concurrency import AdaptiveConcurrency
+from resilience import RetryPolicy, CircuitBreakers
+
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+PNG_BASE64 = base64.b64encode(PNG).decode("utf-8")
+
+
+class FakeAPIError(Exception):
+    """
+    An HTTP error from the fake API. Carries what resilience.py reads off
+    SDK errors: status_code and response.headers (lower-case names).
+    """
+
+    def __init__(self, status: int, headers: Dict[str, str] = None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers=dict(headers or {}))
+
+
+class FakeClient:
+    """
+    Stands in for openai.OpenAI.
+
+    calls records (endpoint, kwargs) for every call. errors[model] is a list
+    of exceptions raised, in order, by that model's next calls; "*" applies
+    to any model. Image calls take delay seconds.
+
+    A batch is processed when it is created and reports batch_status
+    ("completed" by default) when retrieved. Lines whose prompt contains
+    batch_fail_marker go to the error file; with an "expired" or "failed"
+    status no line is processed.
+    """
+
+    def __init__(self):
+        self.calls: List[tuple] = []
+        self.errors: Dict[str, List[Exception]] = {}
+        self.delay = 0.0
+        self.images = SimpleNamespace(generate=self._images_generate)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat_create))
+
+        self.batch_status = "completed"
+        self.batch_fail_marker = "FAIL"
+        self.uploads: Dict[str, bytes] = {}
+        self.batch_objects: Dict[str, SimpleNamespace] = {}
+        self.files = SimpleNamespace(
+            create=self._files_create,
+            with_streaming_response=SimpleNamespace(content=self._file_content)
+        )
+        self.batches = SimpleNamespace(
+            create=self._batches_create,
+            retrieve=self._batches_retrieve,
+            list=self._batches_list,
+            cancel=self._batches_cancel
+        )
+
+    def calls_to(self, model: str) -> int:
+        return sum(1 for _, kwargs in self.calls if kwargs.get("model") == model)
+
+    def _maybe_fail(self, model: str):
+        for key in (model, "*"):
+            if self.errors.get(key):
+                raise self.errors[key].pop(0)
+
+    def _images_generate(self, **kwargs: Any):
+        time.sleep(self.delay)
+        return self._images_response(**kwargs)
+
+    def _images_response(self, **kwargs: Any):
+        self.calls.append(("images.generate", kwargs))
+        self._maybe_fail(kwargs["model"])
+        data = [
+            SimpleNamespace(b64_json=PNG_BASE64, url=None, revised_prompt=None)
+            for _ in range(kwargs.get("n", 1))
+        ]
+        return SimpleNamespace(data=data)
+
+    def _chat_create(self, **kwargs: Any):
+        time.sleep(self.delay)
+        return self._chat_response(**kwargs)
+
+    def _chat_response(self, **kwargs: Any):
+        self.calls.append(("chat.completions.create", kwargs))
+        self._maybe_fail(kwargs["model"])
+        image = {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{PNG_BASE64}"}}
+        message = SimpleNamespace(role="assistant", content="", images=[image])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _files_create(self, file, purpose: str, **options: Any):
+        self.calls.append(("files.create", {"purpose": purpose}))
+        file_id = f"file-{len(self.uploads)}"
+        self.uploads[file_id] = file[1].read()
+        return SimpleNamespace(id=file_id)
+
+    @contextlib.contextmanager
+    def _file_content(self, file_id: str, **options: Any):
+        lines = self.uploads[file_id].decode("utf-8").splitlines()
+        yield SimpleNamespace(iter_lines=lambda: iter(lines))
+
+    def _batches_create(self, input_file_id: str, endpoint: str, completion_window: str,
+                        metadata: Dict[str, str] = None, **options: Any):
+        self.calls.append(("batches.create", {"input_file_id": input_file_id}))
+        batch_id = f"batch-{len(self.batch_objects)}"
+        outputs, errors = [], []
+        if self.batch_status == "completed":
+            for line in self.uploads[input_file_id].decode("utf-8").splitlines():
+                request = json.loads(line)
+                body = request["body"]
+                if self.batch_fail_marker in body["prompt"]:
+                    errors.append({"custom_id": request["custom_id"], "response": {
+                        "status_code": 400,
+                        "body": {"error": {"message": "Rejected by the fake batch"}}
+                    }})
+                else:
+                    data = [{"b64_json": PNG_BASE64} for _ in range(body.get("n", 1))]
+                    outputs.append({"custom_id": request["custom_id"], "response": {
+                        "status_code": 200, "body": {"created": 0, "data": data}
+                    }})
+        file_ids = []
+        for entries in (outputs, errors):
+            file_id = None
+            if entries:
+                file_id = f"file-{len(self.uploads)}"
+                self.uploads[file_id] = "\n".join(json.dumps(e) for e in entries).encode("utf-8")
+            file_ids.append(file_id)
+        batch = SimpleNamespace(
+            id=batch_id, status="validating", output_file_id=file_ids[0],
+            error_file_id=file_ids[1], errors=None, metadata=metadata or {}
+        )
+        self.batch_objects[batch_id] = batch
+        return batch
+
+    def _batches_retrieve(self, batch_id: str, **options: Any):
+        batch = self.batch_objects[batch_id]
+        if batch.status != "cancelled":
+            batch.status = self.batch_status
+        return batch
+
+    def _batches_list(self, limit: int = 20, **options: Any):
+        return SimpleNamespace(data=list(self.batch_objects.values())[-limit:])
+
+    def _batches_cancel(self, batch_id: str, **options: Any):
+        self.batch_objects[batch_id].status = "cancelled"
+        return self.batch_objects[batch_id]
+
+
+class FakeAsyncClient:
+    """Stands in for openai.AsyncOpenAI, answering from a FakeClient"""
+
+    def __init__(self, client: FakeClient):
+        self.sync = client
+        self.images = SimpleNamespace(generate=self._images_generate)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat_create))
+
+    async def _images_generate(self, **kwargs: Any):
+        await asyncio.sleep(self.sync.delay)
+        return self.sync._images_response(**kwargs)
+
+    async def _chat_create(self, **kwargs: Any):
+        await asyncio.sleep(self.sync.delay)
+        return self.sync._chat_response(**kwargs)
+
+
+def _isolated(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Generator arguments with per-test retry, concurrency and breaker state"""
+    kwargs.setdefault("retry_policy", RetryPolicy(base_delay=0.01, max_delay=0.05))
+    kwargs.setdefault("concurrency", AdaptiveConcurrency())
+    kwargs.setdefault("circuit_breakers", CircuitBreakers())
+    return kwargs
+
+
+@pytest.fixture
+def fake_client() -> FakeClient:
+    return FakeClient()
+
+
+@pytest.fixture
+def make_generator(tmp_path, fake_client):
+    """Build a FlyerImageGenerator that talks to fake_client"""
+    def make(**kwargs: Any) -> FlyerImageGenerator:
+        generator = FlyerImageGenerator(
+            api_key="test-key", output_dir=str(tmp_path / "generated"), **_isolated(kwargs)
+        )
+        generator.client = fake_client
+        return generator
+    return make
+
+
+@pytest.fixture
+def make_async_generator(tmp_path, fake_client):
+    """Build an AsyncFlyerImageGenerator that talks to fake_client"""
+    def make(**kwargs: Any) -> AsyncFlyerImageGenerator:
+        generator = AsyncFlyerImageGenerator(
+            api_key="test-key", output_dir=str(tmp_path / "generated"), **_isolated(kwargs)
+        )
+        generator.client = FakeAsyncClient(fake_client)
+        return generator
+    return make
@@ -0,0 +1,126 @@
+"""
+Draft-then-Final Pipeline
+
+Cheap, fast drafts while the user iterates, then one full-quality
+re-render of the chosen draft. Drafts use a cheaper model / quality tier
+(see DRAFT_TIERS); finalize() sends the draft back as the edit input so
+the final keeps its layout and text.
+
+Usage:
+    from draft_pipeline import draft_settings, finalize
+    from image_generator import create_generator
+
+    generator = create_generator()
+    draft_model, draft_quality = draft_settings("nano-banana-pro", "hd")
+    drafts = generator.generate(prompt, model=draft_model, quality=draft_quality)
+    final = finalize(generator, drafts[0], prompt, model="nano-banana-pro", quality="hd")
+"""
+from typing import Optional, List, Tuple
+
+from image_generator import (
+    AUTO_MODEL, CHAT_COMPLETION_IMAGE_MODELS, GenerationResult, InputImage
+)
+from model_router import MODEL_PROFILES
+
+
+# Full-quality model -> (draft model, draft quality)
+DRAFT_TIERS = {
+    "nano-banana-pro": ("nano-banana", "standard"),
+    "nano-banana": ("nano-banana", "standard"),
+    "gpt-image-1": ("gpt-image-1", "low"),
+    "dall-e-3": ("dall-e-3", "standard"),
+    # Lets the router pick the cheapest capable model for drafts
+    AUTO_MODEL: (AUTO_MODEL, "low"),
+}
+
+FINALIZE_INSTRUCTIONS = (
+    "FINAL RENDER: The provided image is an approved draft. Re-render it at "
+    "full quality with sharper detail, cleaner typography and refined lighting. "
+    "Keep the layout, composition, colors and ALL text exactly as shown - do not "
+    "change any words or spelling."
+)
+
+
+def draft_settings(model: str, quality: str) -> Tuple[str, str]:
+    """(model, quality) to draft with for a final render on model / quality"""
+    return DRAFT_TIERS.get(model, (model, quality))
+
+
+def mark_stage(results: List[GenerationResult], stage: str) -> List[GenerationResult]:
+    """Tag results as "draft" or "final" in their metadata"""
+    for result in results:
+        result.metadata["stage"] = stage
+    return results
+
+
+def accepts_input_images(generator, model: str, aspect_ratio: str, quality: str) -> bool:
+    """
+    Whether model (after routing, for model="auto") can take the draft as
+    an edit input on generator's provider
+    """
+    if not hasattr(generator, "provider"):
+        # Mock generators take any input
+        return True
+    if model == AUTO_MODEL:
+        router = getattr(generator, "router", None)
+        if router is None:
+            return False
+        try:
+            decision = router.choose(
+                generator.provider, aspect_ratio, quality, needs_input_images=True
+            )
+        except ValueError:
+            return False
+        return router.profiles[decision.model].supports_input_images
+    profile = MODEL_PROFILES.get(model)
+    return profile.supports_input_images if profile else model in CHAT_COMPLETION_IMAGE_MODELS
+
+
+def finalize(
+    generator,
+    draft: GenerationResult,
+    prompt: str,
+    model: str,
+    quality: str = "hd",
+    negative_prompt: Optional[str] = None,
+    aspect_ratio: Optional[str] = None,
+    input_images: Optional[List[InputImage]] = None
+) -> List[GenerationResult]:
+    """
+    Re-render a draft at full quality.
+
+    Args:
+        generator: Generator to render with
+        draft: The chosen draft (its in-memory image is sent as the edit input)
+        prompt: Prompt the draft was generated from
+        model: Full-quality model
+        quality: Full quality level
+        negative_prompt: Things to avoid
+        aspect_ratio: Output format (default: the draft's)
+        input_images: Other inputs the draft used (e.g. the logo)
+
+    Returns:
+        Results tagged with metadata["stage"] = "final"
+    """
+    aspect_ratio = aspect_ratio or draft.metadata.get("aspect_ratio", "1:1")
+    final_inputs = list(input_images or [])
+    if accepts_input_images(generator, model, aspect_ratio, quality):
+        final_inputs.append(draft)
+        final_prompt = f"{prompt}\n\n{FINALIZE_INSTRUCTIONS}"
+    else:
+        # The images API takes no input image; re-render from the prompt alone
+        print(f"⚠️  Warning: {model} can't edit images here. The final is re-rendered from the prompt.")
+        final_prompt = prompt
+        final_inputs = []
+
+    results = generator.generate(
+        prompt=final_prompt,
+        negative_prompt=negative_prompt,
+        model=model,
+        aspect_ratio=aspect_ratio,
+        quality=quality,
+        input_images=final_inputs or None
+    )
+    for result in results:
+        result.metadata["draft_path"] = draft.image_path
+    return mark_stage(results, "final")
@@ -0,0 +1,337 @@
+"""
+Generation Cache
+
+Opt-in on-disk cache for image generation results, keyed on a canonical
+fingerprint of the full request (prompt, negative prompt, model, aspect
+ratio, quality, variant count and the content of any input images).
+
+Usage:
+    from generation_cache import GenerationCache
+    from image_generator import create_generator
+
+    generator = create_generator(cache=GenerationCache("./.flyer_cache"))
+"""
+import base64
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import fields as dataclass_fields
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from image_generator import (
+    GenerationResult, ImageHandle, InputImage,
+    data_url_payload_offset, decode_base64_to_file
+)
+
+
+# Default limits
+DEFAULT_CACHE_DIR = "./.flyer_cache"
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024     # 500 MB
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600   # 1 week
+
+# Bump when the fingerprint inputs or entry layout change
+CACHE_FORMAT_VERSION = 1
+
+ENTRY_FILE = "entry.json"
+
+
+def file_content_hash(path: str) -> str:
+    """SHA-256 of a file's content (used to fingerprint input images)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def input_image_hash(image: InputImage) -> str:
+    """
+    Content hash of an input image (path, raw bytes or previous result).
+
+    Raises:
+        ValueError: for a previous result with no image content here (e.g.
+            an unsaved URL result); such requests are not cacheable
+    """
+    if isinstance(image, GenerationResult):
+        if image.image_handle is not None:
+            return image.image_handle.sha256
+        if image.image_base64:
+            return hashlib.sha256(base64.b64decode(image.image_base64)).hexdigest()
+        image_path = image.wait_until_saved()
+        if not image_path:
+            raise ValueError("previous result has no saved image or payload")
+        return file_content_hash(image_path)
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(image).hexdigest()
+    return file_content_hash(image)
+
+
+# Fields rebuilt on lookup rather than stored in entry.json
+_UNSTORED_FIELDS = (
+    "image_path", "_image_base64", "save_future", "image_data_url", "image_handle"
+)
+
+
+def request_fingerprint(
+    prompt: str,
+    negative_prompt: str = "",
+    model: str = "",
+    aspect_ratio: str = "",
+    quality: str = "",
+    n: int = 1,
+    input_images: Optional[List[InputImage]] = None
+) -> str:
+    """
+    Canonical hash of a generation request.
+
+    Input images contribute their content hash rather than their path, so
+    the same logo at two locations hits the same entry and an edited file
+    at the same path does not.
+    """
+    canonical = {
+        "version": CACHE_FORMAT_VERSION,
+        "prompt": prompt,
+        "negative_prompt": negative_prompt or "",
+        "model": model,
+        "aspect_ratio": aspect_ratio,
+        "quality": quality,
+        "n": n,
+        "input_images": [input_image_hash(image) for image in (input_images or [])],
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Content-addressed result cache with LRU eviction.
+
+    Each entry is a directory holding entry.json plus the image files of a
+    fully successful generate() call. Entries older than max_age_seconds are
+    dropped; when the cache grows past max_bytes, the least recently used
+    entries (by last hit) are evicted first.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def fingerprint(self, **request: Any) -> str:
+        """Cache key for a generation request (see request_fingerprint)"""
+        return request_fingerprint(**request)
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def lookup(
+        self,
+        key: str,
+        output_dir: Path,
+        save_images: bool = True
+    ) -> Optional[List[GenerationResult]]:
+        """
+        Return cached results for key, or None on a miss.
+
+        Cached image files are copied into output_dir so callers can move or
+        modify them without touching the cache.
+        """
+        entry_dir = self._entry_dir(key)
+        entry_file = entry_dir / ENTRY_FILE
+
+        try:
+            with open(entry_file, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.max_age_seconds:
+            self._remove(entry_dir)
+            self._count(hit=False)
+            return None
+
+        results = []
+        try:
+            for index, item in enumerate(entry["results"]):
+                fields = dict(item["fields"])
+                cached_file = entry_dir / item["file"]
+
+                fields["image_path"] = None
+                if save_images:
+                    dest = output_dir / f"cached_{key[:12]}_{uuid.uuid4().hex[:8]}_{index}{cached_file.suffix}"
+                    shutil.copyfile(cached_file, dest)
+                    fields["image_path"] = str(dest)
+                    if item.get("has_base64"):
+                        # Served lazily from the copied file via image_base64
+                        fields["image_handle"] = ImageHandle.from_file(dest)
+                elif item.get("has_base64"):
+                    with open(cached_file, 'rb') as f:
+                        fields["image_base64"] = base64.b64encode(f.read()).decode('utf-8')
+
+                result = GenerationResult(**fields)
+                result.generation_time_seconds = 0.0
+                result.metadata["cache"] = "hit"
+                result.metadata["cache_key"] = key
+                results.append(result)
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            print(f"Warning: Dropping unreadable cache entry {key[:12]}: {e}")
+            self._remove(entry_dir)
+            self._count(hit=False)
+            return None
+
+        # Touch the entry so LRU eviction sees it as recently used
+        try:
+            os.utime(entry_file)
+        except OSError:
+            pass
+
+        self._count(hit=True)
+        return results
+
+    def store(self, key: str, results: List[GenerationResult]) -> bool:
+        """
+        Cache the results of a generate() call.
+
+        Only fully successful calls whose images are on disk or held as
+        base64 are cached. Returns True if an entry was written.
+        """
+        if not results or not all(r.success for r in results):
+            return False
+
+        tmp_dir = self.cache_dir / f".tmp_{uuid.uuid4().hex}"
+        tmp_dir.mkdir(parents=True)
+        items = []
+        try:
+            for index, result in enumerate(results):
+                if result.image_handle is not None:
+                    filename = f"{index}{Path(result.image_handle.path).suffix or '.png'}"
+                    shutil.copyfile(result.image_handle.path, tmp_dir / filename)
+                elif result.image_data_url:
+                    filename = f"{index}.png"
+                    decode_base64_to_file(
+                        result.image_data_url, tmp_dir / filename,
+                        data_url_payload_offset(result.image_data_url)
+                    )
+                elif result.image_base64:
+                    filename = f"{index}.png"
+                    decode_base64_to_file(result.image_base64, tmp_dir / filename)
+                elif result.wait_until_saved() and Path(result.image_path).exists():
+                    filename = f"{index}{Path(result.image_path).suffix or '.png'}"
+                    shutil.copyfile(result.image_path, tmp_dir / filename)
+                else:
+                    # Nothing durable to cache (e.g. an unsaved, expiring URL)
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    return False
+
+                fields = {
+                    f.name: getattr(result, f.name)
+                    for f in dataclass_fields(result)
+                    if f.name not in _UNSTORED_FIELDS
+                }
+                items.append({
+                    "file": filename,
+                    "has_base64": bool(
+                        result.image_handle or result.image_data_url or result.image_base64
+                    ),
+                    "fields": fields,
+                })
+
+            with open(tmp_dir / ENTRY_FILE, 'w') as f:
+                json.dump({"created_at": time.time(), "results": items}, f, default=str)
+
+            entry_dir = self._entry_dir(key)
+            entry_dir.parent.mkdir(parents=True, exist_ok=True)
+            self._remove(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+        except OSError as e:
+            print(f"Warning: Failed to write cache entry: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        """Drop expired entries, then LRU entries until under max_bytes. Returns count evicted."""
+        now = time.time()
+        entries = []
+        for entry_file in self.cache_dir.glob(f"*/*/{ENTRY_FILE}"):
+            entry_dir = entry_file.parent
+            try:
+                last_used = entry_file.stat().st_mtime
+                with open(entry_file, 'r') as f:
+                    created_at = json.load(f).get("created_at", 0)
+                size = sum(p.stat().st_size for p in entry_dir.iterdir())
+            except (OSError, ValueError):
+                continue
+            entries.append((last_used, created_at, size, entry_dir))
+
+        evicted = 0
+        total = 0
+        live = []
+        for last_used, created_at, size, entry_dir in entries:
+            if now - created_at > self.max_age_seconds:
+                self._remove(entry_dir)
+                evicted += 1
+            else:
+                live.append((last_used, size, entry_dir))
+                total += size
+
+        # Least recently used first
+        live.sort(key=lambda e: e[0])
+        for last_used, size, entry_dir in live:
+            if total <= self.max_bytes:
+                break
+            self._remove(entry_dir)
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self.evictions += evicted
+        return evicted
+
+    def clear(self):
+        """Remove every entry"""
+        for child in self.cache_dir.iterdir():
+            self._remove(child)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _remove(self, path: Path):
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists():
+            path.unlink()
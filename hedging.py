@@ -0,0 +1,306 @@
+"""
+Hedged Requests
+
+Cuts tail latency by racing a second "hedge" request when the first is
+slower than usual (by default, slower than the observed p90 latency). The
+hedge goes to the same model via another provider's generator, or to an
+equivalent model. The first successful result wins and the loser is
+cancelled: the async task is cancelled; a sync loser's cancel callback
+fires (the generator cancels its token, which abandons the HTTP call and
+frees its concurrency slot). A budget caps what fraction of requests
+may be hedged, and sync hedging runs on a bounded set of threads.
+
+Usage:
+    from hedging import Hedger, HedgePolicy
+
+    hedger = Hedger(HedgePolicy(), equivalent_models={"nano-banana-pro": "nano-banana"})
+    generator = create_generator(hedger=hedger)
+    ...
+    print(hedger.metrics())
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple
+
+
+# Latency samples kept per key for the percentile estimate
+LATENCY_WINDOW = 200
+
+# Threads for sync primaries and hedges; when all are busy calls run
+# unhedged on the caller's thread
+DEFAULT_MAX_THREADS = 32
+
+
+@dataclass
+class HedgePolicy:
+    """When hedges are sent and how many are allowed"""
+    # Fixed hedge delay; None = use the observed percentile below
+    delay_seconds: Optional[float] = None
+    percentile: float = 0.9
+    # Samples needed before the percentile is trusted; until then
+    # initial_delay_seconds is used
+    min_samples: int = 20
+    initial_delay_seconds: float = 30.0
+    min_delay_seconds: float = 1.0
+    # At most this fraction of requests may send a hedge (the first hedge
+    # is always allowed)
+    max_hedge_ratio: float = 0.1
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per key"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, latency: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def keys(self):
+        with self._lock:
+            return list(self._samples)
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(q * len(samples)))
+        return samples[index]
+
+
+class Hedger:
+    """
+    Races hedge requests for slow calls.
+
+    Args:
+        policy: Hedge delay and budget
+        generator: Generator to send hedges through (e.g. one configured for
+            the other provider); None = the calling generator
+        equivalent_models: Short model name -> model to hedge with; models
+            not listed are hedged with themselves (only useful via another
+            generator)
+        max_threads: Sync primaries and hedges running at once; beyond
+            this, calls run unhedged on the caller's thread
+    """
+
+    def __init__(
+        self,
+        policy: Optional[HedgePolicy] = None,
+        generator=None,
+        equivalent_models: Optional[Dict[str, str]] = None,
+        max_threads: int = DEFAULT_MAX_THREADS
+    ):
+        self.policy = policy or HedgePolicy()
+        self.generator = generator
+        self.equivalent_models = dict(equivalent_models or {})
+        self.max_threads = max(2, max_threads)
+        self.latencies = LatencyTracker()
+
+        self.requests = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.skipped_for_budget = 0
+        self.skipped_for_capacity = 0
+        self._threads_in_use = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def target_for(self, generator, model: str) -> Optional[Tuple[Any, str]]:
+        """(generator, model) to hedge a call with, or None if it can't be hedged"""
+        hedge_generator = self.generator or generator
+        hedge_model = self.equivalent_models.get(model, model)
+        if hedge_generator is generator and hedge_model == model:
+            # Same model through the same client is just a duplicate
+            return None
+        return hedge_generator, hedge_model
+
+    def hedge_delay(self, key: str) -> float:
+        """How long to wait on the primary before hedging"""
+        policy = self.policy
+        if policy.delay_seconds is not None:
+            return policy.delay_seconds
+        if self.latencies.count(key) < policy.min_samples:
+            return policy.initial_delay_seconds
+        observed = self.latencies.percentile(key, policy.percentile)
+        return max(policy.min_delay_seconds, observed)
+
+    def run(
+        self,
+        primary: Callable[[], Any],
+        hedge: Callable[[], Any],
+        key: str,
+        cancel_primary: Optional[Callable[[], None]] = None,
+        cancel_hedge: Optional[Callable[[], None]] = None
+    ):
+        """
+        Run primary, hedging with hedge if it is slow. Both return a
+        GenerationResult; the first successful one is returned and the
+        other side's cancel callback is called.
+        """
+        self._count_request()
+        started = time.monotonic()
+        if not self._take_thread():
+            # Every hedge thread is busy: run unhedged on this thread
+            result = primary()
+            if result.success:
+                self.latencies.record(key, time.monotonic() - started)
+            return self._finish(result, hedged=False, winner="primary")
+
+        executor = self._get_executor()
+        primary_future = executor.submit(primary)
+        primary_future.add_done_callback(
+            lambda f: self._record_latency(key, f, time.monotonic() - started)
+        )
+        primary_future.add_done_callback(self._free_thread)
+
+        done, _ = wait([primary_future], timeout=self.hedge_delay(key))
+        if done or not self._start_hedge():
+            return self._finish(primary_future.result(), hedged=False, winner="primary")
+
+        hedge_future = executor.submit(hedge)
+        hedge_future.add_done_callback(self._free_thread)
+        roles = {primary_future: "primary", hedge_future: "hedge"}
+        cancels = {"primary": cancel_primary, "hedge": cancel_hedge}
+        pending = set(roles)
+        failures = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result.success:
+                    for loser in pending:
+                        loser.cancel()
+                        if cancels[roles[loser]] is not None:
+                            cancels[roles[loser]]()
+                    return self._finish(result, hedged=True, winner=roles[future])
+                failures[roles[future]] = result
+        return self._finish(failures["primary"], hedged=True, winner=None)
+
+    async def run_async(
+        self,
+        primary: Callable[[], Awaitable[Any]],
+        hedge: Callable[[], Awaitable[Any]],
+        key: str
+    ):
+        """asyncio counterpart of run(); the losing request is cancelled"""
+        self._count_request()
+        started = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+        primary_task.add_done_callback(
+            lambda t: self._record_latency(key, t, time.monotonic() - started)
+        )
+        roles = {primary_task: "primary"}
+        try:
+            done, _ = await asyncio.wait([primary_task], timeout=self.hedge_delay(key))
+            if done or not self._start_hedge(needs_thread=False):
+                return self._finish(await primary_task, hedged=False, winner="primary")
+
+            roles[asyncio.ensure_future(hedge())] = "hedge"
+            pending = set(roles)
+            failures = {}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result.success:
+                        return self._finish(result, hedged=True, winner=roles[task])
+                    failures[roles[task]] = result
+            return self._finish(failures["primary"], hedged=True, winner=None)
+        finally:
+            # The loser (or everything, if we were cancelled) stops here
+            for task in roles:
+                if not task.done():
+                    task.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hedge counts, win rates and the current delay per observed key"""
+        with self._lock:
+            requests, sent = self.requests, self.hedges_sent
+            metrics = {
+                "requests": requests,
+                "hedges_sent": sent,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins,
+                "skipped_for_budget": self.skipped_for_budget,
+                "skipped_for_capacity": self.skipped_for_capacity,
+                "hedge_rate": sent / requests if requests else 0.0,
+                "hedge_win_rate": self.hedge_wins / sent if sent else 0.0,
+            }
+        metrics["hedge_delay_seconds"] = {
+            key: round(self.hedge_delay(key), 3) for key in self.latencies.keys()
+        }
+        return metrics
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_threads, thread_name_prefix="hedge"
+                )
+            return self._executor
+
+    def _take_thread(self) -> bool:
+        """Reserve a thread for a primary; False if all are in use"""
+        with self._lock:
+            if self._threads_in_use >= self.max_threads:
+                self.skipped_for_capacity += 1
+                return False
+            self._threads_in_use += 1
+            return True
+
+    def _free_thread(self, future):
+        with self._lock:
+            self._threads_in_use -= 1
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _start_hedge(self, needs_thread: bool = True) -> bool:
+        """
+        Claim hedge budget (and, for sync hedges, a thread); False if the
+        hedge rate cap is reached or no thread is free
+        """
+        with self._lock:
+            allowed = max(1.0, self.policy.max_hedge_ratio * self.requests)
+            if self.hedges_sent + 1 > allowed:
+                self.skipped_for_budget += 1
+                return False
+            if needs_thread:
+                if self._threads_in_use >= self.max_threads:
+                    self.skipped_for_capacity += 1
+                    return False
+                self._threads_in_use += 1
+            self.hedges_sent += 1
+            return True
+
+    def _record_latency(self, key: str, future, latency: float):
+        """Sample the primary's latency once it finishes, even if it lost"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        if future.result().success:
+            self.latencies.record(key, latency)
+
+    def _finish(self, result, hedged: bool, winner: Optional[str]):
+        if hedged:
+            with self._lock:
+                if winner == "hedge":
+                    self.hedge_wins += 1
+                elif winner == "primary":
+                    self.primary_wins += 1
+            result.metadata["hedged"] = True
+            result.metadata["hedge_winner"] = winner
+        return result
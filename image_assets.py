@@ -0,0 +1,239 @@
+"""
+Input Image Preparation
+
+Normalizes logos and user photos once before they are sent to an image
+model: applies EXIF orientation, downscales to a model-appropriate max
+edge, re-encodes compactly and detects the MIME type from the file
+content rather than its extension.
+
+Prepared data-URL payloads are cached by file content hash (and by path +
+mtime, so unchanged files are not even re-read), so variants, refines and
+reformats of the same flyer reuse the same payload.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Set, Tuple
+
+# Pillow is optional here: without it images are sent as-is
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+# Longest edge sent to each model; larger inputs only cost upload time
+DEFAULT_MAX_EDGE = 2048
+MODEL_MAX_INPUT_EDGE: Dict[str, int] = {
+    "nano-banana": 1536,
+    "google/gemini-2.5-flash-image-preview": 1536,
+    "nano-banana-pro": 2048,
+    "google/gemini-3-pro-image-preview": 2048,
+}
+
+# JPEG quality used when re-encoding opaque photos
+JPEG_QUALITY = 90
+
+# Upper bound on cached payload bytes (base64 text) kept in memory
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Detect an image MIME type from its magic bytes"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def max_edge_for_model(model: str) -> int:
+    """Max input image edge for a model (short or provider name)"""
+    return MODEL_MAX_INPUT_EDGE.get(model, DEFAULT_MAX_EDGE)
+
+
+def normalize_image_bytes(data: bytes, max_edge: int = DEFAULT_MAX_EDGE) -> Tuple[bytes, str]:
+    """
+    Orient, downscale and re-encode an image.
+
+    Returns (bytes, mime_type). Images with transparency stay PNG (logos);
+    opaque images become JPEG. If nothing needed changing and re-encoding
+    would not make the file smaller, the original bytes are returned.
+    """
+    original_mime = sniff_mime_type(data) or "image/png"
+    if not PIL_AVAILABLE:
+        return data, original_mime
+
+    try:
+        opened = Image.open(io.BytesIO(data))
+    except Exception:
+        # Not something Pillow can read; let the model decide
+        return data, original_mime
+
+    with opened:
+        # Animated images are passed through untouched
+        if getattr(opened, "is_animated", False):
+            return data, original_mime
+
+        # EXIF Orientation tag; 1 means already upright
+        transformed = opened.getexif().get(0x0112, 1) != 1
+        image = ImageOps.exif_transpose(opened) if transformed else opened
+        if max(image.size) > max_edge:
+            image = image.copy()
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            transformed = True
+
+        has_alpha = (
+            image.mode in ("RGBA", "LA")
+            or (image.mode == "P" and "transparency" in image.info)
+        )
+
+        out = io.BytesIO()
+        if has_alpha:
+            image.save(out, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+            mime_type = "image/jpeg"
+
+    encoded = out.getvalue()
+    if not transformed and len(encoded) >= len(data):
+        return data, original_mime
+    return encoded, mime_type
+
+
+class PreparedImageCache:
+    """
+    Thread-safe LRU of prepared data URLs.
+
+    Keyed by (content hash, max_edge), with a path -> (mtime, size, hash)
+    index so an unchanged file is served without being read from disk
+    again. Index entries go when the last payload for their hash is
+    evicted, so the index is bounded along with the payloads.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._payloads: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._content_hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._paths_by_hash: Dict[str, Set[str]] = {}
+        self._payload_counts: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def prepare(self, image_path: str, max_edge: int = DEFAULT_MAX_EDGE) -> str:
+        """Return the data URL for image_path, preparing it on first use"""
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._content_hashes.get(path)
+            content_hash = entry[2] if entry and entry[:2] == version else None
+            cached = self._get((content_hash, max_edge)) if content_hash else None
+        if cached is not None:
+            return cached
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            cached = self._get((content_hash, max_edge))
+        if cached is None:
+            cached = self._prepare_data(data, content_hash, max_edge)
+        with self._lock:
+            self._remember(path, version, content_hash)
+        return cached
+
+    def prepare_bytes(self, data: bytes, max_edge: int = DEFAULT_MAX_EDGE) -> str:
+        """Return the data URL for in-memory image bytes"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            cached = self._get((content_hash, max_edge))
+        if cached is not None:
+            return cached
+        return self._prepare_data(data, content_hash, max_edge)
+
+    def _prepare_data(self, data: bytes, content_hash: str, max_edge: int) -> str:
+        prepared, mime_type = normalize_image_bytes(data, max_edge)
+        data_url = f"data:{mime_type};base64,{base64.b64encode(prepared).decode('ascii')}"
+
+        with self._lock:
+            self.misses += 1
+            self._put((content_hash, max_edge), data_url)
+        return data_url
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+            self._content_hashes.clear()
+            self._paths_by_hash.clear()
+            self._payload_counts.clear()
+            self._bytes = 0
+
+    def _remember(self, path: str, version: Tuple[int, int], content_hash: str):
+        """Index path's current content (only while a payload for it is cached)"""
+        previous = self._content_hashes.pop(path, None)
+        if previous is not None:
+            paths = self._paths_by_hash.get(previous[2])
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._paths_by_hash[previous[2]]
+        if self._payload_counts.get(content_hash):
+            self._content_hashes[path] = (*version, content_hash)
+            self._paths_by_hash.setdefault(content_hash, set()).add(path)
+
+    def _get(self, key: Tuple[str, int]) -> Optional[str]:
+        data_url = self._payloads.get(key)
+        if data_url is not None:
+            self._payloads.move_to_end(key)
+            self.hits += 1
+        return data_url
+
+    def _put(self, key: Tuple[str, int], data_url: str):
+        if key in self._payloads:
+            return
+        self._payloads[key] = data_url
+        self._bytes += len(data_url)
+        self._payload_counts[key[0]] = self._payload_counts.get(key[0], 0) + 1
+        while self._bytes > self.max_bytes and len(self._payloads) > 1:
+            (content_hash, _), evicted = self._payloads.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._payload_counts[content_hash] -= 1
+            if not self._payload_counts[content_hash]:
+                # Last payload for this content: forget which files had it
+                del self._payload_counts[content_hash]
+                for path in self._paths_by_hash.pop(content_hash, ()):
+                    self._content_hashes.pop(path, None)
+
+
+# Process-wide cache used by the generators
+_default_cache = PreparedImageCache()
+
+
+def prepare_input_image(image_path: str, max_edge: int = DEFAULT_MAX_EDGE) -> str:
+    """
+    Prepare an image file for upload and return it as a data URL.
+
+    Raises OSError if the file can't be read.
+    """
+    return _default_cache.prepare(image_path, max_edge)
+
+
+def prepare_image_bytes(data: bytes, max_edge: int = DEFAULT_MAX_EDGE) -> str:
+    """Prepare in-memory image bytes for upload and return them as a data URL"""
+    return _default_cache.prepare_bytes(data, max_edge)
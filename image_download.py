@@ -0,0 +1,277 @@
+"""
+Image Download
+
+Streams URL-based results (DALL-E) to disk over a shared keep-alive
+connection pool, with a timeout, retries, a length check, SHA-256 and per-download stats.
+"""
+import hashlib
+import http.client
+import os
+import ssl
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Any
+from urllib.parse import urlsplit, urljoin
+
+
+# Defaults
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+DEFAULT_MAX_IDLE_PER_HOST = 8
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+
+# Statuses worth retrying; anything else non-2xx fails immediately
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Errors meaning a pooled keep-alive connection went stale under us
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class DownloadError(Exception):
+    """Raised when a download fails after all retries"""
+
+
+@dataclass
+class DownloadStats:
+    """What a download cost; merged into GenerationResult.metadata"""
+    bytes: int
+    seconds: float
+    sha256: str
+    attempts: int
+    reused_connection: bool
+    status: int
+
+    def as_metadata(self) -> Dict[str, Any]:
+        return {f"download_{key}": value for key, value in asdict(self).items()}
+
+
+class ConnectionPool:
+    """Thread-safe pool of idle keep-alive connections per (scheme, host, port)"""
+
+    def __init__(self, max_idle_per_host: int = DEFAULT_MAX_IDLE_PER_HOST):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+
+    def acquire(self, scheme: str, host: str, port: int, timeout: float):
+        """Return (connection, reused)"""
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=self._ssl_context
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def release(self, scheme: str, host: str, port: int, conn: http.client.HTTPConnection):
+        """Return a connection whose last response was fully read"""
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+class ImageDownloader:
+    """
+    Downloads images to disk through a shared ConnectionPool.
+
+    Bodies are streamed in chunks to a .part file, hashed on the way, then
+    renamed into place, so a failed download never leaves a truncated image.
+    """
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        retries: int = DEFAULT_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        max_idle_per_host: int = DEFAULT_MAX_IDLE_PER_HOST,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.chunk_size = chunk_size
+        self.pool = ConnectionPool(max_idle_per_host)
+
+    def download(
+        self,
+        url: str,
+        filepath: Path,
+        cancel_token=None
+    ) -> DownloadStats:
+        """
+        Download url to filepath. The body's SHA-256 is returned in the stats.
+
+        cancel_token (a cancellation.CancellationToken) is checked between
+        chunks and cuts retry backoff short; a cancelled download leaves no
+        file behind.
+
+        Raises:
+            DownloadError: after retries are exhausted, on a non-retryable
+                status, or if the body is shorter than its Content-Length
+            GenerationCancelled: if cancel_token is cancelled
+        """
+        start_time = time.time()
+        last_error: Optional[Exception] = None
+
+        for attempt in range(1, self.retries + 2):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            try:
+                status, size, sha256, reused = self._fetch(url, Path(filepath), cancel_token)
+            except DownloadError:
+                raise
+            except (OSError, http.client.HTTPException, _RetryableStatus) as e:
+                last_error = e
+                if attempt <= self.retries:
+                    delay = self.backoff_seconds * (2 ** (attempt - 1))
+                    if cancel_token is not None:
+                        cancel_token.sleep(delay)
+                    else:
+                        time.sleep(delay)
+                continue
+
+            return DownloadStats(
+                bytes=size,
+                seconds=time.time() - start_time,
+                sha256=sha256,
+                attempts=attempt,
+                reused_connection=reused,
+                status=status,
+            )
+
+        raise DownloadError(f"Download failed after {self.retries + 1} attempts: {last_error}")
+
+    def close(self):
+        self.pool.close()
+
+    def _fetch(self, url: str, filepath: Path, cancel_token=None):
+        """One attempt (following redirects). Returns (status, bytes, sha256, reused)."""
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            scheme = parts.scheme or "http"
+            port = parts.port or (443 if scheme == "https" else 80)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+
+            conn, reused = self.pool.acquire(scheme, parts.hostname, port, self.timeout)
+            try:
+                try:
+                    conn.request("GET", path, headers={"Accept": "image/*"})
+                    response = conn.getresponse()
+                except _STALE_CONNECTION_ERRORS:
+                    if not reused:
+                        raise
+                    # The server closed an idle pooled connection; retry fresh
+                    conn.close()
+                    conn, reused = self.pool.acquire(scheme, parts.hostname, port, self.timeout)
+                    conn.request("GET", path, headers={"Accept": "image/*"})
+                    response = conn.getresponse()
+
+                if response.status in (301, 302, 303, 307, 308):
+                    location = response.getheader("Location")
+                    if not location:
+                        raise DownloadError(f"Redirect without Location from {url}")
+                    response.read()
+                    self._finish(scheme, parts.hostname, port, conn, response)
+                    url = urljoin(url, location)
+                    continue
+
+                if response.status in RETRYABLE_STATUSES:
+                    raise _RetryableStatus(f"HTTP {response.status} from {url}")
+                if not 200 <= response.status < 300:
+                    raise DownloadError(f"HTTP {response.status} from {url}")
+
+                size, sha256 = self._stream_to_file(response, filepath, cancel_token)
+                expected_length = response.getheader("Content-Length")
+                if expected_length is not None and int(expected_length) != size:
+                    os.remove(filepath)
+                    raise _RetryableStatus(
+                        f"Truncated body from {url}: {size} of {expected_length} bytes"
+                    )
+            except BaseException:
+                # Connection state is unknown; never pool it
+                conn.close()
+                raise
+
+            self._finish(scheme, parts.hostname, port, conn, response)
+            return response.status, size, sha256, reused
+
+        raise DownloadError(f"Too many redirects from {url}")
+
+    def _stream_to_file(self, response, filepath: Path, cancel_token=None):
+        digest = hashlib.sha256()
+        size = 0
+        part_path = filepath.with_name(filepath.name + ".part")
+        try:
+            with open(part_path, 'wb') as f:
+                while True:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            os.replace(part_path, filepath)
+        except BaseException:
+            if part_path.exists():
+                part_path.unlink()
+            raise
+        return size, digest.hexdigest()
+
+    def _finish(self, scheme, host, port, conn, response):
+        """Pool the connection if the server allows keep-alive"""
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.release(scheme, host, port, conn)
+
+
+class _RetryableStatus(Exception):
+    """Internal: transient HTTP status or truncated body"""
+
+
+# Process-wide downloader shared by all generators
+_default_downloader: Optional[ImageDownloader] = None
+_default_lock = threading.Lock()
+
+
+def get_default_downloader() -> ImageDownloader:
+    """The shared ImageDownloader (created on first use)"""
+    global _default_downloader
+    with _default_lock:
+        if _default_downloader is None:
+            _default_downloader = ImageDownloader()
+        return _default_downloader
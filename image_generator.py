@@ -3,35 +3,222 @@ Image Generation Module
 
 Interfaces with image generation APIs via OpenAI or OpenRouter.
 """
+import abc
 import os
+import asyncio
 import base64
+import binascii
+import contextlib
+import hashlib
 import json
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable, Union, Iterable, Iterator, AsyncIterator
+from dataclasses import InitVar, dataclass, field, fields
+
+from image_assets import (
+    prepare_input_image, prepare_image_bytes, max_edge_for_model, sniff_mime_type
+)
+from image_download import ImageDownloader, get_default_downloader
+from client_registry import get_openai_client, get_async_openai_client
+from resilience import (
+    RetryPolicy, RetryStats, CircuitBreakers, call_with_retry, call_with_retry_async,
+    get_default_circuit_breakers
+)
+from rate_limit import RateLimiter
+from concurrency import AdaptiveConcurrency, get_default_concurrency
+from hedging import Hedger
+from cancellation import CancellationToken, GenerationCancelled, current_cancel_token, current_token
 
 # OpenAI client (works with OpenRouter too)
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
     print("Note: openai package not installed. Run: pip install openai")
 
 
+@dataclass(frozen=True)
+class ImageHandle:
+    """Lightweight reference to an image spilled to disk; bytes load on demand"""
+    path: str
+    size: int
+    sha256: str
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def read_base64(self) -> str:
+        return base64.b64encode(self.read_bytes()).decode('utf-8')
+
+    def data_url(self) -> str:
+        data = self.read_bytes()
+        mime_type = sniff_mime_type(data) or "image/png"
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "ImageHandle":
+        """Build a handle by hashing an existing file"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        return cls(path=str(path), size=size, sha256=digest.hexdigest())
+
+
 @dataclass
 class GenerationResult:
     """Result from an image generation attempt"""
     success: bool
     image_path: Optional[str] = None
     image_url: Optional[str] = None
-    image_base64: Optional[str] = None
+    # Constructor argument only; stored in _image_base64 and read through
+    # the image_base64 property below
+    image_base64: InitVar[Optional[str]] = None
     revised_prompt: Optional[str] = None
     error_message: Optional[str] = None
     model_used: str = ""
     generation_time_seconds: float = 0.0
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # Pending background write of image_path (see background_save)
+    save_future: Optional[Future] = field(default=None, repr=False, compare=False)
+    # Full "data:<mime>;base64,..." string as returned by the provider. When
+    # set, image_base64 is a view computed from it on access, so the image
+    # is held in memory once rather than as URL + payload copies.
+    image_data_url: Optional[str] = field(default=None, repr=False)
+    # Set in spill_to_disk mode: the image lives only on disk and
+    # image_base64 / image_data_url load from it on access. Kept out of
+    # repr and == so neither touches the file.
+    image_handle: Optional[ImageHandle] = field(default=None, repr=False, compare=False)
+    # Base64 payload as given (None when it is derived from the above)
+    _image_base64: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self, image_base64: Optional[str]):
+        # Without an argument the InitVar's default is the property itself
+        self._image_base64 = None if isinstance(image_base64, property) else image_base64
+
+    @property
+    def image_base64(self) -> Optional[str]:
+        """
+        The image as base64: as given, else sliced lazily from
+        image_data_url, else read from image_handle (only callers that ask
+        pay for the copy)
+        """
+        if self._image_base64 is None and self.image_data_url:
+            start = data_url_payload_offset(self.image_data_url)
+            if start >= 0:
+                return self.image_data_url[start:]
+        if self._image_base64 is None and self.image_handle is not None:
+            return self.image_handle.read_base64()
+        return self._image_base64
+
+    @image_base64.setter
+    def image_base64(self, value: Optional[str]):
+        self._image_base64 = value
+
+    def wait_until_saved(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Block until a background save of image_path has finished.
+
+        Returns image_path, or None if the write failed.
+        """
+        if self.save_future is not None:
+            if not self.save_future.result(timeout):
+                self.image_path = None
+            self.save_future = None
+        return self.image_path
+
+    def copy(self, **changes: Any) -> "GenerationResult":
+        """
+        Copy with changes applied. The metadata dict is copied; image
+        payloads are shared, and a lazy image_base64 stays lazy.
+        """
+        values = {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+        values["image_base64"] = self._image_base64
+        values["metadata"] = dict(self.metadata)
+        values.update(changes)
+        return GenerationResult(**values)
+
+
+@dataclass
+class GenerationEvent:
+    """
+    One step of a streamed generation (see generate_stream).
+
+    type is "started", "progress" (heartbeat while waiting), "partial_image"
+    (a progressive preview, from models that stream them), "completed" or
+    "failed" (one per final result, carrying it in result).
+    """
+    type: str
+    elapsed_seconds: float
+    index: int = 0
+    partial_index: Optional[int] = None
+    image_base64: Optional[str] = field(default=None, repr=False)
+    result: Optional[GenerationResult] = None
+
+
+# Base64 characters decoded per write when saving images (multiple of 4)
+BASE64_DECODE_CHUNK = 1024 * 1024
+
+
+def data_url_payload_offset(data_url: str) -> int:
+    """Index where the base64 payload of a data URL starts, or -1"""
+    if not data_url.startswith("data:"):
+        return -1
+    comma = data_url.find(",", 0, 256)
+    return comma + 1 if comma >= 0 else -1
+
+
+def decode_base64_to_file(
+    b64_text: str,
+    filepath: Path,
+    start: int = 0,
+    cancel_token: Optional[CancellationToken] = None
+) -> ImageHandle:
+    """
+    Decode base64 text (from offset start) straight to a file in chunks.
+
+    Only one chunk is ever copied at a time, so peak extra memory is
+    independent of image size. Returns a handle with the written size and
+    SHA-256. If cancel_token is cancelled mid-write the partial file is
+    removed and GenerationCancelled raised.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(filepath, 'wb') as f:
+            for pos in range(start, len(b64_text), BASE64_DECODE_CHUNK):
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                chunk = base64.b64decode(b64_text[pos:pos + BASE64_DECODE_CHUNK])
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+    except binascii.Error:
+        # Embedded whitespace/newlines break chunk alignment; decode in one go
+        data = base64.b64decode("".join(b64_text[start:].split()))
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        return ImageHandle(path=str(filepath), size=len(data), sha256=hashlib.sha256(data).hexdigest())
+    except GenerationCancelled:
+        Path(filepath).unlink(missing_ok=True)
+        raise
+    return ImageHandle(path=str(filepath), size=size, sha256=digest.hexdigest())
+
+
+# An input image: a file path, raw image bytes, or a previous result whose
+# already-encoded payload is passed straight through
+InputImage = Union[str, bytes, GenerationResult]
 
 
 # Aspect ratio to size mapping
@@ -65,16 +252,295 @@ NANO_BANANA_ASPECT_RATIOS = {
     "a4": "3:4",
 }
 
+# Model name that asks the generator's router to pick a model (see model_router)
+AUTO_MODEL = "auto"
+
+# Default number of per-variant API calls allowed in flight at once
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Progressive previews requested from models that stream them (gpt-image-1: 0-3)
+DEFAULT_PARTIAL_IMAGES = 2
+
+# Seconds between "progress" heartbeats while a streamed generation waits
+DEFAULT_PROGRESS_INTERVAL = 1.0
+
+# Provider Batch API (direct OpenAI only; see FlyerImageGenerator.generate_batch)
+BATCH_ENDPOINT = "/v1/images/generations"
+BATCH_MODELS = ["gpt-image-1", "dall-e-3"]
+MAX_BATCH_REQUESTS = 50000           # provider limit per input file
+DEFAULT_BATCH_POLL_SECONDS = 10.0    # first poll; doubles up to the max
+MAX_BATCH_POLL_SECONDS = 300.0
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+# generate()'s defaults, applied to each generate_batch() request
+BATCH_REQUEST_DEFAULTS: Dict[str, Any] = {
+    "negative_prompt": "",
+    "model": "nano-banana",
+    "aspect_ratio": "4:5",
+    "quality": "hd",
+    "n": 1,
+    "input_images": None,
+}
+
+
+def _cache_lookup(cache, output_dir: Path, save_images: bool, **request: Any):
+    """Fingerprint a request and look it up in cache. Returns (cache_key, cached_results)."""
+    if cache is None:
+        return None, None
+    try:
+        cache_key = cache.fingerprint(**request)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Warning: Not caching this request, could not fingerprint input images: {e}")
+        return None, None
+    return cache_key, cache.lookup(cache_key, output_dir, save_images)
+
+
+def _remaining(timeout: Optional[float], since: float) -> Optional[float]:
+    """What is left of timeout (None = unbounded) after waiting since `since`"""
+    if timeout is None:
+        return None
+    return max(timeout - (time.monotonic() - since), 0.001)
+
+
+def _with_timeout(options: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    """SDK request options with the timeout replaced (if bounded)"""
+    if timeout is None:
+        return options
+    return {**options, "timeout": timeout}
+
+
+# Cancellation token of the generate() call running in this thread / task
+# (cancellation.current_cancel_token), set per task by _run_timed
+_cancel_token = current_cancel_token
+_current_token = current_token
+
+
+def _bind_token(fn: Callable[..., Any], token: Optional[CancellationToken]) -> Callable[..., Any]:
+    """fn, run with token as the current cancellation token (for other threads)"""
+    if token is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        reset = _cancel_token.set(token)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _cancel_token.reset(reset)
+    return bound
+
+
+def _token_timeout(timeout: Optional[float], token: Optional[CancellationToken]) -> Optional[float]:
+    """timeout, cut down to the token's deadline if that comes first"""
+    remaining = token.remaining() if token is not None else None
+    if remaining is None:
+        return timeout
+    remaining = max(remaining, 0.001)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def _cancelled_result(result: GenerationResult, token: CancellationToken) -> GenerationResult:
+    """Failed result for a cancelled call; anything it saved is deleted"""
+    image_path = result.wait_until_saved() if result.image_path else None
+    if image_path:
+        Path(image_path).unlink(missing_ok=True)
+    return GenerationResult(
+        success=False,
+        error_message=f"Cancelled: {token.reason}",
+        model_used=result.model_used,
+        metadata={**result.metadata, "cancelled": True}
+    )
+
+
+def _result_event(result: GenerationResult, index: int, started: float) -> GenerationEvent:
+    """completed / failed event for one final result"""
+    return GenerationEvent(
+        type="completed" if result.success else "failed",
+        elapsed_seconds=time.monotonic() - started,
+        index=index,
+        result=result
+    )
+
+
+def _stream_events(
+    run: Callable[[Callable[[int, str], None]], Iterable[GenerationResult]],
+    progress_interval: float,
+    model: str,
+    on_close: Optional[Callable[[], None]] = None
+) -> Iterator[GenerationEvent]:
+    """
+    Iterate run(on_partial) on a worker thread, yielding the partial images
+    it reports, heartbeats while it waits, and each result as it arrives.
+    on_close is called if the consumer stops before the end.
+    """
+    started = time.monotonic()
+    events: queue.Queue = queue.Queue()
+
+    def on_partial(partial_index: int, b64_data: str):
+        events.put(GenerationEvent(
+            type="partial_image",
+            elapsed_seconds=time.monotonic() - started,
+            partial_index=partial_index,
+            image_base64=b64_data
+        ))
+
+    def worker():
+        index = 0
+        try:
+            for index, result in enumerate(run(on_partial), start=1):
+                events.put(_result_event(result, index - 1, started))
+        except Exception as e:
+            failure = GenerationResult(success=False, error_message=str(e), model_used=model)
+            events.put(_result_event(failure, index, started))
+        events.put(None)
+
+    # Daemon: a consumer that stops early doesn't keep the process alive
+    threading.Thread(target=worker, name="flyer-stream", daemon=True).start()
+    finished = False
+    try:
+        yield GenerationEvent(type="started", elapsed_seconds=0.0)
+        while True:
+            try:
+                event = events.get(timeout=progress_interval)
+            except queue.Empty:
+                yield GenerationEvent(type="progress", elapsed_seconds=time.monotonic() - started)
+                continue
+            if event is None:
+                finished = True
+                return
+            yield event
+    finally:
+        if not finished and on_close is not None:
+            on_close()
+
+
+async def _stream_events_async(
+    run: Callable[[Callable[[int, str], None]], AsyncIterator[GenerationResult]],
+    progress_interval: float,
+    model: str,
+    on_close: Optional[Callable[[], None]] = None
+) -> AsyncIterator[GenerationEvent]:
+    """asyncio counterpart of _stream_events; closing the stream cancels the generation"""
+    started = time.monotonic()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_partial(partial_index: int, b64_data: str):
+        events.put_nowait(GenerationEvent(
+            type="partial_image",
+            elapsed_seconds=time.monotonic() - started,
+            partial_index=partial_index,
+            image_base64=b64_data
+        ))
+
+    async def worker():
+        index = 0
+        try:
+            async for result in run(on_partial):
+                events.put_nowait(_result_event(result, index, started))
+                index += 1
+        except Exception as e:
+            failure = GenerationResult(success=False, error_message=str(e), model_used=model)
+            events.put_nowait(_result_event(failure, index, started))
+        events.put_nowait(None)
+
+    task = asyncio.ensure_future(worker())
+    try:
+        yield GenerationEvent(type="started", elapsed_seconds=0.0)
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), progress_interval)
+            except asyncio.TimeoutError:
+                yield GenerationEvent(type="progress", elapsed_seconds=time.monotonic() - started)
+                continue
+            if event is None:
+                return
+            yield event
+    finally:
+        if not task.done():
+            if on_close is not None:
+                on_close()
+            task.cancel()
+
+
+def _collect_image_stream(stream, on_partial: Callable[[int, str], None]) -> List[str]:
+    """Report an image stream's partial images; return the completed images' base64"""
+    images = []
+    with stream:
+        for event in stream:
+            if event.type == "image_generation.partial_image":
+                on_partial(event.partial_image_index, event.b64_json)
+            elif event.type == "image_generation.completed":
+                images.append(event.b64_json)
+    return images
+
+
+async def _collect_image_stream_async(stream, on_partial: Callable[[int, str], None]) -> List[str]:
+    """asyncio counterpart of _collect_image_stream"""
+    images = []
+    async with stream:
+        async for event in stream:
+            if event.type == "image_generation.partial_image":
+                on_partial(event.partial_image_index, event.b64_json)
+            elif event.type == "image_generation.completed":
+                images.append(event.b64_json)
+    return images
+
+
+def _batch_bodies(model: str, prompt: str, size: str, quality: str, n: int) -> List[Dict[str, Any]]:
+    """Images API request bodies for one generate() request in a batch"""
+    if model == "gpt-image-1":
+        gpt_quality = quality if quality in ["low", "medium", "high"] else "high"
+        return [{"model": "gpt-image-1", "prompt": prompt, "size": size, "quality": gpt_quality, "n": n}]
+    # DALL-E 3 makes one image per request. Its URLs expire long before a
+    # slow batch is collected, so ask for the image bytes instead.
+    dalle_quality = "hd" if quality in ["hd", "high"] else "standard"
+    return [
+        {"model": "dall-e-3", "prompt": prompt, "size": size, "quality": dalle_quality,
+         "style": "vivid", "n": 1, "response_format": "b64_json"}
+        for _ in range(n)
+    ]
+
+
+def _batch_entry_error(entry: Dict[str, Any]) -> Optional[str]:
+    """Error message of a batch output / error file line, or None if it succeeded"""
+    response = entry.get("response") or {}
+    body = response.get("body") or {}
+    error = entry.get("error") or body.get("error")
+    if error or response.get("status_code") != 200:
+        message = error.get("message") if isinstance(error, dict) else error
+        return message or f"HTTP {response.get('status_code')}"
+    return None
+
+
+def _describe_input(image: InputImage) -> str:
+    """Short label for an input image in warnings"""
+    if isinstance(image, GenerationResult):
+        return image.image_path or "previous result"
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return f"<{len(image)} bytes>"
+    return str(image)
+
+
+class _FlyerGeneratorBase(abc.ABC):
+    """Provider configuration and request/response handling shared by the sync and async generators"""
 
-class FlyerImageGenerator:
-    """Generates flyer images using AI models via OpenAI or OpenRouter"""
-    
     def __init__(
-        self, 
-        api_key: Optional[str] = None, 
+        self,
+        api_key: Optional[str] = None,
         output_dir: str = "./generated",
         use_openrouter: bool = False,
-        base_url: Optional[str] = None
+        base_url: Optional[str] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        cache=None,
+        background_save: bool = False,
+        spill_to_disk: bool = False,
+        downloader: Optional[ImageDownloader] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        circuit_breakers: Optional[CircuitBreakers] = None,
+        hedger: Optional[Hedger] = None,
+        single_flight=None,
+        router=None
     ):
         """
         Initialize the generator.
@@ -84,6 +550,29 @@ class FlyerImageGenerator:
             output_dir: Directory to save generated images
             use_openrouter: If True, use OpenRouter API instead of OpenAI directly
             base_url: Custom base URL (overrides use_openrouter setting)
+            max_concurrency: Max per-variant API calls in flight when n > 1
+            cache: Optional generation_cache.GenerationCache for repeat requests
+            background_save: Write images to disk on a background thread; results
+                carry their final image_path immediately (see wait_until_saved)
+            spill_to_disk: Drop saved images from memory; results keep an
+                ImageHandle and load image_base64 from disk on access
+            downloader: ImageDownloader for URL results (default: shared pool)
+            retry_policy: How transient API errors are retried (default: RetryPolicy())
+            rate_limiter: Paces calls per (provider, model) (default: no
+                pacing; pass rate_limit.get_default_rate_limiter() to share
+                one in-process budget, or a limiter with an SQLite backend to
+                share it across processes)
+            concurrency: AIMD in-flight limits per (provider, model), the one
+                in-process concurrency limit (default: shared controller;
+                see concurrency.metrics())
+            circuit_breakers: Fast-fail / fallback per (provider, model) when a
+                model keeps failing (default: shared breakers, no fallbacks)
+            hedger: Race a hedge request when a single-image call is slow
+                (default: no hedging)
+            single_flight: Optional single_flight.SingleFlight so identical
+                concurrent generate() calls share one provider call
+            router: Optional model_router.ModelRouter; picks the model when
+                generate() is called with model="auto" and learns from results
         """
         if not OPENAI_AVAILABLE:
             raise ImportError(
@@ -91,6 +580,7 @@ class FlyerImageGenerator:
             )
         
         self.use_openrouter = use_openrouter
+        self.provider = "openrouter" if use_openrouter else "openai"
         
         # Determine API key
         if api_key:
@@ -105,38 +595,1424 @@ class FlyerImageGenerator:
             raise ValueError(
                 f"API key required. Set {env_var} environment variable or pass api_key parameter."
             )
-        
-        # Determine base URL
-        if base_url:
-            self.base_url = base_url
-        elif use_openrouter:
-            self.base_url = "https://openrouter.ai/api/v1"
-        else:
-            self.base_url = None  # Use OpenAI default
-        
-        # Initialize client
-        if self.base_url:
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url,
-                default_headers={
-                    "HTTP-Referer": "https://flyer-generator.app",
-                    "X-Title": "Flyer Generator"
-                }
+        
+        # Determine base URL
+        if base_url:
+            self.base_url = base_url
+        elif use_openrouter:
+            self.base_url = "https://openrouter.ai/api/v1"
+        else:
+            self.base_url = None  # Use OpenAI default
+        
+        # Initialize client
+        self.client = self._create_client()
+        
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        self.background_save = background_save
+        self.spill_to_disk = spill_to_disk
+        self.downloader = downloader or get_default_downloader()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency or get_default_concurrency()
+        self.circuit_breakers = circuit_breakers or get_default_circuit_breakers()
+        self.hedger = hedger
+        self.single_flight = single_flight
+        self.router = router
+        # Results by outcome; cancellations are counted apart from failures
+        self.outcomes = {"succeeded": 0, "failed": 0, "cancelled": 0}
+        self._outcomes_lock = threading.Lock()
+        self._save_executor: Optional[ThreadPoolExecutor] = None
+        self._path_lock = threading.Lock()
+        self._reserved_paths = set()
+
+    @abc.abstractmethod
+    def _create_client(self):
+        """Return the API client (sync or async, per subclass), shared per provider"""
+
+    def metrics(self) -> Dict[str, int]:
+        """Generated results by outcome: succeeded, failed, cancelled"""
+        with self._outcomes_lock:
+            return dict(self.outcomes)
+
+    def _count_outcome(self, result: GenerationResult):
+        if result.metadata.get("cancelled"):
+            outcome = "cancelled"
+        else:
+            outcome = "succeeded" if result.success else "failed"
+        with self._outcomes_lock:
+            self.outcomes[outcome] += 1
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for constructing an OpenAI / AsyncOpenAI client"""
+        # Retries are handled by retry_policy, not the SDK
+        if self.base_url:
+            return {
+                "api_key": self.api_key,
+                "base_url": self.base_url,
+                "default_headers": {
+                    "HTTP-Referer": "https://flyer-generator.app",
+                    "X-Title": "Flyer Generator"
+                },
+                "max_retries": 0
+            }
+        return {"api_key": self.api_key, "max_retries": 0}
+    
+    def _get_model_name(self, model: str) -> str:
+        """Get the correct model name based on provider"""
+        if self.use_openrouter and model in OPENROUTER_MODELS:
+            return OPENROUTER_MODELS[model]
+        return model
+
+    def _choose_model(
+        self,
+        model: str,
+        aspect_ratio: str,
+        quality: str,
+        input_images: Optional[List[InputImage]]
+    ):
+        """
+        Resolve model="auto" through the router.
+
+        Returns:
+            (model, routing reason or None)
+        """
+        if model != AUTO_MODEL:
+            return model, None
+        if self.router is None:
+            raise ValueError(f'model="{AUTO_MODEL}" requires a router (see model_router.ModelRouter)')
+        decision = self.router.choose(
+            self.provider, aspect_ratio, quality, needs_input_images=bool(input_images)
+        )
+        return decision.model, decision.reason
+
+    def _routing_failures(
+        self,
+        error: ValueError,
+        model: str,
+        n: int,
+        prompt: str,
+        aspect_ratio: str
+    ) -> List[GenerationResult]:
+        """One failed result per requested image when the router can't place a request"""
+        results = []
+        for _ in range(max(1, n)):
+            result = GenerationResult(success=False, error_message=str(error), model_used=model)
+            self._annotate(result, prompt, aspect_ratio)
+            self._count_outcome(result)
+            results.append(result)
+        return results
+
+    def _cancelled_results(
+        self,
+        reason: str,
+        model: str,
+        n: int,
+        prompt: str,
+        aspect_ratio: str
+    ) -> List[GenerationResult]:
+        """One cancelled result per requested image, for a caller that stopped waiting"""
+        results = []
+        for _ in range(max(1, n)):
+            result = GenerationResult(
+                success=False,
+                error_message=f"Cancelled: {reason}",
+                model_used=model,
+                metadata={"cancelled": True}
+            )
+            self._annotate(result, prompt, aspect_ratio)
+            self._count_outcome(result)
+            results.append(result)
+        return results
+
+    def _rate_slot(self, model: str, timeout: Optional[float]):
+        """Rate limit token for one call (a no-op without a rate_limiter)"""
+        if self.rate_limiter is None:
+            return contextlib.nullcontext(0.0)
+        return self.rate_limiter.slot(self.provider, model, timeout)
+
+    def _rate_slot_async(self, model: str, timeout: Optional[float]):
+        if self.rate_limiter is None:
+            return contextlib.nullcontext(0.0)
+        return self.rate_limiter.slot_async(self.provider, model, timeout)
+
+    def _api_model(self, model: str) -> str:
+        """Model name calls are made (and rate limited / broken) under"""
+        # GPT Image is always called by its OpenAI name
+        return model if model == "gpt-image-1" else self._get_model_name(model)
+
+    def _route_model(self, model: str):
+        """
+        Swap in the configured fallback while a model's circuit is open.
+
+        Returns:
+            (model to use, original model if rerouted else None)
+        """
+        fallback = self.circuit_breakers.fallbacks.get(model)
+        if not fallback or not self.circuit_breakers.breaker(
+            self.provider, self._api_model(model)
+        ).is_open():
+            return model, None
+        if self.circuit_breakers.breaker(self.provider, self._api_model(fallback)).is_open():
+            return model, None
+        return fallback, model
+
+    def _prepare_request(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        model: str,
+        input_images: Optional[List[InputImage]]
+    ):
+        """Resolve the provider model name, full prompt and usable input images"""
+        # Get correct model name for provider
+        actual_model = self._get_model_name(model)
+
+        # Combine prompt with negative prompt
+        full_prompt = prompt
+        if negative_prompt:
+            full_prompt += f"\n\nAVOID: {negative_prompt}"
+
+        # Warn if input images provided but model doesn't support it
+        if input_images and model not in CHAT_COMPLETION_IMAGE_MODELS:
+            print(f"⚠️  Warning: {model} does not support input images. Logo will be ignored.")
+            print("   Use nano-banana or nano-banana-pro to include your logo.")
+            input_images = None
+
+        return full_prompt, actual_model, input_images
+
+    def _annotate(
+        self,
+        result: GenerationResult,
+        prompt: str,
+        aspect_ratio: str,
+        fallback_from: Optional[str] = None,
+        routing_reason: Optional[str] = None
+    ):
+        """Add request-level metadata to a result"""
+        result.metadata["prompt_length"] = len(prompt)
+        result.metadata["aspect_ratio"] = aspect_ratio
+        result.metadata["provider"] = self.provider
+        if fallback_from:
+            result.metadata["fallback_from"] = fallback_from
+        if routing_reason:
+            result.metadata["routing_reason"] = routing_reason
+
+    def _build_nano_banana_content(
+        self,
+        prompt: str,
+        input_images: Optional[List[InputImage]],
+        model: str
+    ) -> List[Dict[str, Any]]:
+        """Build chat message content - can include both text and images"""
+        content = []
+
+        # Add input images first (e.g., logo). Files are oriented, downscaled
+        # and re-encoded once, then served from the prepared-image cache;
+        # previous results are passed through without touching disk.
+        if input_images:
+            max_edge = max_edge_for_model(model)
+            for image in input_images:
+                try:
+                    data_url = self._input_image_data_url(image, max_edge)
+                except Exception as e:
+                    print(f"Warning: Could not load image {_describe_input(image)}: {e}")
+                    continue
+                if data_url:
+                    content.append({
+                        "type": "image_url",
+                        "image_url": {"url": data_url}
+                    })
+
+        # Add text prompt
+        content.append({"type": "text", "text": prompt})
+        return content
+
+    def _input_image_data_url(self, image: InputImage, max_edge: int) -> Optional[str]:
+        """Data URL for a path, raw bytes, or previous GenerationResult"""
+        if isinstance(image, GenerationResult):
+            if image.image_data_url:
+                return image.image_data_url
+            if image.image_handle is not None:
+                return image.image_handle.data_url()
+            if image.image_base64:
+                head = base64.b64decode(image.image_base64[:16])
+                mime_type = sniff_mime_type(head) or "image/png"
+                return f"data:{mime_type};base64,{image.image_base64}"
+            path = image.wait_until_saved()
+            return prepare_input_image(path, max_edge) if path else None
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return prepare_image_bytes(bytes(image), max_edge)
+        return prepare_input_image(image, max_edge)
+
+    def _nano_banana_request(
+        self,
+        prompt: str,
+        aspect_ratio: str,
+        model: str,
+        input_images: Optional[List[InputImage]]
+    ) -> Dict[str, Any]:
+        """Keyword arguments for a Nano Banana chat completions call"""
+        # Map aspect ratio
+        ar = NANO_BANANA_ASPECT_RATIOS.get(aspect_ratio, "1:1")
+        return {
+            "model": model,
+            "messages": [{
+                "role": "user",
+                "content": self._build_nano_banana_content(prompt, input_images, model)
+            }],
+            "extra_body": {
+                "modalities": ["image", "text"],
+                "image_config": {"aspect_ratio": ar}
+            }
+        }
+
+    def _extract_nano_banana_image(self, response) -> Optional[str]:
+        """Return the image data URL from a Nano Banana response, if any"""
+        # Extract image from response
+        message = response.choices[0].message
+
+        # Check for images in the response
+        # OpenRouter returns images as a list with image_url containing data URL
+        images = getattr(message, 'images', None)
+        if images and len(images) > 0:
+            image_data_url = images[0].get("image_url", {}).get("url", "")
+            # Data URL: "data:image/png;base64,..." - kept whole, not split,
+            # so the multi-megabyte payload isn't copied
+            if image_data_url and data_url_payload_offset(image_data_url) >= 0:
+                return image_data_url
+        return None
+
+    def _image_filepath(self, prefix: str, index: int) -> Path:
+        """Output path for a generated image, unique even within the same second"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        stem = f"{prefix}_{timestamp}_{index}"
+        with self._path_lock:
+            filepath = self.output_dir / f"{stem}.png"
+            suffix = 1
+            while filepath in self._reserved_paths or filepath.exists():
+                filepath = self.output_dir / f"{stem}_{suffix}.png"
+                suffix += 1
+            self._reserved_paths.add(filepath)
+            # Only same-second collisions matter; forget older reservations
+            if len(self._reserved_paths) > 1024:
+                self._reserved_paths = {filepath}
+        return filepath
+    
+    def _save_image_from_url(
+        self, 
+        url: str, 
+        prefix: str, 
+        index: int
+    ) -> Optional[Path]:
+        """Download and save image from URL"""
+        result = GenerationResult(success=True, image_url=url)
+        self._download_image(result, prefix, index)
+        return Path(result.image_path) if result.image_path else None
+
+    def _download_image(self, result: GenerationResult, prefix: str, index: int):
+        """
+        Download result.image_url through the shared connection pool.
+
+        Sets image_path and records download latency, bytes, attempts and
+        SHA-256 in result.metadata.
+        """
+        try:
+            filepath = self._image_filepath(prefix, index)
+            stats = self.downloader.download(
+                result.image_url, filepath, cancel_token=_current_token()
+            )
+        except GenerationCancelled:
+            return
+        except Exception as e:
+            print(f"Warning: Failed to save image from URL: {e}")
+            result.metadata["download_error"] = str(e)
+            return
+
+        result.image_path = str(filepath)
+        result.metadata.update(stats.as_metadata())
+        if self.spill_to_disk:
+            result.image_handle = ImageHandle(
+                path=str(filepath), size=stats.bytes, sha256=stats.sha256
+            )
+    
+    def _save_image_from_base64(
+        self,
+        b64_data: str,
+        prefix: str,
+        index: int,
+        filepath: Optional[Path] = None,
+        start: int = 0
+    ) -> Optional[Path]:
+        """Save base64 image data (from offset start) to file"""
+        handle = self._write_image(b64_data, prefix, index, filepath, start)
+        return Path(handle.path) if handle else None
+
+    def _write_image(
+        self,
+        b64_data: str,
+        prefix: str,
+        index: int,
+        filepath: Optional[Path] = None,
+        start: int = 0,
+        result: Optional[GenerationResult] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Optional[ImageHandle]:
+        """Decode base64 image data to file; in spill_to_disk mode, move result onto the handle"""
+        try:
+            filepath = filepath or self._image_filepath(prefix, index)
+            handle = decode_base64_to_file(b64_data, filepath, start, cancel_token)
+        except GenerationCancelled:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to save image from base64: {e}")
+            return None
+
+        if result is not None and self.spill_to_disk:
+            # Handle first, so concurrent readers never see neither
+            result.image_handle = handle
+            result.image_data_url = None
+            result.image_base64 = None
+        return handle
+
+    def _hedge_target(self, model: str):
+        """(generator, model) to hedge a call to model with, or None"""
+        if self.hedger is None:
+            return None
+        target = self.hedger.target_for(self, model)
+        if target is None:
+            return None
+        # The hedge has to be served by the same kind of API call
+        if (target[1] in CHAT_COMPLETION_IMAGE_MODELS) != (model in CHAT_COMPLETION_IMAGE_MODELS):
+            return None
+        return target
+
+    def _hedge_winner(self, result: GenerationResult, hedge_generator):
+        """Note which provider served a hedged result"""
+        if result.metadata.get("hedge_winner") == "hedge":
+            result.metadata["hedge_provider"] = hedge_generator.provider
+
+    def _save_result(self, result: GenerationResult, prefix: str, index: int):
+        """Save a result produced with save=False (URL or base64)"""
+        if result.image_url and not (result.image_data_url or result.image_base64):
+            self._download_image(result, prefix, index)
+        else:
+            self._persist_image(result, prefix, index)
+
+    def _persist_image(self, result: GenerationResult, prefix: str, index: int):
+        """
+        Save a result's base64 image and set its image_path.
+
+        With background_save the path is assigned up front and the write is
+        queued; result.save_future tracks it.
+        """
+        # Decode straight from the provider's data URL when there is one
+        if result.image_data_url:
+            source = result.image_data_url
+            start = data_url_payload_offset(source)
+        else:
+            source, start = result.image_base64, 0
+
+        token = _current_token()
+        if not self.background_save:
+            handle = self._write_image(
+                source, prefix, index, start=start, result=result, cancel_token=token
+            )
+            result.image_path = handle.path if handle else None
+            return
+
+        if self._save_executor is None:
+            self._save_executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="flyer-save"
+            )
+        filepath = self._image_filepath(prefix, index)
+        result.image_path = str(filepath)
+        result.save_future = self._save_executor.submit(
+            self._write_image, source, prefix, index, filepath, start, result, token
+        )
+
+
+class FlyerImageGenerator(_FlyerGeneratorBase):
+    """Generates flyer images using AI models via OpenAI or OpenRouter"""
+
+    def _create_client(self):
+        return get_openai_client(**self._client_kwargs())
+    
+    def generate(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        model: str = "nano-banana",
+        aspect_ratio: str = "4:5",
+        quality: str = "hd",
+        n: int = 1,
+        save_images: bool = True,
+        input_images: Optional[List[InputImage]] = None,
+        max_concurrency: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[GenerationResult]:
+        """
+        Generate flyer image(s).
+
+        When n > 1, the per-variant API calls run concurrently (up to
+        max_concurrency at once) and results are returned in completion
+        order. Each result's generation_time_seconds is the measured
+        latency of its own call.
+
+        Args:
+            prompt: Main generation prompt
+            negative_prompt: What to avoid (appended to prompt)
+            model: "nano-banana", "nano-banana-pro", "dall-e-3", or "gpt-image-1"
+            aspect_ratio: "1:1", "4:5", "9:16", "16:9", "letter", "a4"
+            quality: "low", "medium", "high", "hd" (model-dependent)
+            n: Number of images to generate (1-4)
+            save_images: Whether to save to disk
+            input_images: Images to include (e.g., logo) - only for Nano Banana. Each is
+                a file path, raw image bytes, or a previous GenerationResult (for
+                edit/refine chains; its in-memory payload is reused)
+            max_concurrency: Override the generator's max in-flight calls
+            cancel_token: cancellation.CancellationToken (optionally with a
+                deadline). Once cancelled, in-flight provider calls are
+                abandoned, downloads and writes stop, files already saved
+                for the request are removed, and results come back failed
+                with metadata["cancelled"] = True
+
+        Returns:
+            List of GenerationResult objects, in completion order
+        """
+        flight_key = None
+        if self.single_flight is not None:
+            flight_key = self.single_flight.key(
+                f"{self.provider}:{int(save_images)}", prompt=prompt,
+                negative_prompt=negative_prompt, model=model, aspect_ratio=aspect_ratio,
+                quality=quality, n=n, input_images=input_images
+            )
+        if flight_key is not None:
+            # Identical requests already in flight share that call's
+            # results; this caller waits under its own token
+            try:
+                return self.single_flight.run(
+                    flight_key,
+                    lambda flight_token: self._generate(
+                        prompt, negative_prompt, model, aspect_ratio, quality, n,
+                        save_images, input_images, max_concurrency, cancel_token=flight_token
+                    ),
+                    self.output_dir,
+                    cancel_token
+                )
+            except GenerationCancelled as e:
+                return self._cancelled_results(str(e), model, n, prompt, aspect_ratio)
+        return self._generate(
+            prompt, negative_prompt, model, aspect_ratio, quality, n,
+            save_images, input_images, max_concurrency, cancel_token=cancel_token
+        )
+
+    def generate_stream(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        model: str = "nano-banana",
+        aspect_ratio: str = "4:5",
+        quality: str = "hd",
+        n: int = 1,
+        save_images: bool = True,
+        input_images: Optional[List[InputImage]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[GenerationEvent]:
+        """
+        Generate flyer image(s), yielding GenerationEvents as they happen.
+
+        gpt-image-1 (n=1) streams partial_images progressive previews before
+        the final image. Other models send "progress" heartbeats every
+        progress_interval seconds and one event per final result. Every event
+        carries the elapsed time since the call. Streams are not coalesced
+        by single_flight.
+
+        Args:
+            partial_images: Progressive previews to request (0 = none)
+            progress_interval: Seconds between heartbeats while waiting
+            cancel_token: As for generate(); closing the stream early also
+                cancels the generation
+            (others as for generate)
+
+        Yields:
+            "started", then "progress" / "partial_image" events, with a
+            "completed" or "failed" event as each result finishes
+        """
+        # Own token, so that closing the stream cancels only this request
+        token = CancellationToken(parent=cancel_token)
+        return _stream_events(
+            lambda on_partial: self._iter_generate(
+                prompt, negative_prompt, model, aspect_ratio, quality, n,
+                save_images, input_images, None,
+                on_partial if partial_images else None, partial_images, token
+            ),
+            progress_interval,
+            model,
+            on_close=lambda: token.cancel("stream closed")
+        )
+
+    def generate_iter(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        model: str = "nano-banana",
+        aspect_ratio: str = "4:5",
+        quality: str = "hd",
+        n: int = 1,
+        save_images: bool = True,
+        input_images: Optional[List[InputImage]] = None,
+        max_concurrency: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[GenerationResult]:
+        """
+        Generate flyer image(s), yielding each result as soon as its call
+        completes. Arguments are as for generate().
+
+        Each result's generation_time_seconds is its own call's latency.
+        Calls are started lazily: at most max_concurrency results are in
+        flight or waiting to be consumed, so a slow consumer slows the
+        requests down instead of piling up results. Stopping early leaves
+        calls already in flight to finish in the background (discarded);
+        the request is only cached once fully consumed. Not coalesced by
+        single_flight.
+        """
+        return self._iter_generate(
+            prompt, negative_prompt, model, aspect_ratio, quality, n,
+            save_images, input_images, max_concurrency, cancel_token=cancel_token
+        )
+
+    def _generate(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        model: str,
+        aspect_ratio: str,
+        quality: str,
+        n: int,
+        save_images: bool,
+        input_images: Optional[List[InputImage]],
+        max_concurrency: Optional[int],
+        on_partial: Optional[Callable[[int, str], None]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[GenerationResult]:
+        """
+        generate() without single-flight coalescing. on_partial(index, b64)
+        receives progressive previews where the model streams them.
+        """
+        return list(self._iter_generate(
+            prompt, negative_prompt, model, aspect_ratio, quality, n, save_images,
+            input_images, max_concurrency, on_partial, partial_images, cancel_token
+        ))
+
+    def _iter_generate(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        model: str,
+        aspect_ratio: str,
+        quality: str,
+        n: int,
+        save_images: bool,
+        input_images: Optional[List[InputImage]],
+        max_concurrency: Optional[int],
+        on_partial: Optional[Callable[[int, str], None]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[GenerationResult]:
+        """Yield _generate()'s results as they complete"""
+        # Let the router pick the model when asked to
+        try:
+            model, routing_reason = self._choose_model(model, aspect_ratio, quality, input_images)
+        except ValueError as e:
+            yield from self._routing_failures(e, model, n, prompt, aspect_ratio)
+            return
+
+        # Reroute to the fallback model while this one's circuit is open
+        model, fallback_from = self._route_model(model)
+
+        # Get appropriate size for aspect ratio (for DALL-E/GPT models)
+        size = ASPECT_RATIO_TO_SIZE.get(aspect_ratio, "1024x1024")
+
+        full_prompt, actual_model, input_images = self._prepare_request(
+            prompt, negative_prompt, model, input_images
+        )
+
+        cache_key, cached = _cache_lookup(
+            self.cache, self.output_dir, save_images, prompt=prompt,
+            negative_prompt=negative_prompt, model=model, aspect_ratio=aspect_ratio,
+            quality=quality, n=n, input_images=input_images
+        )
+        if cached is not None:
+            yield from cached
+            return
+
+        # Build one task per API call. Nano Banana and DALL-E 3 return a
+        # single image per call; GPT Image returns all n in one call.
+        if model in CHAT_COMPLETION_IMAGE_MODELS:
+            # Use chat completions API (Nano Banana models)
+            tasks = [
+                lambda i=i: [self._generate_one(
+                    model, "nanobanana", i, save_images,
+                    lambda gen, m, save, i=i: gen._generate_nano_banana(
+                        full_prompt, aspect_ratio, save, i, gen._get_model_name(m), input_images
+                    )
+                )]
+                for i in range(n)
+            ]
+        elif model == "gpt-image-1":
+            # Use GPT Image API (direct OpenAI only)
+            tasks = [
+                lambda: self._generate_gpt_image(
+                    full_prompt, size, quality, n, save_images,
+                    # Streamed previews carry no image index; stream single images only
+                    on_partial if n == 1 else None, partial_images
+                )
+            ]
+        else:
+            # Use DALL-E 3 API (default fallback)
+            tasks = [
+                lambda i=i: [self._generate_one(
+                    model, "dalle3", i, save_images,
+                    lambda gen, m, save, i=i: gen._generate_dalle3(
+                        full_prompt, size, quality, save, i, gen._get_model_name(m)
+                    )
+                )]
+                for i in range(n)
+            ]
+
+        results = []
+        for result in self._iter_tasks(tasks, max_concurrency, actual_model, cancel_token):
+            self._annotate(result, prompt, aspect_ratio, fallback_from, routing_reason)
+            self._count_outcome(result)
+            results.append(result)
+            yield result
+
+        # Only a fully consumed request is observed / cached
+        if self.router is not None:
+            self.router.observe(results)
+
+        if cache_key is not None and not any(r.metadata.get("cancelled") for r in results):
+            self.cache.store(cache_key, results)
+
+    def _iter_tasks(
+        self,
+        tasks: List[Callable[[], List[GenerationResult]]],
+        max_concurrency: Optional[int],
+        model: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[GenerationResult]:
+        """
+        Run generation tasks concurrently, yielding results as they complete.
+
+        At most limit tasks are running or finished-but-unconsumed at once:
+        the next task starts only after a finished one has been handed to
+        the consumer, so a slow consumer holds back new API calls.
+        """
+        limit = max(1, min(len(tasks), max_concurrency or self.max_concurrency))
+
+        if limit == 1:
+            for task in tasks:
+                yield from self._run_timed(task, model, cancel_token)
+            return
+
+        queued = iter(tasks)
+        executor = ThreadPoolExecutor(max_workers=limit)
+        try:
+            running = {
+                executor.submit(self._run_timed, task, model, cancel_token)
+                for task in islice(queued, limit)
+            }
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+                    for task in islice(queued, 1):
+                        running.add(executor.submit(self._run_timed, task, model, cancel_token))
+        finally:
+            # A consumer that stops early doesn't wait for calls still in flight
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_timed(
+        self,
+        task: Callable[[], List[GenerationResult]],
+        model: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[GenerationResult]:
+        """
+        Run a single generation task and stamp its measured latency. If
+        cancel_token is cancelled by the end, its results are discarded.
+        """
+        start_time = time.time()
+        reset = _cancel_token.set(cancel_token)
+        try:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            results = task()
+        except Exception as e:
+            results = [GenerationResult(
+                success=False,
+                error_message=str(e),
+                model_used=model
+            )]
+        finally:
+            _cancel_token.reset(reset)
+
+        if cancel_token is not None and cancel_token.cancelled:
+            results = [_cancelled_result(result, cancel_token) for result in results]
+
+        elapsed = time.time() - start_time
+        for result in results:
+            result.generation_time_seconds = elapsed
+        return results
+    
+    def _generate_one(
+        self,
+        model: str,
+        prefix: str,
+        index: int,
+        save: bool,
+        generate_with: Callable[[Any, str, bool], GenerationResult]
+    ) -> GenerationResult:
+        """
+        Produce one image via generate_with(generator, model, save),
+        racing a hedge request if a hedger is configured
+        """
+        target = self._hedge_target(model)
+        if target is None:
+            return generate_with(self, model, save)
+
+        hedge_generator, hedge_model = target
+        # Neither side saves; only the winner is written to disk. Both run
+        # on the hedger's threads under their own child of the caller's
+        # token, so the loser can be cancelled (freeing its slots) alone.
+        token = _current_token()
+        primary_token = CancellationToken(parent=token)
+        hedge_token = CancellationToken(parent=token)
+        result = self.hedger.run(
+            _bind_token(lambda: generate_with(self, model, False), primary_token),
+            _bind_token(lambda: generate_with(hedge_generator, hedge_model, False), hedge_token),
+            key=f"{self.provider}|{self._api_model(model)}",
+            cancel_primary=lambda: primary_token.cancel("hedge won"),
+            cancel_hedge=lambda: hedge_token.cancel("primary won")
+        )
+        self._hedge_winner(result, hedge_generator)
+        if save and result.success:
+            self._save_result(result, prefix, index)
+        return result
+
+    def _call_api(
+        self,
+        model: str,
+        call: Callable[[Dict[str, Any]], Any],
+        retry_stats: RetryStats
+    ) -> Any:
+        """
+        Make one provider API call under the circuit breaker, retry policy,
+        adaptive concurrency limit and rate limit (taken in that order, so a
+        call waiting for a concurrency slot hasn't spent a rate token)
+        """
+        breaker = self.circuit_breakers.breaker(self.provider, model)
+        token = _current_token()
+
+        def attempt(options: Dict[str, Any]) -> Any:
+            if token is not None:
+                token.raise_if_cancelled()
+            breaker.before_call()
+            timeout = _token_timeout(options.get("timeout"), token)
+            queued_at = time.monotonic()
+            reached_provider = False
+            try:
+                with self.concurrency.slot(self.provider, model, timeout) as slot:
+                    with self._rate_slot(model, _remaining(timeout, queued_at)):
+                        slot.restart_clock()
+                        retry_stats.queue_wait_seconds += time.monotonic() - queued_at
+                        reached_provider = True
+                        request_options = _with_timeout(options, _remaining(timeout, queued_at))
+                        if token is None:
+                            response = call(request_options)
+                        else:
+                            response = token.run(lambda: call(request_options))
+            except BaseException as e:
+                if reached_provider:
+                    breaker.record_failure(e)
+                else:
+                    breaker.abandon()
+                raise
+            breaker.record_success()
+            return response
+
+        return call_with_retry(attempt, self.retry_policy, retry_stats, token)
+
+    def _generate_dalle3(
+        self,
+        prompt: str,
+        size: str,
+        quality: str,
+        save: bool,
+        index: int,
+        model: str = "dall-e-3"
+    ) -> GenerationResult:
+        """Generate with DALL-E 3"""
+        retry_stats = RetryStats()
+        try:
+            # Map quality
+            dalle_quality = "hd" if quality in ["hd", "high"] else "standard"
+            
+            response = self._call_api(
+                model,
+                lambda options: self.client.images.generate(
+                    model=model,
+                    prompt=prompt,
+                    size=size,
+                    quality=dalle_quality,
+                    style="vivid",
+                    n=1,
+                    **options
+                ),
+                retry_stats
+            )
+            
+            result = GenerationResult(
+                success=True,
+                image_url=response.data[0].url,
+                revised_prompt=response.data[0].revised_prompt,
+                model_used="dall-e-3",
+                metadata={"size": size, "quality": dalle_quality, **retry_stats.as_metadata()}
+            )
+            
+            # Download and save
+            if save and result.image_url:
+                self._download_image(result, "dalle3", index)
+            
+            return result
+        
+        except Exception as e:
+            return GenerationResult(
+                success=False,
+                error_message=str(e),
+                model_used="dall-e-3",
+                metadata=retry_stats.as_metadata()
+            )
+
+    def _generate_nano_banana(
+        self,
+        prompt: str,
+        aspect_ratio: str,
+        save: bool,
+        index: int,
+        model: str,
+        input_images: Optional[List[InputImage]] = None
+    ) -> GenerationResult:
+        """Generate with Nano Banana via chat completions API"""
+        retry_stats = RetryStats()
+        try:
+            request = self._nano_banana_request(prompt, aspect_ratio, model, input_images)
+            response = self._call_api(
+                model,
+                lambda options: self.client.chat.completions.create(**request, **options),
+                retry_stats
+            )
+
+            image_data_url = self._extract_nano_banana_image(response)
+            if image_data_url:
+                result = GenerationResult(
+                    success=True,
+                    image_data_url=image_data_url,
+                    model_used=model,
+                    metadata={
+                        "aspect_ratio": NANO_BANANA_ASPECT_RATIOS.get(aspect_ratio, "1:1"),
+                        "has_logo": bool(input_images),
+                        **retry_stats.as_metadata()
+                    }
+                )
+                if save:
+                    self._persist_image(result, "nanobanana", index)
+                return result
+
+            return GenerationResult(
+                success=False,
+                error_message="No image in response",
+                model_used=model,
+                metadata=retry_stats.as_metadata()
+            )
+
+        except Exception as e:
+            return GenerationResult(
+                success=False,
+                error_message=str(e),
+                model_used=model,
+                metadata=retry_stats.as_metadata()
+            )
+
+    def _generate_gpt_image(
+        self,
+        prompt: str,
+        size: str,
+        quality: str,
+        n: int,
+        save: bool,
+        on_partial: Optional[Callable[[int, str], None]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES
+    ) -> List[GenerationResult]:
+        """Generate with GPT-Image-1 (streaming partial images to on_partial if given)"""
+        results = []
+        retry_stats = RetryStats()
+        
+        try:
+            # Map quality
+            gpt_quality = quality if quality in ["low", "medium", "high"] else "high"
+            
+            def request(options: Dict[str, Any]) -> List[str]:
+                kwargs = dict(model="gpt-image-1", prompt=prompt, size=size,
+                              quality=gpt_quality, n=n, **options)
+                if on_partial is None:
+                    return [d.b64_json for d in self.client.images.generate(**kwargs).data]
+                # Consumed inside the call so the rate / concurrency slot
+                # covers the whole stream and a dropped stream is retried
+                stream = self.client.images.generate(
+                    stream=True, partial_images=partial_images, **kwargs
+                )
+                return _collect_image_stream(stream, on_partial)
+
+            images = self._call_api("gpt-image-1", request, retry_stats)
+            
+            for i, b64_data in enumerate(images):
+                result = GenerationResult(
+                    success=True,
+                    image_base64=b64_data,
+                    model_used="gpt-image-1",
+                    metadata={"size": size, "quality": gpt_quality, **retry_stats.as_metadata()}
+                )
+                
+                # Save to file
+                if save and result.image_base64:
+                    self._persist_image(result, "gptimg", i)
+                
+                results.append(result)
+        
+        except Exception as e:
+            results.append(GenerationResult(
+                success=False,
+                error_message=str(e),
+                model_used="gpt-image-1",
+                metadata=retry_stats.as_metadata()
+            ))
+        
+        return results
+
+    def generate_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        save_images: bool = True,
+        poll_interval: float = DEFAULT_BATCH_POLL_SECONDS,
+        max_poll_interval: float = MAX_BATCH_POLL_SECONDS,
+        cancel_token: Optional[CancellationToken] = None,
+        on_status: Optional[Callable[[Any], None]] = None
+    ) -> List[List[GenerationResult]]:
+        """
+        Generate many requests through the provider's asynchronous Batch API
+        (discounted, but may take up to 24 hours) instead of one call each.
+
+        Identical requests are sent once and share the images (copies are
+        marked metadata["coalesced"]); requests already in the cache aren't
+        sent. Requests the Batch API can't serve (OpenRouter, Nano Banana)
+        fall back to generate() while the batch runs. A line that fails
+        inside the batch, or is still unprocessed when the batch fails or
+        expires, is generated again with generate() (its results carry
+        metadata["batch_error"]) without affecting the others; lines of a
+        cancelled batch come back as cancelled results.
+
+        Args:
+            requests: generate() keyword arguments, one dict per request
+            save_images: Whether to save to disk (batch images are kept on
+                disk only, behind an ImageHandle)
+            poll_interval: Seconds before the first status check; doubles
+                after each check up to max_poll_interval
+            max_poll_interval: Longest wait between status checks
+            cancel_token: Cancels the batch at the provider (results of
+                batches that already finished are kept)
+            on_status: Called with the provider's batch object at every poll
+
+        Returns:
+            One list of GenerationResult per request, in request order
+        """
+        outcomes: List[Optional[List[GenerationResult]]] = [None] * len(requests)
+        groups: Dict[str, Dict[str, Any]] = {}     # identical bodies -> requests
+        fallbacks = []
+        for index, request in enumerate(requests):
+            request = {**BATCH_REQUEST_DEFAULTS, **request}
+            try:
+                model, routing_reason = self._choose_model(
+                    request["model"], request["aspect_ratio"], request["quality"], request["input_images"]
+                )
+            except ValueError as e:
+                outcomes[index] = self._routing_failures(
+                    e, request["model"], request["n"], request["prompt"], request["aspect_ratio"]
+                )
+                continue
+            if self.provider != "openai" or model not in BATCH_MODELS:
+                fallbacks.append(index)
+                continue
+
+            full_prompt, _, input_images = self._prepare_request(
+                request["prompt"], request["negative_prompt"], model, request["input_images"]
+            )
+            cache_key, cached = _cache_lookup(
+                self.cache, self.output_dir, save_images, prompt=request["prompt"],
+                negative_prompt=request["negative_prompt"], model=model,
+                aspect_ratio=request["aspect_ratio"], quality=request["quality"],
+                n=request["n"], input_images=input_images
+            )
+            if cached is not None:
+                outcomes[index] = cached
+                continue
+
+            size = ASPECT_RATIO_TO_SIZE.get(request["aspect_ratio"], "1024x1024")
+            bodies = _batch_bodies(model, full_prompt, size, request["quality"], request["n"])
+            group = groups.setdefault(
+                json.dumps(bodies, sort_keys=True), {"bodies": bodies, "members": []}
+            )
+            group["members"].append((index, request, routing_reason, cache_key))
+
+        if fallbacks and groups:
+            print(f"⚠️  Warning: {len(fallbacks)} request(s) can't use the Batch API "
+                  f"(it serves {', '.join(BATCH_MODELS)} on OpenAI only); generating them directly.")
+
+        started = time.monotonic()
+        bodies_by_id: Dict[str, Dict[str, Any]] = {}
+        batches = self._submit_batches(groups, bodies_by_id, cancel_token) if groups else {}
+
+        for index in fallbacks:
+            request = {**BATCH_REQUEST_DEFAULTS, **requests[index]}
+            # The batch's own save_images / cancel_token apply to every request
+            outcomes[index] = self.generate(
+                **{**request, "save_images": save_images, "cancel_token": cancel_token}
+            )
+
+        units: Dict[str, List[GenerationResult]] = {}
+        finished = self._poll_batches(
+            batches, poll_interval, max_poll_interval, cancel_token, on_status
+        )
+        for batch in finished.values():
+            units.update(self._ingest_batch(batch, bodies_by_id, save_images))
+
+        elapsed = time.monotonic() - started
+        stored = set()
+        for group in groups.values():
+            results = []
+            first_request = group["members"][0][1]
+            for custom_id in group["custom_ids"]:
+                unit = units.get(custom_id) or [self._batch_missing_result(
+                    bodies_by_id[custom_id], group, finished, cancel_token
+                )]
+                results.extend(self._batch_fallback(
+                    unit, bodies_by_id[custom_id], first_request, save_images, cancel_token
+                ))
+            for member, (index, request, routing_reason, cache_key) in enumerate(group["members"]):
+                if member > 0:
+                    results = [r.copy(metadata={**r.metadata, "coalesced": True}) for r in results]
+                for result in results:
+                    if member == 0 and "batch_error" in result.metadata:
+                        continue    # made by generate(), already annotated and counted
+                    result.generation_time_seconds = elapsed
+                    self._annotate(result, request["prompt"], request["aspect_ratio"], None, routing_reason)
+                    self._count_outcome(result)
+                if (cache_key is not None and cache_key not in stored
+                        and not any(r.metadata.get("cancelled") for r in results)):
+                    self.cache.store(cache_key, results)
+                    stored.add(cache_key)
+                outcomes[index] = results
+        return outcomes
+
+    def _submit_batches(
+        self,
+        groups: Dict[str, Dict[str, Any]],
+        bodies_by_id: Dict[str, Dict[str, Any]],
+        cancel_token: Optional[CancellationToken]
+    ) -> Dict[str, Any]:
+        """
+        Write the request bodies to JSONL input files (MAX_BATCH_REQUESTS
+        lines each), upload them and start a batch per file. Fills in each
+        group's custom_ids / batch_id and bodies_by_id.
+
+        Returns:
+            Provider batch objects by batch id
+        """
+        batches = {}
+        pending_groups = []
+        input_file = None
+        lines = 0
+
+        def submit():
+            try:
+                batch = self._submit_batch(input_file, cancel_token)
+                batches[batch.id] = batch
+                for group in pending_groups:
+                    group["batch_id"] = batch.id
+            except GenerationCancelled:
+                pass    # no batch_id: reported as cancelled
+            except Exception as e:
+                print(f"Warning: Failed to submit batch: {e}")
+                for group in pending_groups:
+                    group["error"] = f"Batch submission failed: {e}"
+            finally:
+                input_file.close()
+                pending_groups.clear()
+
+        for number, group in enumerate(groups.values()):
+            # A request's lines stay in one batch, so it shares one outcome
+            if input_file is not None and lines + len(group["bodies"]) > MAX_BATCH_REQUESTS:
+                submit()
+                input_file = None
+            if input_file is None:
+                input_file = tempfile.TemporaryFile(mode="w+b")
+                lines = 0
+            group["custom_ids"] = []
+            for part, body in enumerate(group["bodies"]):
+                custom_id = f"flyer-{number}-{part}"
+                line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+                input_file.write(json.dumps(line).encode("utf-8") + b"\n")
+                group["custom_ids"].append(custom_id)
+                bodies_by_id[custom_id] = body
+                lines += 1
+            pending_groups.append(group)
+        submit()
+        return batches
+
+    def _submit_batch(self, input_file, cancel_token: Optional[CancellationToken]):
+        """Upload one JSONL input file and create a batch over it"""
+        input_file.seek(0)
+        digest = hashlib.sha256(input_file.read()).hexdigest()[:32]
+
+        def upload(options: Dict[str, Any]):
+            input_file.seek(0)
+            return self.client.files.create(
+                file=("flyer_batch.jsonl", input_file), purpose="batch", **options
+            )
+
+        uploaded = call_with_retry(upload, self.retry_policy, RetryStats(), cancel_token)
+        attempts = 0
+
+        def create(options: Dict[str, Any]):
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                # The failed attempt may have created the batch after all
+                # (e.g. the response was lost); don't pay for it twice
+                for existing in self.client.batches.list(limit=100, **options).data:
+                    if (existing.metadata or {}).get("flyer_input_sha256") == digest:
+                        return existing
+            return self.client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window="24h",
+                metadata={"flyer_input_sha256": digest},
+                **options
+            )
+
+        return call_with_retry(create, self.retry_policy, RetryStats(), cancel_token)
+
+    def _poll_batches(
+        self,
+        batches: Dict[str, Any],
+        poll_interval: float,
+        max_poll_interval: float,
+        cancel_token: Optional[CancellationToken],
+        on_status: Optional[Callable[[Any], None]]
+    ) -> Dict[str, Any]:
+        """
+        Poll until every batch has finished, backing off exponentially.
+        On cancellation the unfinished batches are cancelled at the provider.
+
+        Returns:
+            Finished batch objects by batch id
+        """
+        finished = {}
+        active = dict(batches)
+        delay = poll_interval
+        try:
+            while active:
+                if cancel_token is not None:
+                    cancel_token.sleep(delay)
+                else:
+                    time.sleep(delay)
+                for batch_id in list(active):
+                    batch = call_with_retry(
+                        lambda options: self.client.batches.retrieve(batch_id, **options),
+                        self.retry_policy, RetryStats(), cancel_token
+                    )
+                    if on_status is not None:
+                        on_status(batch)
+                    if batch.status in BATCH_TERMINAL_STATUSES:
+                        finished[batch_id] = batch
+                        del active[batch_id]
+                delay = min(delay * 2, max_poll_interval)
+        except GenerationCancelled:
+            for batch_id in active:
+                try:
+                    self.client.batches.cancel(batch_id)
+                except Exception as e:
+                    print(f"Warning: Failed to cancel batch {batch_id}: {e}")
+        return finished
+
+    def _ingest_batch(
+        self,
+        batch,
+        bodies_by_id: Dict[str, Dict[str, Any]],
+        save_images: bool
+    ) -> Dict[str, List[GenerationResult]]:
+        """Stream a finished batch's output and error files into results by custom_id"""
+        units = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            try:
+                with self.client.files.with_streaming_response.content(file_id) as response:
+                    for line in response.iter_lines():
+                        if not line.strip():
+                            continue
+                        entry = json.loads(line)
+                        body = bodies_by_id.get(entry.get("custom_id"))
+                        if body is not None:
+                            units[entry["custom_id"]] = self._batch_entry_results(
+                                entry, body, batch.id, save_images
+                            )
+            except Exception as e:
+                print(f"Warning: Failed to read results file {file_id} of batch {batch.id}: {e}")
+        return units
+
+    def _batch_entry_results(
+        self,
+        entry: Dict[str, Any],
+        body: Dict[str, Any],
+        batch_id: str,
+        save_images: bool
+    ) -> List[GenerationResult]:
+        """Results for one line of a batch output / error file"""
+        model = body["model"]
+        metadata = {"size": body["size"], "quality": body["quality"], "batch_id": batch_id}
+        error = _batch_entry_error(entry)
+        if error is None and not entry["response"]["body"].get("data"):
+            error = "No image in response"
+        if error is not None:
+            return [GenerationResult(
+                success=False, error_message=error, model_used=model, metadata=metadata
+            )]
+
+        prefix = "gptimg" if model == "gpt-image-1" else "dalle3"
+        results = []
+        for i, item in enumerate(entry["response"]["body"]["data"]):
+            result = GenerationResult(
+                success=True,
+                image_base64=item.get("b64_json"),
+                revised_prompt=item.get("revised_prompt"),
+                model_used=model,
+                metadata=dict(metadata)
+            )
+            if save_images and result.image_base64:
+                # A batch can hold thousands of images; keep them on disk only
+                handle = self._write_image(result.image_base64, prefix, i)
+                if handle is not None:
+                    result.image_path = handle.path
+                    result.image_handle = handle
+                    result.image_base64 = None
+            results.append(result)
+        return results
+
+    def _batch_fallback(
+        self,
+        unit: List[GenerationResult],
+        body: Dict[str, Any],
+        request: Dict[str, Any],
+        save_images: bool,
+        cancel_token: Optional[CancellationToken]
+    ) -> List[GenerationResult]:
+        """
+        A batch line's results, or - if the line failed for any reason but
+        cancellation - the same images generated directly with generate()
+        """
+        failed = next((r for r in unit if not r.success), None)
+        if (failed is None or failed.metadata.get("cancelled")
+                or (cancel_token is not None and cancel_token.cancelled)):
+            return unit
+        print(f"⚠️  Warning: Batch line failed ({failed.error_message}); generating it directly.")
+        results = self.generate(**{
+            **request, "n": body["n"], "save_images": save_images, "cancel_token": cancel_token
+        })
+        for result in results:
+            result.metadata["batch_error"] = failed.error_message
+        return results
+
+    def _batch_missing_result(
+        self,
+        body: Dict[str, Any],
+        group: Dict[str, Any],
+        finished: Dict[str, Any],
+        cancel_token: Optional[CancellationToken]
+    ) -> GenerationResult:
+        """Failed result for a request its batch produced no line for"""
+        metadata = {"size": body["size"], "quality": body["quality"]}
+        if "error" in group:
+            return GenerationResult(
+                success=False, error_message=group["error"], model_used=body["model"],
+                metadata=metadata
+            )
+        batch = finished.get(group.get("batch_id"))
+        if batch is None:
+            # Never finished: cancelled while submitting or polling
+            reason = cancel_token.reason if cancel_token is not None else None
+            return GenerationResult(
+                success=False,
+                error_message=f"Cancelled: {reason or 'cancelled'}",
+                model_used=body["model"],
+                metadata={**metadata, "cancelled": True}
             )
+        error = f"Batch {batch.status}"
+        if batch.errors and batch.errors.data:
+            error += ": " + "; ".join(e.message or e.code or "" for e in batch.errors.data)
+        return GenerationResult(
+            success=False,
+            error_message=error,
+            model_used=body["model"],
+            metadata={**metadata, "batch_id": batch.id}
+        )
+
+
+class AsyncFlyerImageGenerator(_FlyerGeneratorBase):
+    """
+    asyncio counterpart of FlyerImageGenerator built on the AsyncOpenAI client.
+
+    Same generate() contract, but awaitable: API calls don't hold a thread,
+    and disk writes / downloads are pushed off the event loop.
+    """
+
+    def _create_client(self):
+        # Resolved per event loop on access (see client)
+        return None
+
+    @property
+    def client(self):
+        """Shared AsyncOpenAI client for the running event loop"""
+        return self._client or get_async_openai_client(**self._client_kwargs())
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    async def _persist_image_async(self, result: GenerationResult, prefix: str, index: int):
+        """_persist_image without blocking the event loop on the write"""
+        if self.background_save:
+            self._persist_image(result, prefix, index)
         else:
-            self.client = OpenAI(api_key=self.api_key)
-        
-        self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-    
-    def _get_model_name(self, model: str) -> str:
-        """Get the correct model name based on provider"""
-        if self.use_openrouter and model in OPENROUTER_MODELS:
-            return OPENROUTER_MODELS[model]
-        return model
-    
-    def generate(
+            await asyncio.to_thread(self._persist_image, result, prefix, index)
+
+    async def generate(
         self,
         prompt: str,
         negative_prompt: str = "",
@@ -145,86 +2021,338 @@ class FlyerImageGenerator:
         quality: str = "hd",
         n: int = 1,
         save_images: bool = True,
-        input_images: Optional[List[str]] = None
+        input_images: Optional[List[InputImage]] = None,
+        max_concurrency: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None
     ) -> List[GenerationResult]:
         """
-        Generate flyer image(s).
-
-        Args:
-            prompt: Main generation prompt
-            negative_prompt: What to avoid (appended to prompt)
-            model: "nano-banana", "nano-banana-pro", "dall-e-3", or "gpt-image-1"
-            aspect_ratio: "1:1", "4:5", "9:16", "16:9", "letter", "a4"
-            quality: "low", "medium", "high", "hd" (model-dependent)
-            n: Number of images to generate (1-4)
-            save_images: Whether to save to disk
-            input_images: List of image paths to include (e.g., logo) - only for Nano Banana
+        Generate flyer image(s). See FlyerImageGenerator.generate; a
+        cancel_token also aborts in-flight requests (the HTTP call is
+        cancelled, not just abandoned).
 
         Returns:
-            List of GenerationResult objects
+            List of GenerationResult objects, in completion order
         """
-        import time
-        start_time = time.time()
+        flight_key = None
+        if self.single_flight is not None:
+            # Fingerprinting hashes input image files; keep it off the loop
+            flight_key = await asyncio.to_thread(
+                self.single_flight.key, f"{self.provider}:{int(save_images)}", prompt=prompt,
+                negative_prompt=negative_prompt, model=model, aspect_ratio=aspect_ratio,
+                quality=quality, n=n, input_images=input_images
+            )
+        if flight_key is not None:
+            try:
+                return await self.single_flight.run_async(
+                    flight_key,
+                    lambda flight_token: self._generate(
+                        prompt, negative_prompt, model, aspect_ratio, quality, n,
+                        save_images, input_images, max_concurrency, cancel_token=flight_token
+                    ),
+                    self.output_dir,
+                    cancel_token
+                )
+            except GenerationCancelled as e:
+                return self._cancelled_results(str(e), model, n, prompt, aspect_ratio)
+        return await self._generate(
+            prompt, negative_prompt, model, aspect_ratio, quality, n,
+            save_images, input_images, max_concurrency, cancel_token=cancel_token
+        )
+
+    def generate_stream(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        model: str = "nano-banana",
+        aspect_ratio: str = "4:5",
+        quality: str = "hd",
+        n: int = 1,
+        save_images: bool = True,
+        input_images: Optional[List[InputImage]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> AsyncIterator[GenerationEvent]:
+        """
+        Generate flyer image(s) as an async stream of GenerationEvents. See
+        FlyerImageGenerator.generate_stream; closing the stream early
+        cancels the generation.
+        """
+        token = CancellationToken(parent=cancel_token)
+        return _stream_events_async(
+            lambda on_partial: self._iter_generate(
+                prompt, negative_prompt, model, aspect_ratio, quality, n,
+                save_images, input_images, None,
+                on_partial if partial_images else None, partial_images, token
+            ),
+            progress_interval,
+            model,
+            on_close=lambda: token.cancel("stream closed")
+        )
+
+    def generate_iter(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        model: str = "nano-banana",
+        aspect_ratio: str = "4:5",
+        quality: str = "hd",
+        n: int = 1,
+        save_images: bool = True,
+        input_images: Optional[List[InputImage]] = None,
+        max_concurrency: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> AsyncIterator[GenerationResult]:
+        """
+        Generate flyer image(s) as an async iterator of results in
+        completion order. See FlyerImageGenerator.generate_iter; closing
+        the iterator early cancels the calls still in flight.
+        """
+        return self._iter_generate(
+            prompt, negative_prompt, model, aspect_ratio, quality, n,
+            save_images, input_images, max_concurrency, cancel_token=cancel_token
+        )
+
+    async def _generate(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        model: str,
+        aspect_ratio: str,
+        quality: str,
+        n: int,
+        save_images: bool,
+        input_images: Optional[List[InputImage]],
+        max_concurrency: Optional[int],
+        on_partial: Optional[Callable[[int, str], None]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[GenerationResult]:
+        """
+        generate() without single-flight coalescing. on_partial(index, b64)
+        receives progressive previews where the model streams them.
+        """
+        return [result async for result in self._iter_generate(
+            prompt, negative_prompt, model, aspect_ratio, quality, n, save_images,
+            input_images, max_concurrency, on_partial, partial_images, cancel_token
+        )]
+
+    async def _iter_generate(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        model: str,
+        aspect_ratio: str,
+        quality: str,
+        n: int,
+        save_images: bool,
+        input_images: Optional[List[InputImage]],
+        max_concurrency: Optional[int],
+        on_partial: Optional[Callable[[int, str], None]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> AsyncIterator[GenerationResult]:
+        """Yield _generate()'s results as they complete"""
+        # Let the router pick the model when asked to
+        try:
+            model, routing_reason = self._choose_model(model, aspect_ratio, quality, input_images)
+        except ValueError as e:
+            for result in self._routing_failures(e, model, n, prompt, aspect_ratio):
+                yield result
+            return
+
+        # Reroute to the fallback model while this one's circuit is open
+        model, fallback_from = self._route_model(model)
 
         # Get appropriate size for aspect ratio (for DALL-E/GPT models)
         size = ASPECT_RATIO_TO_SIZE.get(aspect_ratio, "1024x1024")
 
-        # Get correct model name for provider
-        actual_model = self._get_model_name(model)
+        full_prompt, actual_model, input_images = self._prepare_request(
+            prompt, negative_prompt, model, input_images
+        )
 
-        # Combine prompt with negative prompt
-        full_prompt = prompt
-        if negative_prompt:
-            full_prompt += f"\n\nAVOID: {negative_prompt}"
+        cache_key, cached = await asyncio.to_thread(
+            _cache_lookup, self.cache, self.output_dir, save_images, prompt=prompt, negative_prompt=negative_prompt,
+            model=model, aspect_ratio=aspect_ratio, quality=quality, n=n,
+            input_images=input_images
+        )
+        if cached is not None:
+            for result in cached:
+                yield result
+            return
+
+        if model in CHAT_COMPLETION_IMAGE_MODELS:
+            # Use chat completions API (Nano Banana models)
+            tasks = [
+                lambda i=i: self._generate_one(
+                    model, "nanobanana", i, save_images,
+                    lambda gen, m, save, i=i: gen._generate_nano_banana(
+                        full_prompt, aspect_ratio, save, i, gen._get_model_name(m), input_images
+                    )
+                )
+                for i in range(n)
+            ]
+        elif model == "gpt-image-1":
+            # Use GPT Image API (direct OpenAI only)
+            tasks = [
+                lambda: self._generate_gpt_image(
+                    full_prompt, size, quality, n, save_images,
+                    # Streamed previews carry no image index; stream single images only
+                    on_partial if n == 1 else None, partial_images
+                )
+            ]
+        else:
+            # Use DALL-E 3 API (default fallback)
+            tasks = [
+                lambda i=i: self._generate_one(
+                    model, "dalle3", i, save_images,
+                    lambda gen, m, save, i=i: gen._generate_dalle3(
+                        full_prompt, size, quality, save, i, gen._get_model_name(m)
+                    )
+                )
+                for i in range(n)
+            ]
 
         results = []
+        async for result in self._iter_tasks(tasks, max_concurrency, actual_model, cancel_token):
+            self._annotate(result, prompt, aspect_ratio, fallback_from, routing_reason)
+            self._count_outcome(result)
+            results.append(result)
+            yield result
 
-        # Warn if input images provided but model doesn't support it
-        if input_images and model not in CHAT_COMPLETION_IMAGE_MODELS:
-            print(f"⚠️  Warning: {model} does not support input images. Logo will be ignored.")
-            print("   Use nano-banana or nano-banana-pro to include your logo.")
-            input_images = None
+        # Only a fully consumed request is observed / cached
+        if self.router is not None:
+            self.router.observe(results)
+
+        if cache_key is not None and not any(r.metadata.get("cancelled") for r in results):
+            await asyncio.to_thread(self.cache.store, cache_key, results)
 
+    async def _iter_tasks(
+        self,
+        tasks: List[Callable[[], Any]],
+        max_concurrency: Optional[int],
+        model: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> AsyncIterator[GenerationResult]:
+        """
+        Run generation coroutines concurrently, yielding results as they
+        complete (with the same back-pressure as the sync _iter_tasks)
+        """
+        limit = max(1, min(len(tasks), max_concurrency or self.max_concurrency))
+        queued = iter(tasks)
+        running = {
+            asyncio.ensure_future(self._run_timed(task, model, cancel_token))
+            for task in islice(queued, limit)
+        }
         try:
-            # Determine which generation method to use based on model
-            if model in CHAT_COMPLETION_IMAGE_MODELS:
-                # Use chat completions API (Nano Banana models)
-                for i in range(n):
-                    result = self._generate_nano_banana(
-                        full_prompt, aspect_ratio, save_images, i, actual_model, input_images
-                    )
-                    results.append(result)
-            elif model == "gpt-image-1":
-                # Use GPT Image API (direct OpenAI only)
-                results = self._generate_gpt_image(
-                    full_prompt, size, quality, n, save_images
-                )
-            else:
-                # Use DALL-E 3 API (default fallback)
-                for i in range(n):
-                    result = self._generate_dalle3(
-                        full_prompt, size, quality, save_images, i, actual_model
-                    )
-                    results.append(result)
-        
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    for result in finished.result():
+                        yield result
+                    for task in islice(queued, 1):
+                        running.add(asyncio.ensure_future(self._run_timed(task, model, cancel_token)))
+        finally:
+            # A consumer that stops early cancels the calls still in flight
+            for pending in running:
+                pending.cancel()
+
+    async def _run_timed(
+        self,
+        task: Callable[[], Any],
+        model: str,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[GenerationResult]:
+        """See FlyerImageGenerator._run_timed (runs as its own task, so the token stays local)"""
+        start_time = time.time()
+        _cancel_token.set(cancel_token)
+        try:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            outcome = await task()
+            results = outcome if isinstance(outcome, list) else [outcome]
         except Exception as e:
-            results.append(GenerationResult(
+            results = [GenerationResult(
                 success=False,
                 error_message=str(e),
-                model_used=actual_model
-            ))
-        
-        # Add timing
+                model_used=model
+            )]
+
+        if cancel_token is not None and cancel_token.cancelled:
+            results = await asyncio.to_thread(
+                lambda: [_cancelled_result(result, cancel_token) for result in results]
+            )
+
         elapsed = time.time() - start_time
         for result in results:
-            result.generation_time_seconds = elapsed / len(results)
-            result.metadata["prompt_length"] = len(prompt)
-            result.metadata["aspect_ratio"] = aspect_ratio
-            result.metadata["provider"] = "openrouter" if self.use_openrouter else "openai"
-        
+            result.generation_time_seconds = elapsed
         return results
-    
-    def _generate_dalle3(
+
+    async def _generate_one(
+        self,
+        model: str,
+        prefix: str,
+        index: int,
+        save: bool,
+        generate_with: Callable[[Any, str, bool], Any]
+    ) -> GenerationResult:
+        """See FlyerImageGenerator._generate_one; the losing request is cancelled"""
+        target = self._hedge_target(model)
+        if target is None:
+            return await generate_with(self, model, save)
+
+        hedge_generator, hedge_model = target
+        result = await self.hedger.run_async(
+            lambda: generate_with(self, model, False),
+            lambda: generate_with(hedge_generator, hedge_model, False),
+            key=f"{self.provider}|{self._api_model(model)}"
+        )
+        self._hedge_winner(result, hedge_generator)
+        if save and result.success:
+            await asyncio.to_thread(self._save_result, result, prefix, index)
+        return result
+
+    async def _call_api(
+        self,
+        model: str,
+        call: Callable[[Dict[str, Any]], Any],
+        retry_stats: RetryStats
+    ) -> Any:
+        """asyncio counterpart of FlyerImageGenerator._call_api"""
+        breaker = self.circuit_breakers.breaker(self.provider, model)
+        token = _current_token()
+
+        async def attempt(options: Dict[str, Any]) -> Any:
+            if token is not None:
+                token.raise_if_cancelled()
+            breaker.before_call()
+            timeout = _token_timeout(options.get("timeout"), token)
+            queued_at = time.monotonic()
+            reached_provider = False
+            try:
+                async with self.concurrency.slot_async(self.provider, model, timeout) as slot:
+                    async with self._rate_slot_async(model, _remaining(timeout, queued_at)):
+                        slot.restart_clock()
+                        retry_stats.queue_wait_seconds += time.monotonic() - queued_at
+                        reached_provider = True
+                        request = call(_with_timeout(options, _remaining(timeout, queued_at)))
+                        if token is None:
+                            response = await request
+                        else:
+                            # Cancelling the task aborts the HTTP request itself
+                            response = await token.run_async(request)
+            except BaseException as e:
+                if reached_provider:
+                    breaker.record_failure(e)
+                else:
+                    breaker.abandon()
+                raise
+            breaker.record_success()
+            return response
+
+        return await call_with_retry_async(attempt, self.retry_policy, retry_stats, token)
+
+    async def _generate_dalle3(
         self,
         prompt: str,
         size: str,
@@ -234,231 +2362,165 @@ class FlyerImageGenerator:
         model: str = "dall-e-3"
     ) -> GenerationResult:
         """Generate with DALL-E 3"""
+        retry_stats = RetryStats()
         try:
             # Map quality
             dalle_quality = "hd" if quality in ["hd", "high"] else "standard"
-            
-            response = self.client.images.generate(
-                model=model,
-                prompt=prompt,
-                size=size,
-                quality=dalle_quality,
-                style="vivid",
-                n=1
+
+            response = await self._call_api(
+                model,
+                lambda options: self.client.images.generate(
+                    model=model,
+                    prompt=prompt,
+                    size=size,
+                    quality=dalle_quality,
+                    style="vivid",
+                    n=1,
+                    **options
+                ),
+                retry_stats
             )
-            
-            image_url = response.data[0].url
-            revised_prompt = response.data[0].revised_prompt
-            
-            # Download and save
-            image_path = None
-            if save and image_url:
-                image_path = self._save_image_from_url(image_url, "dalle3", index)
-            
-            return GenerationResult(
+
+            result = GenerationResult(
                 success=True,
-                image_path=str(image_path) if image_path else None,
-                image_url=image_url,
-                revised_prompt=revised_prompt,
+                image_url=response.data[0].url,
+                revised_prompt=response.data[0].revised_prompt,
                 model_used="dall-e-3",
-                metadata={"size": size, "quality": dalle_quality}
+                metadata={"size": size, "quality": dalle_quality, **retry_stats.as_metadata()}
             )
-        
+
+            # Download and save
+            if save and result.image_url:
+                await asyncio.to_thread(self._download_image, result, "dalle3", index)
+
+            return result
+
         except Exception as e:
             return GenerationResult(
                 success=False,
                 error_message=str(e),
-                model_used="dall-e-3"
+                model_used="dall-e-3",
+                metadata=retry_stats.as_metadata()
             )
 
-    def _load_image_as_base64(self, image_path: str) -> Optional[str]:
-        """Load an image file and return as base64 string"""
-        try:
-            with open(image_path, 'rb') as f:
-                return base64.b64encode(f.read()).decode('utf-8')
-        except Exception as e:
-            print(f"Warning: Could not load image {image_path}: {e}")
-            return None
-
-    def _generate_nano_banana(
+    async def _generate_nano_banana(
         self,
         prompt: str,
         aspect_ratio: str,
         save: bool,
         index: int,
         model: str,
-        input_images: Optional[List[str]] = None
+        input_images: Optional[List[InputImage]] = None
     ) -> GenerationResult:
         """Generate with Nano Banana via chat completions API"""
+        retry_stats = RetryStats()
         try:
-            # Map aspect ratio
-            ar = NANO_BANANA_ASPECT_RATIOS.get(aspect_ratio, "1:1")
-
-            # Build message content - can include both text and images
-            content = []
-
-            # Add input images first (e.g., logo)
-            if input_images:
-                for img_path in input_images:
-                    img_b64 = self._load_image_as_base64(img_path)
-                    if img_b64:
-                        # Detect image type from extension
-                        ext = Path(img_path).suffix.lower()
-                        mime_type = {
-                            '.png': 'image/png',
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.gif': 'image/gif',
-                            '.webp': 'image/webp'
-                        }.get(ext, 'image/png')
-                        content.append({
-                            "type": "image_url",
-                            "image_url": {"url": f"data:{mime_type};base64,{img_b64}"}
-                        })
-
-            # Add text prompt
-            content.append({"type": "text", "text": prompt})
-
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": content}],
-                extra_body={
-                    "modalities": ["image", "text"],
-                    "image_config": {"aspect_ratio": ar}
-                }
+            # Reading and encoding input images is file I/O; keep it off the loop
+            request = await asyncio.to_thread(
+                self._nano_banana_request, prompt, aspect_ratio, model, input_images
+            )
+            response = await self._call_api(
+                model,
+                lambda options: self.client.chat.completions.create(**request, **options),
+                retry_stats
             )
 
-            # Extract image from response
-            message = response.choices[0].message
-
-            # Check for images in the response
-            # OpenRouter returns images as a list with image_url containing data URL
-            images = getattr(message, 'images', None)
-            if images and len(images) > 0:
-                image_data_url = images[0].get("image_url", {}).get("url", "")
-                if image_data_url and "," in image_data_url:
-                    # Parse base64 from data URL: "data:image/png;base64,..."
-                    b64_data = image_data_url.split(",")[1]
-
-                    image_path = None
-                    if save:
-                        image_path = self._save_image_from_base64(b64_data, "nanobanana", index)
-
-                    return GenerationResult(
-                        success=True,
-                        image_path=str(image_path) if image_path else None,
-                        image_base64=b64_data,
-                        model_used=model,
-                        metadata={"aspect_ratio": ar, "has_logo": bool(input_images)}
-                    )
+            image_data_url = self._extract_nano_banana_image(response)
+            if image_data_url:
+                result = GenerationResult(
+                    success=True,
+                    image_data_url=image_data_url,
+                    model_used=model,
+                    metadata={
+                        "aspect_ratio": NANO_BANANA_ASPECT_RATIOS.get(aspect_ratio, "1:1"),
+                        "has_logo": bool(input_images),
+                        **retry_stats.as_metadata()
+                    }
+                )
+                if save:
+                    await self._persist_image_async(result, "nanobanana", index)
+                return result
 
             return GenerationResult(
                 success=False,
                 error_message="No image in response",
-                model_used=model
+                model_used=model,
+                metadata=retry_stats.as_metadata()
             )
 
         except Exception as e:
             return GenerationResult(
                 success=False,
                 error_message=str(e),
-                model_used=model
+                model_used=model,
+                metadata=retry_stats.as_metadata()
             )
 
-    def _generate_gpt_image(
+    async def _generate_gpt_image(
         self,
         prompt: str,
         size: str,
         quality: str,
         n: int,
-        save: bool
+        save: bool,
+        on_partial: Optional[Callable[[int, str], None]] = None,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES
     ) -> List[GenerationResult]:
-        """Generate with GPT-Image-1"""
+        """Generate with GPT-Image-1 (streaming partial images to on_partial if given)"""
         results = []
-        
+        retry_stats = RetryStats()
+
         try:
             # Map quality
             gpt_quality = quality if quality in ["low", "medium", "high"] else "high"
-            
-            response = self.client.images.generate(
-                model="gpt-image-1",
-                prompt=prompt,
-                size=size,
-                quality=gpt_quality,
-                n=n
-            )
-            
-            for i, image_data in enumerate(response.data):
-                image_b64 = image_data.b64_json
-                
-                # Save to file
-                image_path = None
-                if save and image_b64:
-                    image_path = self._save_image_from_base64(image_b64, "gptimg", i)
-                
-                results.append(GenerationResult(
+
+            async def request(options: Dict[str, Any]) -> List[str]:
+                kwargs = dict(model="gpt-image-1", prompt=prompt, size=size,
+                              quality=gpt_quality, n=n, **options)
+                if on_partial is None:
+                    response = await self.client.images.generate(**kwargs)
+                    return [d.b64_json for d in response.data]
+                # Consumed inside the call so the rate / concurrency slot
+                # covers the whole stream and a dropped stream is retried
+                stream = await self.client.images.generate(
+                    stream=True, partial_images=partial_images, **kwargs
+                )
+                return await _collect_image_stream_async(stream, on_partial)
+
+            images = await self._call_api("gpt-image-1", request, retry_stats)
+
+            for i, b64_data in enumerate(images):
+                result = GenerationResult(
                     success=True,
-                    image_path=str(image_path) if image_path else None,
-                    image_base64=image_b64,
+                    image_base64=b64_data,
                     model_used="gpt-image-1",
-                    metadata={"size": size, "quality": gpt_quality}
-                ))
-        
+                    metadata={"size": size, "quality": gpt_quality, **retry_stats.as_metadata()}
+                )
+
+                # Save to file
+                if save and result.image_base64:
+                    await self._persist_image_async(result, "gptimg", i)
+
+                results.append(result)
+
         except Exception as e:
             results.append(GenerationResult(
                 success=False,
                 error_message=str(e),
-                model_used="gpt-image-1"
+                model_used="gpt-image-1",
+                metadata=retry_stats.as_metadata()
             ))
-        
+
         return results
-    
-    def _save_image_from_url(
-        self, 
-        url: str, 
-        prefix: str, 
-        index: int
-    ) -> Optional[Path]:
-        """Download and save image from URL"""
-        try:
-            import urllib.request
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{prefix}_{timestamp}_{index}.png"
-            filepath = self.output_dir / filename
-            urllib.request.urlretrieve(url, filepath)
-            return filepath
-        except Exception as e:
-            print(f"Warning: Failed to save image from URL: {e}")
-            return None
-    
-    def _save_image_from_base64(
-        self,
-        b64_data: str,
-        prefix: str,
-        index: int
-    ) -> Optional[Path]:
-        """Save base64 image data to file"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{prefix}_{timestamp}_{index}.png"
-            filepath = self.output_dir / filename
-            
-            image_bytes = base64.b64decode(b64_data)
-            with open(filepath, 'wb') as f:
-                f.write(image_bytes)
-            
-            return filepath
-        except Exception as e:
-            print(f"Warning: Failed to save image from base64: {e}")
-            return None
 
 
 class MockFlyerGenerator:
     """Mock generator for testing without API key"""
     
-    def __init__(self, output_dir: str = "./generated"):
+    def __init__(self, output_dir: str = "./generated", cache=None):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = cache
     
     def generate(
         self,
@@ -468,9 +2530,28 @@ class MockFlyerGenerator:
         aspect_ratio: str = "4:5",
         quality: str = "hd",
         n: int = 1,
-        save_images: bool = True
+        save_images: bool = True,
+        input_images: Optional[List[InputImage]] = None,
+        max_concurrency: Optional[int] = None,
+        cancel_token: Optional[CancellationToken] = None
     ) -> List[GenerationResult]:
-        """Generate mock results for testing"""
+        """Generate mock results for testing (input images are accepted but ignored)"""
+        if cancel_token is not None and cancel_token.cancelled:
+            return [GenerationResult(
+                success=False,
+                error_message=f"Cancelled: {cancel_token.reason}",
+                model_used=f"mock-{model}",
+                metadata={"cancelled": True}
+            ) for _ in range(n)]
+
+        cache_key, cached = _cache_lookup(
+            self.cache, self.output_dir, save_images, prompt=prompt,
+            negative_prompt=negative_prompt, model=model, aspect_ratio=aspect_ratio,
+            quality=quality, n=n, input_images=input_images
+        )
+        if cached is not None:
+            return cached
+
         results = []
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -498,9 +2579,79 @@ class MockFlyerGenerator:
                     "note": "This is a mock generation for testing"
                 }
             ))
+
+        if cache_key is not None:
+            self.cache.store(cache_key, results)
         
         return results
 
+    def generate_stream(
+        self,
+        *args,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+        **kwargs
+    ) -> Iterator[GenerationEvent]:
+        """Mock stream: "started", then one event per result (no partial images)"""
+        return _stream_events(
+            lambda on_partial: self.generate(*args, **kwargs), progress_interval, "mock"
+        )
+
+    def generate_iter(self, *args, **kwargs) -> Iterator[GenerationResult]:
+        """Mock results one at a time"""
+        return iter(self.generate(*args, **kwargs))
+
+    def generate_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        save_images: bool = True,
+        cancel_token: Optional[CancellationToken] = None,
+        **kwargs
+    ) -> List[List[GenerationResult]]:
+        """Mock batch: each request generated directly (polling options are ignored)"""
+        return [
+            self.generate(**{**request, "save_images": save_images, "cancel_token": cancel_token})
+            for request in requests
+        ]
+
+
+class AsyncMockFlyerGenerator(MockFlyerGenerator):
+    """Awaitable mock generator, handed out by create_generator(async_mode=True)"""
+
+    async def generate(self, *args, **kwargs) -> List[GenerationResult]:
+        """Generate mock results for testing"""
+        return await asyncio.to_thread(super().generate, *args, **kwargs)
+
+    def generate_stream(
+        self,
+        *args,
+        partial_images: int = DEFAULT_PARTIAL_IMAGES,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+        **kwargs
+    ) -> AsyncIterator[GenerationEvent]:
+        """Mock async stream: "started", then one event per result"""
+        return _stream_events_async(
+            lambda on_partial: self.generate_iter(*args, **kwargs), progress_interval, "mock"
+        )
+
+    async def generate_iter(self, *args, **kwargs) -> AsyncIterator[GenerationResult]:
+        """Mock results one at a time"""
+        for result in await self.generate(*args, **kwargs):
+            yield result
+
+    async def generate_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        save_images: bool = True,
+        cancel_token: Optional[CancellationToken] = None,
+        **kwargs
+    ) -> List[List[GenerationResult]]:
+        """Mock batch: each request generated directly"""
+        return [
+            await self.generate(**{**request, "save_images": save_images, "cancel_token": cancel_token})
+            for request in requests
+        ]
+
 
 # =============================================================================
 # CONVENIENCE FUNCTION
@@ -509,7 +2660,19 @@ class MockFlyerGenerator:
 def create_generator(
     api_key: Optional[str] = None, 
     mock: bool = False,
-    use_openrouter: bool = False
+    use_openrouter: bool = False,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    async_mode: bool = False,
+    cache=None,
+    background_save: bool = False,
+    spill_to_disk: bool = False,
+    retry_policy: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    concurrency: Optional[AdaptiveConcurrency] = None,
+    circuit_breakers: Optional[CircuitBreakers] = None,
+    hedger: Optional[Hedger] = None,
+    single_flight=None,
+    router=None
 ):
     """
     Create appropriate generator based on availability.
@@ -518,18 +2681,49 @@ def create_generator(
         api_key: API key
         mock: Force mock generator (for testing)
         use_openrouter: Use OpenRouter instead of OpenAI directly
+        max_concurrency: Max per-variant API calls in flight when n > 1
+        async_mode: Return an asyncio generator whose generate() is awaitable
+        cache: Optional generation_cache.GenerationCache shared by the generator
+        background_save: Write images to disk in the background (real generators only)
+        spill_to_disk: Keep saved images on disk only, behind ImageHandle (real generators only)
+        retry_policy: Retry policy for transient API errors (real generators only)
+        rate_limiter: Client-side pacing per provider/model (default: none; real generators only)
+        concurrency: Adaptive in-flight limits per provider/model (real generators only)
+        circuit_breakers: Fast-fail / fallback per provider/model (real generators only)
+        hedger: Hedge slow single-image calls (real generators only)
+        single_flight: Optional single_flight.SingleFlight to coalesce identical
+            in-flight requests (real generators only)
+        router: Optional model_router.ModelRouter for model="auto" (real generators only)
     
     Returns:
         FlyerImageGenerator or MockFlyerGenerator
+        (AsyncFlyerImageGenerator or AsyncMockFlyerGenerator in async_mode)
     """
+    mock_class = AsyncMockFlyerGenerator if async_mode else MockFlyerGenerator
+    generator_class = AsyncFlyerImageGenerator if async_mode else FlyerImageGenerator
+
     if mock:
-        return MockFlyerGenerator()
+        return mock_class(cache=cache)
     
     try:
-        return FlyerImageGenerator(api_key=api_key, use_openrouter=use_openrouter)
+        return generator_class(
+            api_key=api_key,
+            use_openrouter=use_openrouter,
+            max_concurrency=max_concurrency,
+            cache=cache,
+            background_save=background_save,
+            spill_to_disk=spill_to_disk,
+            retry_policy=retry_policy,
+            rate_limiter=rate_limiter,
+            concurrency=concurrency,
+            circuit_breakers=circuit_breakers,
+            hedger=hedger,
+            single_flight=single_flight,
+            router=router
+        )
     except (ImportError, ValueError) as e:
         print(f"Warning: Cannot create real generator ({e}). Using mock.")
-        return MockFlyerGenerator()
+        return mock_class(cache=cache)
 
 
 # =============================================================================
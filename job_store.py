@@ -0,0 +1,231 @@
+"""
+Job Store
+
+Durable per-item state for batch runs in a SQLite file, so a batch that
+dies part-way can be re-run without paying for items that already
+finished.
+
+Each item is keyed by a deterministic job ID (a hash of the project,
+the content of its logo / photo files and the generation options) and
+moves pending -> in_flight -> done / failed. An in-flight item holds a
+lease; a re-run skips it until the lease expires (its process is
+presumed dead), then retries it. Failed items are retried until they
+have used max_attempts.
+
+Usage:
+    from job_store import JobStore, job_id
+
+    store = JobStore("./batch_state.db", max_attempts=3)
+    claim, skip_reason = store.try_claim(job_id(project, apply_qr=True), item_id="spring-sale")
+    if claim:
+        ...
+        store.complete(claim, record)
+    else:
+        print(f"skipped: {skip_reason}")    # done, in_flight or out_of_attempts
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+
+from models import FlyerProject, project_to_dict
+from generation_cache import file_content_hash
+
+
+# Bump when the job ID inputs change
+JOB_ID_VERSION = 1
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+# How long an in-flight item is reserved. Batch items get a deadline no
+# longer than this, so a live run never loses a lease it still holds.
+DEFAULT_LEASE_SECONDS = 900.0
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+# Skip reason (besides DONE / IN_FLIGHT) for a job that used max_attempts
+OUT_OF_ATTEMPTS = "out_of_attempts"
+
+
+def job_id(project: FlyerProject, **options: Any) -> str:
+    """
+    Deterministic ID for generating project with the given options
+    (provider, QR compositing, ...). Logo / photo files are identified by
+    content, so replacing one gives a new job.
+    """
+    files = {
+        name: file_content_hash(path) if path and Path(path).is_file() else path
+        for name, path in (("logo", project.logo_path), ("user_photo", project.user_photo_path))
+    }
+    canonical = {
+        "version": JOB_ID_VERSION,
+        "project": project_to_dict(project),
+        "files": files,
+        "options": options,
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class JobClaim:
+    """A lease on one job, returned by JobStore.claim"""
+    job_id: str
+    lease_id: str
+    attempt: int
+
+
+class JobStore:
+    """
+    Job states in a SQLite file (WAL, one connection per thread).
+
+    Claims run in BEGIN IMMEDIATE transactions, so several processes can
+    work through the same manifest without taking the same item. Updates
+    only apply while the caller still holds the item's lease.
+
+    Args:
+        path: Database file
+        max_attempts: Attempts per item before it stays failed
+        lease_seconds: How long a claim reserves an item
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS
+    ):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, item_id TEXT, status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, lease_id TEXT, lease_expires REAL,"
+            " error TEXT, record TEXT, updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def claim(self, job: str, item_id: Optional[str] = None) -> Optional[JobClaim]:
+        """
+        Lease a job for one attempt; None if it can't be claimed (see
+        try_claim for why)
+        """
+        return self.try_claim(job, item_id)[0]
+
+    def try_claim(
+        self, job: str, item_id: Optional[str] = None
+    ) -> Tuple[Optional[JobClaim], Optional[str]]:
+        """
+        Lease a job for one attempt.
+
+        A job that is done, out of attempts, or in flight under an
+        unexpired lease (another run, or the same project earlier in this
+        one) is left alone. An expired lease counts as a failed attempt.
+
+        Returns:
+            (claim, None), or (None, reason) with reason DONE, IN_FLIGHT
+            or OUT_OF_ATTEMPTS
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT status, attempts, lease_expires FROM jobs WHERE job_id = ?", (job,)
+            ).fetchone()
+            status, attempts, lease_expires = row if row else (PENDING, 0, None)
+
+            claim, reason = None, None
+            if status == DONE or (status == IN_FLIGHT and lease_expires > now):
+                reason = status
+            elif attempts >= self.max_attempts:
+                reason = OUT_OF_ATTEMPTS
+                if status == IN_FLIGHT:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, lease_id = NULL, error = ?, updated = ?"
+                        " WHERE job_id = ?",
+                        (FAILED, "Lease expired (worker stopped mid-item)", now, job)
+                    )
+            else:
+                claim = JobClaim(job_id=job, lease_id=uuid.uuid4().hex, attempt=attempts + 1)
+                conn.execute(
+                    "INSERT INTO jobs (job_id, item_id, status, attempts, lease_id, lease_expires, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (job_id) DO UPDATE SET item_id = excluded.item_id,"
+                    " status = excluded.status, attempts = excluded.attempts,"
+                    " lease_id = excluded.lease_id, lease_expires = excluded.lease_expires,"
+                    " updated = excluded.updated",
+                    (job, item_id, IN_FLIGHT, claim.attempt, claim.lease_id,
+                     now + self.lease_seconds, now)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return claim, reason
+
+    def complete(self, claim: JobClaim, record: Dict[str, Any]) -> bool:
+        """Mark done, keeping its result record. False if the lease was lost."""
+        return self._finish(claim, DONE, None, record)
+
+    def fail(self, claim: JobClaim, error: str, record: Optional[Dict[str, Any]] = None) -> bool:
+        """Mark failed (retried by a later claim while attempts remain)"""
+        return self._finish(claim, FAILED, error, record)
+
+    def release(self, claim: JobClaim) -> bool:
+        """Give a job back without using up the attempt (e.g. the run was cancelled)"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, attempts = attempts - 1, lease_id = NULL,"
+            " lease_expires = NULL, updated = ? WHERE job_id = ? AND lease_id = ?",
+            (PENDING, time.time(), claim.job_id, claim.lease_id)
+        )
+        return cursor.rowcount == 1
+
+    def _finish(self, claim: JobClaim, status: str, error: Optional[str], record) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, record = ?, lease_id = NULL,"
+            " lease_expires = NULL, updated = ? WHERE job_id = ? AND lease_id = ?",
+            (status, error, json.dumps(record, ensure_ascii=False) if record is not None else None,
+             time.time(), claim.job_id, claim.lease_id)
+        )
+        return cursor.rowcount == 1
+
+    def status(self, job: str) -> Optional[Dict[str, Any]]:
+        """Current state of one job, or None if it was never claimed"""
+        row = self._connect().execute(
+            "SELECT item_id, status, attempts, error, record FROM jobs WHERE job_id = ?", (job,)
+        ).fetchone()
+        if row is None:
+            return None
+        item_id, status, attempts, error, record = row
+        return {
+            "job_id": job, "item_id": item_id, "status": status, "attempts": attempts,
+            "error": error, "record": json.loads(record) if record else None,
+        }
+
+    def counts(self) -> Dict[str, int]:
+        """Jobs per status"""
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
@@ -8,6 +8,9 @@ Usage:
     python main.py                  # Interactive mode (OpenAI)
     python main.py --openrouter     # Use OpenRouter API
     python main.py --mock           # Test without API key
+    python main.py --cache          # Reuse results for identical requests
+    python main.py --route latency --max-cost 0.05   # Pick the model per request
+    python main.py --draft          # Cheap drafts while refining, then finalize
 """
 import argparse
 import json
@@ -23,7 +26,11 @@ from models import (
     CATEGORY_TEXT_FIELDS, CATEGORY_SUGGESTED_ELEMENTS
 )
 from prompt_builder import FlyerPromptBuilder, RefinementPromptBuilder
-from image_generator import create_generator
+from image_generator import create_generator, GenerationResult, AUTO_MODEL
+from generation_cache import GenerationCache, DEFAULT_CACHE_DIR
+from model_router import ModelRouter
+from cancellation import CancellationToken
+from draft_pipeline import draft_settings, finalize, mark_stage
 
 
 # =============================================================================
@@ -313,28 +320,28 @@ def screen_reformat_choice(current_format: str) -> Optional[str]:
     return get_choice(available, "Select new format")
 
 
-def reformat_image(source_path: str, target_format: str, generator) -> Optional[str]:
-    """Reformat an existing image to a new aspect ratio. Returns new image path."""
+def reformat_image(source, target_format: str, generator) -> Optional[GenerationResult]:
+    """
+    Reformat an existing image to a new aspect ratio. Returns the new result.
+
+    source is an image path or a previous GenerationResult (whose in-memory
+    image is sent as-is instead of being re-read from disk).
+    """
     print(f"\n⏳ Reformatting to {target_format}...")
 
-    prompt = (
-        f"Reformat this flyer image to {target_format} aspect ratio. "
-        f"Preserve ALL text exactly as shown - do not change any words or spelling. "
-        f"Maintain the same visual style, colors, and layout as much as possible. "
-        f"Adapt the composition to fit the new dimensions naturally."
-    )
+    prompt = RefinementPromptBuilder.build_reformat(target_format)
 
     results = generator.generate(
         prompt=prompt,
         aspect_ratio=target_format,
         save_images=True,
-        input_images=[source_path]
+        input_images=[source]
     )
 
     for result in results:
         if result.success:
             print(f"\n✅ Reformatted image saved to: {result.image_path}")
-            return result.image_path
+            return result
         else:
             print(f"\n❌ Reformat failed: {result.error_message}")
             return None
@@ -342,6 +349,29 @@ def reformat_image(source_path: str, target_format: str, generator) -> Optional[
     return None
 
 
+def generate_with_progress(generator, **request) -> List[GenerationResult]:
+    """
+    generator.generate() with live progress: elapsed time while waiting and
+    a note for each progressive preview the model streams. Ctrl+C cancels
+    the request (nothing more is downloaded or saved) before quitting.
+    """
+    token = CancellationToken()
+    results = []
+    try:
+        for event in generator.generate_stream(cancel_token=token, **request):
+            if event.type == "progress":
+                print(f"\r   ⏳ {event.elapsed_seconds:.0f}s...", end="", flush=True)
+            elif event.type == "partial_image":
+                print(f"\r   🖼️  Preview {event.partial_index + 1} ready ({event.elapsed_seconds:.1f}s)")
+            elif event.result is not None:
+                results.append(event.result)
+    except KeyboardInterrupt:
+        token.cancel("user quit")
+        raise
+    print("\r", end="")
+    return results
+
+
 def screen_logo() -> Optional[str]:
     """Screen 7: Optional logo upload"""
     print_header("BRAND LOGO", "Include your logo in the flyer? (optional)")
@@ -428,8 +458,21 @@ def run_intake() -> FlyerProject:
     return project
 
 
-def run_generation(project: FlyerProject, mock: bool = False, use_openrouter: bool = False):
-    """Run prompt building and image generation"""
+def run_generation(
+    project: FlyerProject,
+    mock: bool = False,
+    use_openrouter: bool = False,
+    cache_dir: Optional[str] = None,
+    router: Optional[ModelRouter] = None,
+    draft: bool = False
+):
+    """
+    Run prompt building and image generation.
+
+    With draft=True the first image and every refinement use a cheaper
+    draft model / quality; "Finalize" re-renders the chosen draft at the
+    project's model and quality.
+    """
     clear()
     
     provider = "OpenRouter" if use_openrouter else "OpenAI"
@@ -438,6 +481,9 @@ def run_generation(project: FlyerProject, mock: bool = False, use_openrouter: bo
     # Build prompt
     builder = FlyerPromptBuilder(project)
     package = builder.build()
+    if router:
+        # Let the router pick a model per request instead of the project's
+        package["model"] = AUTO_MODEL
     
     print("\n📋 GENERATED PROMPT:")
     print("-" * 50)
@@ -447,8 +493,17 @@ def run_generation(project: FlyerProject, mock: bool = False, use_openrouter: bo
     print("-" * 50)
     print(package["negative_prompt"][:200] + "..." if len(package["negative_prompt"]) > 200 else package["negative_prompt"])
     
+    # Model / quality for each render; drafts stay cheap until finalized
+    drafting = draft
+    if drafting:
+        render_model, render_quality = draft_settings(package["model"], package["quality"])
+    else:
+        render_model, render_quality = package["model"], package["quality"]
+
     print(f"\n📐 Format: {package['aspect_ratio']}")
     print(f"🤖 Model: {package['model']}")
+    if drafting:
+        print(f"📝 Drafts: {render_model} ({render_quality}) until you finalize")
     
     # Confirm generation
     if not confirm("\n\nGenerate image with this prompt?"):
@@ -456,26 +511,37 @@ def run_generation(project: FlyerProject, mock: bool = False, use_openrouter: bo
         return
     
     # Generate
-    print("\n⏳ Generating image... (this may take 10-30 seconds)")
-
-    generator = create_generator(mock=mock, use_openrouter=use_openrouter)
+    print(f"\n⏳ Generating {'draft' if drafting else 'image'}... (this may take 10-30 seconds)")
+
+    cache = GenerationCache(cache_dir) if cache_dir else None
+    generator = create_generator(
+        mock=mock,
+        use_openrouter=use_openrouter,
+        cache=cache,
+        background_save=True,
+        router=router
+    )
 
     # Prepare input images (logo) if provided
     input_images = [project.logo_path] if project.logo_path else None
     if input_images:
         print(f"   📎 Including logo: {Path(project.logo_path).name}")
 
-    results = generator.generate(
+    results = generate_with_progress(
+        generator,
         prompt=package["main_prompt"],
         negative_prompt=package["negative_prompt"],
-        model=package["model"],
+        model=render_model,
         aspect_ratio=package["aspect_ratio"],
-        quality=package["quality"],
+        quality=render_quality,
         input_images=input_images
     )
+    mark_stage(results, "draft" if drafting else "final")
 
-    # Track last generated image and current format
-    last_generated_path = None
+    # Track last generated image and current format. The result itself is
+    # kept so refine/reformat can reuse its in-memory image.
+    last_result = None
+    last_prompt = package["main_prompt"]
     current_format = package["aspect_ratio"]
 
     # Show results
@@ -484,33 +550,69 @@ def run_generation(project: FlyerProject, mock: bool = False, use_openrouter: bo
             print(f"\n✅ Image {i+1} generated successfully!")
             if result.image_path:
                 print(f"   Saved to: {result.image_path}")
-                last_generated_path = result.image_path  # Track for refinement
+                last_result = result  # Track for refinement
             if result.image_url:
                 print(f"   URL: {result.image_url}")
             if result.revised_prompt:
                 print(f"   AI revised prompt: {result.revised_prompt[:100]}...")
+            if result.metadata.get("routing_reason"):
+                print(f"   Model choice: {result.metadata['routing_reason']}")
         else:
             print(f"\n❌ Generation failed: {result.error_message}")
 
     # Post-generation loop with 3 options: done, refine, reformat
-    while last_generated_path:
+    while last_result:
         print("\n📐 What would you like to do next?")
         next_options = [
             ("done", "✅ Done - keep this image"),
             ("refine", "🔄 Refine - make changes to content/style"),
             ("reformat", "📐 Reformat - get this image in a different size"),
         ]
+        if drafting:
+            next_options.insert(1, ("finalize", "⭐ Finalize - re-render this draft at full quality"))
         next_action = get_choice(next_options, "Select option")
 
-        if next_action is None or next_action == "done":
+        if next_action is None:
             break
 
+        if next_action == "done":
+            if drafting and confirm("This is still a draft. Finalize it at full quality first?"):
+                next_action = "finalize"
+            else:
+                break
+
+        if next_action == "finalize":
+            print(f"\n⏳ Finalizing with {package['model']} ({package['quality']})...")
+            try:
+                results = finalize(
+                    generator,
+                    last_result,
+                    prompt=last_prompt,
+                    model=package["model"],
+                    quality=package["quality"],
+                    negative_prompt=package["negative_prompt"],
+                    aspect_ratio=current_format,
+                    input_images=input_images
+                )
+            except Exception as e:
+                print(f"\n❌ Finalize failed: {e}")
+                continue
+            for result in results:
+                if result.success:
+                    print(f"\n✅ Final image saved to: {result.image_path}")
+                    last_result = result
+                    # Further refinements build on the final at full quality
+                    drafting = False
+                    render_model, render_quality = package["model"], package["quality"]
+                else:
+                    print(f"\n❌ Finalize failed: {result.error_message}")
+
         elif next_action == "reformat":
             new_format = screen_reformat_choice(current_format)
             if new_format:
-                new_path = reformat_image(last_generated_path, new_format, generator)
-                if new_path:
-                    last_generated_path = new_path
+                new_result = reformat_image(last_result, new_format, generator)
+                if new_result:
+                    last_result = new_result
                     current_format = new_format
 
         elif next_action == "refine":
@@ -523,6 +625,9 @@ def run_generation(project: FlyerProject, mock: bool = False, use_openrouter: bo
                 feedback
             )
 
+            # Content-only prompt (without edit instructions) for finalize
+            content_prompt = refined_prompt
+
             print("\n📋 REFINED PROMPT:")
             print("-" * 50)
             print(refined_prompt)
@@ -541,30 +646,30 @@ def run_generation(project: FlyerProject, mock: bool = False, use_openrouter: bo
             # Determine input images for this generation
             refine_input_images = list(input_images) if input_images else []
 
-            if refine_mode == "edit" and last_generated_path:
+            if refine_mode == "edit" and last_result:
                 # Add the last generated image as input for editing
-                refine_input_images.append(last_generated_path)
-                print(f"   📎 Using previous image: {Path(last_generated_path).name}")
+                refine_input_images.append(last_result)
+                print(f"   📎 Using previous image: {Path(last_result.image_path).name}")
                 # Append edit instructions to the refined prompt (keeps original context)
-                refined_prompt = (
-                    f"{refined_prompt}\n\n"
-                    f"EDIT MODE: Modify the provided image with these specific changes: {feedback}. "
-                    f"Preserve all other elements exactly as they appear in the original image."
-                )
+                refined_prompt = RefinementPromptBuilder.build_edit(refined_prompt, feedback)
 
-            print("\n⏳ Generating refined version...")
-            results = generator.generate(
+            print(f"\n⏳ Generating refined {'draft' if drafting else 'version'}...")
+            results = generate_with_progress(
+                generator,
                 prompt=refined_prompt,
                 negative_prompt=package["negative_prompt"],
-                model=package["model"],
+                model=render_model,
                 aspect_ratio=current_format,
+                quality=render_quality,
                 input_images=refine_input_images if refine_input_images else None
             )
+            mark_stage(results, "draft" if drafting else "final")
 
             for result in results:
                 if result.success:
                     print(f"\n✅ Refined image saved to: {result.image_path}")
-                    last_generated_path = result.image_path  # Track for next iteration
+                    last_result = result  # Track for next iteration
+                    last_prompt = content_prompt
                 else:
                     print(f"\n❌ Failed: {result.error_message}")
 
@@ -585,6 +690,16 @@ def main():
                        help="Use mock generator (no API key needed)")
     parser.add_argument("--openrouter", action="store_true",
                        help="Use OpenRouter API instead of OpenAI directly")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                       help=f"Reuse results for identical requests (default dir: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--route", choices=["latency", "cost", "quality"],
+                       help="Pick the model per request, preferring this (overrides the project's model)")
+    parser.add_argument("--max-latency", type=float, metavar="SECONDS",
+                       help="Latency SLO for --route")
+    parser.add_argument("--max-cost", type=float, metavar="USD",
+                       help="Cost ceiling per image for --route")
+    parser.add_argument("--draft", action="store_true",
+                       help="Iterate on cheap drafts, then finalize the chosen one at full quality")
     args = parser.parse_args()
 
     # Check for API key if not in mock mode
@@ -601,7 +716,18 @@ def main():
 
     try:
         project = run_intake()
-        run_generation(project, mock=args.mock, use_openrouter=args.openrouter)
+        run_generation(
+            project,
+            mock=args.mock,
+            use_openrouter=args.openrouter,
+            cache_dir=args.cache,
+            router=ModelRouter(
+                max_latency_seconds=args.max_latency,
+                max_cost_per_image=args.max_cost,
+                objective=args.route
+            ) if args.route else None,
+            draft=args.draft
+        )
         
         print("\n" + "=" * 60)
         print("🎉 Done! Thanks for using Flyer Generator.")
@@ -0,0 +1,324 @@
+"""
+Model Router
+
+Picks an image model per request from what each model can do (logo /
+photo inputs, how closely it matches the requested aspect ratio, which
+provider serves it), what it costs, and how it has actually been
+performing (rolling latency and error rate).
+
+Usage:
+    from model_router import ModelRouter
+    from image_generator import create_generator
+
+    router = ModelRouter(max_latency_seconds=20, max_cost_per_image=0.05)
+    generator = create_generator(router=router)
+    results = generator.generate(prompt, model="auto", aspect_ratio="9:16",
+                                 input_images=["logo.png"])
+    print(results[0].metadata["routing_reason"])
+"""
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Tuple
+
+from image_generator import (
+    ASPECT_RATIO_TO_SIZE, AUTO_MODEL, CHAT_COMPLETION_IMAGE_MODELS, NANO_BANANA_ASPECT_RATIOS,
+    OPENROUTER_MODELS, GenerationResult
+)
+
+
+# Outcomes kept per model for the rolling stats
+STATS_WINDOW = 100
+
+# Samples needed before observed latency replaces the prior estimate
+MIN_LATENCY_SAMPLES = 5
+
+# Models failing more often than this are skipped while others qualify
+DEFAULT_MAX_ERROR_RATE = 0.5
+
+# Width / height of the named formats
+FORMAT_RATIOS = {
+    "letter": 8.5 / 11,
+    "a4": 210 / 297,
+}
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """Static facts about a model (costs and latencies are rough list-price estimates)"""
+    name: str
+    supports_input_images: bool
+    providers: Tuple[str, ...]
+    cost_per_image: Dict[str, float]     # quality -> USD per image ("default" fallback)
+    prior_latency_seconds: float         # used until enough calls are observed
+    quality_rank: int                    # lower = better output
+
+
+MODEL_PROFILES: Dict[str, ModelProfile] = {
+    "nano-banana": ModelProfile(
+        name="nano-banana",
+        supports_input_images="nano-banana" in CHAT_COMPLETION_IMAGE_MODELS,
+        providers=("openrouter",),
+        cost_per_image={"default": 0.039},
+        prior_latency_seconds=10.0,
+        quality_rank=2,
+    ),
+    "nano-banana-pro": ModelProfile(
+        name="nano-banana-pro",
+        supports_input_images="nano-banana-pro" in CHAT_COMPLETION_IMAGE_MODELS,
+        providers=("openrouter",),
+        cost_per_image={"default": 0.134},
+        prior_latency_seconds=25.0,
+        quality_rank=1,
+    ),
+    "dall-e-3": ModelProfile(
+        name="dall-e-3",
+        supports_input_images="dall-e-3" in CHAT_COMPLETION_IMAGE_MODELS,
+        providers=("openai", "openrouter"),
+        cost_per_image={"hd": 0.08, "high": 0.08, "default": 0.04},
+        prior_latency_seconds=15.0,
+        quality_rank=4,
+    ),
+    "gpt-image-1": ModelProfile(
+        name="gpt-image-1",
+        supports_input_images="gpt-image-1" in CHAT_COMPLETION_IMAGE_MODELS,
+        providers=("openai",),   # not served by OpenRouter
+        cost_per_image={"low": 0.011, "medium": 0.042, "default": 0.167},
+        prior_latency_seconds=40.0,
+        quality_rank=3,
+    ),
+}
+
+# Provider model names (as in GenerationResult.model_used) -> short names
+_SHORT_NAMES = {full: short for short, full in OPENROUTER_MODELS.items()}
+
+
+def _ratio(aspect: str) -> float:
+    """Width / height of "W:H" or a named format"""
+    if aspect in FORMAT_RATIOS:
+        return FORMAT_RATIOS[aspect]
+    width, height = aspect.split(":")
+    return float(width) / float(height)
+
+
+def aspect_error(model: str, aspect_ratio: str) -> float:
+    """
+    How far the model's output shape is from the requested one
+    (|log| of the ratio of ratios; 0 = exact)
+    """
+    if model in CHAT_COMPLETION_IMAGE_MODELS:
+        produced = _ratio(NANO_BANANA_ASPECT_RATIOS.get(aspect_ratio, "1:1"))
+    else:
+        width, height = ASPECT_RATIO_TO_SIZE.get(aspect_ratio, "1024x1024").split("x")
+        produced = float(width) / float(height)
+    return abs(math.log(produced / _ratio(aspect_ratio)))
+
+
+class ModelStats:
+    """Rolling latency and error rate per model, fed from generation results"""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+        self._outcomes: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, latency: float, success: bool):
+        with self._lock:
+            self._outcomes.setdefault(model, deque(maxlen=self.window)).append(success)
+            if success:
+                self._latencies.setdefault(model, deque(maxlen=self.window)).append(latency)
+
+    def latency_p90(self, model: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(0.9 * len(samples)))]
+
+    def error_rate(self, model: str) -> Optional[float]:
+        with self._lock:
+            outcomes = list(self._outcomes.get(model, ()))
+        if not outcomes:
+            return None
+        return 1.0 - sum(outcomes) / len(outcomes)
+
+
+@dataclass
+class Candidate:
+    """How one model scored for a request"""
+    model: str
+    est_latency_seconds: float
+    latency_observed: bool
+    est_cost: float
+    error_rate: Optional[float]
+    aspect_error: float
+    rejected: Optional[str] = None
+
+
+@dataclass
+class RoutingDecision:
+    """The chosen model and why"""
+    model: str
+    reason: str
+    candidates: List[Candidate] = field(default_factory=list)
+
+
+class ModelRouter:
+    """
+    Chooses a model per request.
+
+    Args:
+        max_latency_seconds: Latency SLO; a model's p90 (or prior estimate)
+            must be within it
+        max_cost_per_image: Cost ceiling in USD per image
+        objective: Among qualifying models prefer "latency" (fastest),
+            "cost" (cheapest) or "quality" (best quality_rank)
+        max_aspect_error: Skip models whose output shape is further than this
+            from the requested aspect ratio (None = any)
+        profiles: Model profiles (default MODEL_PROFILES)
+    """
+
+    def __init__(
+        self,
+        max_latency_seconds: Optional[float] = None,
+        max_cost_per_image: Optional[float] = None,
+        objective: str = "latency",
+        max_aspect_error: Optional[float] = None,
+        max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+        profiles: Optional[Dict[str, ModelProfile]] = None
+    ):
+        if objective not in ("latency", "cost", "quality"):
+            raise ValueError(f"Unknown routing objective: {objective}")
+        self.max_latency_seconds = max_latency_seconds
+        self.max_cost_per_image = max_cost_per_image
+        self.objective = objective
+        self.max_aspect_error = max_aspect_error
+        self.max_error_rate = max_error_rate
+        self.profiles = profiles or MODEL_PROFILES
+        self.stats = ModelStats()
+
+    def choose(
+        self,
+        provider: str,
+        aspect_ratio: str,
+        quality: str = "hd",
+        needs_input_images: bool = False,
+        max_latency_seconds: Optional[float] = None,
+        max_cost_per_image: Optional[float] = None
+    ) -> RoutingDecision:
+        """
+        Pick a model for one request. Per-call limits override the router's.
+
+        Hard requirements (provider, input-image support) are never relaxed.
+        If no model meets the SLO and cost ceiling, the best of the capable
+        models is returned and the reason says which limit was missed.
+
+        Raises:
+            ValueError: if no model can serve the request at all
+        """
+        max_latency = max_latency_seconds if max_latency_seconds is not None else self.max_latency_seconds
+        max_cost = max_cost_per_image if max_cost_per_image is not None else self.max_cost_per_image
+
+        candidates = [
+            self._score(profile, provider, aspect_ratio, quality, needs_input_images, max_latency, max_cost)
+            for profile in self.profiles.values()
+        ]
+        capable = [c for c in candidates if c.rejected in (None, "slo", "cost", "errors", "aspect")]
+        if not capable:
+            raise ValueError(
+                f"No model on {provider} supports this request"
+                f"{' with input images' if needs_input_images else ''}"
+            )
+
+        qualifying = [c for c in capable if c.rejected is None]
+        if qualifying:
+            best = min(qualifying, key=self._sort_key)
+            reason = self._explain(best, len(qualifying), max_latency, max_cost)
+        else:
+            # Nothing meets every soft limit: relax them and say so
+            best = min(capable, key=lambda c: (c.rejected == "errors",) + self._sort_key(c))
+            reason = (
+                f"no model met all limits ({self._missed(capable)}); "
+                f"best effort: {self._explain(best, 0, max_latency, max_cost)}"
+            )
+        return RoutingDecision(model=best.model, reason=reason, candidates=candidates)
+
+    def observe(self, results: List[GenerationResult]):
+        """Feed finished generation results into the rolling stats"""
+        for result in results:
+            if (result.metadata.get("cache") == "hit" or result.metadata.get("coalesced")
+                    or result.metadata.get("cancelled")):
+                continue
+            model = _SHORT_NAMES.get(result.model_used, result.model_used)
+            if model in self.profiles:
+                self.stats.record(model, result.generation_time_seconds, result.success)
+
+    def _score(
+        self,
+        profile: ModelProfile,
+        provider: str,
+        aspect_ratio: str,
+        quality: str,
+        needs_input_images: bool,
+        max_latency: Optional[float],
+        max_cost: Optional[float]
+    ) -> Candidate:
+        observed = self.stats.latency_p90(profile.name)
+        candidate = Candidate(
+            model=profile.name,
+            est_latency_seconds=observed if observed is not None else profile.prior_latency_seconds,
+            latency_observed=observed is not None,
+            est_cost=profile.cost_per_image.get(quality, profile.cost_per_image["default"]),
+            error_rate=self.stats.error_rate(profile.name),
+            aspect_error=aspect_error(profile.name, aspect_ratio),
+        )
+
+        if provider not in profile.providers:
+            candidate.rejected = "provider"
+        elif needs_input_images and not profile.supports_input_images:
+            candidate.rejected = "input_images"
+        elif candidate.error_rate is not None and candidate.error_rate > self.max_error_rate:
+            candidate.rejected = "errors"
+        elif max_cost is not None and candidate.est_cost > max_cost:
+            candidate.rejected = "cost"
+        elif max_latency is not None and candidate.est_latency_seconds > max_latency:
+            candidate.rejected = "slo"
+        elif self.max_aspect_error is not None and candidate.aspect_error > self.max_aspect_error:
+            candidate.rejected = "aspect"
+        return candidate
+
+    def _sort_key(self, candidate: Candidate):
+        rank = self.profiles[candidate.model].quality_rank
+        if self.objective == "cost":
+            return (candidate.est_cost, candidate.est_latency_seconds, candidate.aspect_error)
+        if self.objective == "quality":
+            return (rank, candidate.est_latency_seconds, candidate.est_cost)
+        return (candidate.est_latency_seconds, candidate.est_cost, candidate.aspect_error)
+
+    def _explain(
+        self,
+        candidate: Candidate,
+        qualifying: int,
+        max_latency: Optional[float],
+        max_cost: Optional[float]
+    ) -> str:
+        latency_source = "observed p90" if candidate.latency_observed else "estimated"
+        parts = [
+            f"{candidate.model}: {self.objective} objective",
+            f"{latency_source} latency {candidate.est_latency_seconds:.1f}s"
+            + (f" (SLO {max_latency:.1f}s)" if max_latency is not None else ""),
+            f"${candidate.est_cost:.3f}/image"
+            + (f" (ceiling ${max_cost:.3f})" if max_cost is not None else ""),
+        ]
+        if candidate.error_rate is not None:
+            parts.append(f"error rate {candidate.error_rate:.0%}")
+        if candidate.aspect_error > 0.01:
+            parts.append("approximate aspect ratio")
+        if qualifying:
+            parts.append(f"{qualifying} model(s) qualified")
+        return ", ".join(parts)
+
+    def _missed(self, candidates: List[Candidate]) -> str:
+        return ", ".join(f"{c.model}: {c.rejected}" for c in candidates)
@@ -4,8 +4,8 @@ Data Models for Flyer Generation
 These models represent the structured data collected through the app UI.
 Each field maps to a screen or input element in the app.
 """
-from dataclasses import dataclass, field
-from typing import Optional, List, Dict
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Optional, List, Dict, Any, Union, get_type_hints, get_origin, get_args
 from enum import Enum
 
 
@@ -260,6 +260,70 @@ class FlyerProject:
     qr_settings: Optional[QRCodeSettings] = None  # QR code configuration
 
 
+# =============================================================================
+# SERIALIZATION - FlyerProject <-> plain JSON-compatible dicts
+# =============================================================================
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if is_dataclass(value):
+        return {f.name: _to_plain(getattr(value, f.name)) for f in fields(value)}
+    if isinstance(value, list):
+        return [_to_plain(item) for item in value]
+    return value
+
+
+def _from_plain(annotation: Any, value: Any, path: str) -> Any:
+    if value is None:
+        return None
+    if get_origin(annotation) is Union:
+        # Optional[X] -> X
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        try:
+            return annotation(value)
+        except ValueError:
+            choices = ", ".join(member.value for member in annotation)
+            raise ValueError(f"{path}: {value!r} is not one of {choices}") from None
+    if is_dataclass(annotation):
+        return _dataclass_from_dict(annotation, value, path)
+    return value
+
+
+def _dataclass_from_dict(cls: Any, data: Any, path: str) -> Any:
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected an object, got {type(data).__name__}")
+    hints = get_type_hints(cls)
+    known = {f.name for f in fields(cls)}
+    unknown = set(data) - known
+    if unknown:
+        raise ValueError(f"{path}: unknown field(s) {', '.join(sorted(unknown))}")
+    return cls(**{
+        name: _from_plain(hints[name], value, f"{path}.{name}")
+        for name, value in data.items()
+    })
+
+
+def project_to_dict(project: FlyerProject) -> Dict[str, Any]:
+    """FlyerProject as a JSON-compatible dict (enums as their values)"""
+    return _to_plain(project)
+
+
+def project_from_dict(data: Dict[str, Any]) -> FlyerProject:
+    """
+    Build a FlyerProject from a dict as written by project_to_dict.
+
+    Omitted fields take their defaults; only "category" is required.
+
+    Raises:
+        ValueError: on unknown fields, bad enum values or a missing category
+    """
+    if not isinstance(data, dict) or "category" not in data:
+        raise ValueError("project: \"category\" is required")
+    return _dataclass_from_dict(FlyerProject, data, "project")
+
+
 # =============================================================================
 # CATEGORY-SPECIFIC CONFIGURATIONS
 # =============================================================================
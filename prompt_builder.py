@@ -693,6 +693,25 @@ class RefinementPromptBuilder:
                 f"IMPORTANT CHANGES REQUESTED: {user_feedback}"
             )
 
+    @classmethod
+    def build_edit(cls, refined_prompt: str, user_feedback: str) -> str:
+        """Refined prompt for editing the previous image rather than starting over"""
+        return (
+            f"{refined_prompt}\n\n"
+            f"EDIT MODE: Modify the provided image with these specific changes: {user_feedback}. "
+            f"Preserve all other elements exactly as they appear in the original image."
+        )
+
+    @classmethod
+    def build_reformat(cls, target_format: str) -> str:
+        """Prompt for re-laying-out the provided image at a new aspect ratio"""
+        return (
+            f"Reformat this flyer image to {target_format} aspect ratio. "
+            f"Preserve ALL text exactly as shown - do not change any words or spelling. "
+            f"Maintain the same visual style, colors, and layout as much as possible. "
+            f"Adapt the composition to fit the new dimensions naturally."
+        )
+
 
 # =============================================================================
 # TEST / DEMO
@@ -0,0 +1,343 @@
+"""
+Rate Limiting
+
+Client-side pacing of provider API calls, keyed by (provider, model).
+Each key gets a token bucket (requests per minute, with a small burst)
+and optionally a cap on concurrent requests across processes. Callers
+wait for capacity instead of failing.
+
+Generators don't pace calls unless given a limiter (rate_limiter=...).
+In-flight calls within a process are limited by concurrency.py; a call
+holds its concurrency slot before it takes a token here, so waiting for
+a slot never spends rate budget.
+
+The default in-memory backend is shared by threads and asyncio tasks in
+one process. SQLiteRateLimitBackend keeps the buckets in a database file
+so several processes on one host draw from the same budget.
+
+Usage:
+    from rate_limit import RateLimiter, RateLimit, SQLiteRateLimitBackend
+
+    limiter = RateLimiter(
+        limits={("openrouter", "google/gemini-3-pro-image-preview"): RateLimit(20, 4)},
+        backend=SQLiteRateLimitBackend("./.flyer_ratelimit.db"),
+    )
+    generator = create_generator(rate_limiter=limiter)
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Tuple, Union
+
+from cancellation import current_token
+
+
+# How long a waiter sleeps when it is blocked on the concurrency cap
+# (there is no refill time to compute)
+SLOT_POLL_SECONDS = 0.05
+
+# SQLite concurrency slots expire after this long, so a crashed process
+# can't hold them forever
+DEFAULT_SLOT_LEASE_SECONDS = 600.0
+
+
+class RateLimitTimeout(Exception):
+    """Raised when capacity doesn't free up within the caller's timeout"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Budget for one (provider, model) key. max_concurrent caps requests in
+    flight across every process sharing the backend (None = no cap beyond
+    each process's adaptive concurrency limit).
+    """
+    requests_per_minute: float
+    max_concurrent: Optional[int] = None
+    burst: int = 4    # requests allowed back-to-back after an idle period
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.requests_per_minute / 60.0
+
+
+# Applied to keys without an explicit limit
+DEFAULT_RATE_LIMIT = RateLimit(requests_per_minute=60)
+
+LimitKey = Union[Tuple[str, str], str]
+
+
+class MemoryRateLimitBackend:
+    """Token buckets and slot counts held in this process"""
+
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}   # key -> (tokens, updated)
+        self._in_flight: Dict[str, int] = {}
+
+    def try_acquire(self, key: str, limit: RateLimit) -> Tuple[bool, float, Optional[str]]:
+        """Take a token and a slot. Returns (granted, retry_in_seconds, slot_id)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(limit.burst), now))
+            tokens = min(float(limit.burst), tokens + (now - updated) * limit.refill_per_second)
+
+            if limit.max_concurrent is not None and self._in_flight.get(key, 0) >= limit.max_concurrent:
+                self._buckets[key] = (tokens, now)
+                return False, SLOT_POLL_SECONDS, None
+            if tokens < 1.0:
+                self._buckets[key] = (tokens, now)
+                return False, (1.0 - tokens) / limit.refill_per_second, None
+
+            self._buckets[key] = (tokens - 1.0, now)
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            return True, 0.0, None
+
+    def release(self, key: str, slot_id: Optional[str]):
+        with self._lock:
+            self._in_flight[key] = max(0, self._in_flight.get(key, 0) - 1)
+
+    def in_flight(self, key: str) -> int:
+        with self._lock:
+            return self._in_flight.get(key, 0)
+
+
+class SQLiteRateLimitBackend:
+    """
+    Token buckets and leased concurrency slots in a SQLite file.
+
+    Every acquire runs in a BEGIN IMMEDIATE transaction, so processes
+    sharing the file see a consistent budget. Wall-clock time is used
+    since monotonic clocks aren't comparable across processes.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, slot_lease_seconds: float = DEFAULT_SLOT_LEASE_SECONDS):
+        self.path = path
+        self.slot_lease_seconds = slot_lease_seconds
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS slots ("
+                " id TEXT PRIMARY KEY, key TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS slots_key ON slots (key)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def try_acquire(self, key: str, limit: RateLimit) -> Tuple[bool, float, Optional[str]]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (float(limit.burst), now)
+            tokens = min(float(limit.burst), tokens + max(0.0, now - updated) * limit.refill_per_second)
+
+            granted, retry_in, slot_id = True, 0.0, None
+            if limit.max_concurrent is not None:
+                conn.execute("DELETE FROM slots WHERE key = ? AND expires < ?", (key, now))
+                (held,) = conn.execute(
+                    "SELECT COUNT(*) FROM slots WHERE key = ?", (key,)
+                ).fetchone()
+                if held >= limit.max_concurrent:
+                    granted, retry_in = False, SLOT_POLL_SECONDS
+            if granted and tokens < 1.0:
+                granted, retry_in = False, (1.0 - tokens) / limit.refill_per_second
+
+            if granted:
+                tokens -= 1.0
+                slot_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO slots (id, key, expires) VALUES (?, ?, ?)",
+                    (slot_id, key, now + self.slot_lease_seconds)
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return granted, retry_in, slot_id
+
+    def release(self, key: str, slot_id: Optional[str]):
+        if slot_id is not None:
+            self._connect().execute("DELETE FROM slots WHERE id = ?", (slot_id,))
+
+    def in_flight(self, key: str) -> int:
+        (held,) = self._connect().execute(
+            "SELECT COUNT(*) FROM slots WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return held
+
+
+class RateLimiter:
+    """
+    Paces API calls per (provider, model).
+
+    Args:
+        limits: RateLimit per (provider, model) tuple, or per provider name
+            to cover all of its models
+        default: Limit for keys not in limits (None = unlimited)
+        backend: MemoryRateLimitBackend (default) or SQLiteRateLimitBackend
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[LimitKey, RateLimit]] = None,
+        default: Optional[RateLimit] = DEFAULT_RATE_LIMIT,
+        backend=None
+    ):
+        self.limits = dict(limits or {})
+        self.default = default
+        self.backend = backend or MemoryRateLimitBackend()
+
+        self._lock = threading.Lock()
+        self._acquired: Dict[str, int] = {}
+        self._waited: Dict[str, float] = {}
+
+    def limit_for(self, provider: str, model: str) -> Optional[RateLimit]:
+        return self.limits.get((provider, model), self.limits.get(provider, self.default))
+
+    def acquire(self, provider: str, model: str, timeout: Optional[float] = None):
+        """
+        Block until a request may start. The wait ends early if the
+        current generate() call's cancellation token fires.
+
+        Returns:
+            (slot, seconds_waited); pass slot to release() when the call ends
+
+        Raises:
+            RateLimitTimeout: if timeout elapses first
+            GenerationCancelled: if the current token is cancelled first
+        """
+        limit = self.limit_for(provider, model)
+        key = f"{provider}|{model}"
+        if limit is None:
+            return None, 0.0
+
+        token = current_token()
+        start_time = time.monotonic()
+        while True:
+            granted, retry_in, slot_id = self.backend.try_acquire(key, limit)
+            waited = time.monotonic() - start_time
+            if granted:
+                self._record(key, waited)
+                return (key, slot_id), waited
+            delay = self._sleep_for(retry_in, waited, timeout, key)
+            if token is None:
+                time.sleep(delay)
+            else:
+                token.sleep(delay)
+
+    async def acquire_async(self, provider: str, model: str, timeout: Optional[float] = None):
+        """asyncio counterpart of acquire()"""
+        limit = self.limit_for(provider, model)
+        key = f"{provider}|{model}"
+        if limit is None:
+            return None, 0.0
+
+        token = current_token()
+        start_time = time.monotonic()
+        while True:
+            if self.backend.blocking:
+                granted, retry_in, slot_id = await asyncio.to_thread(
+                    self.backend.try_acquire, key, limit
+                )
+            else:
+                granted, retry_in, slot_id = self.backend.try_acquire(key, limit)
+            waited = time.monotonic() - start_time
+            if granted:
+                self._record(key, waited)
+                return (key, slot_id), waited
+            delay = self._sleep_for(retry_in, waited, timeout, key)
+            if token is None:
+                await asyncio.sleep(delay)
+            else:
+                await token.sleep_async(delay)
+
+    def release(self, slot):
+        if slot is not None:
+            key, slot_id = slot
+            self.backend.release(key, slot_id)
+
+    @contextmanager
+    def slot(self, provider: str, model: str, timeout: Optional[float] = None):
+        """Hold capacity for one request; yields seconds spent waiting"""
+        slot, waited = self.acquire(provider, model, timeout)
+        try:
+            yield waited
+        finally:
+            self.release(slot)
+
+    @asynccontextmanager
+    async def slot_async(self, provider: str, model: str, timeout: Optional[float] = None):
+        slot, waited = await self.acquire_async(provider, model, timeout)
+        try:
+            yield waited
+        finally:
+            self.release(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests admitted, total queueing time and in-flight count per key"""
+        with self._lock:
+            keys = list(self._acquired)
+            return {
+                key: {
+                    "acquired": self._acquired[key],
+                    "wait_seconds": round(self._waited[key], 3),
+                    "in_flight": self.backend.in_flight(key),
+                }
+                for key in keys
+            }
+
+    def _sleep_for(self, retry_in: float, waited: float, timeout: Optional[float], key: str) -> float:
+        if timeout is None:
+            return retry_in
+        remaining = timeout - waited
+        if remaining <= 0:
+            raise RateLimitTimeout(f"Rate limit for {key} not available within {timeout:.1f}s")
+        return min(retry_in, remaining)
+
+    def _record(self, key: str, waited: float):
+        with self._lock:
+            self._acquired[key] = self._acquired.get(key, 0) + 1
+            self._waited[key] = self._waited.get(key, 0.0) + waited
+
+
+# Process-wide limiter shared by all generators
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """A shared in-process RateLimiter (created on first use) to pass to generators"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
@@ -0,0 +1,430 @@
+"""
+Resilience
+
+Retry policy for provider API calls: classifies errors as transient or
+fatal, backs off exponentially with full jitter, honours Retry-After and
+gives up once a total deadline is spent.
+
+Circuit breakers per (provider, model) stop calling a degraded model
+altogether: after repeated failures calls fail fast (or are rerouted to a
+fallback model) until a probe call succeeds.
+"""
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+from cancellation import GenerationCancelled
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+
+# HTTP statuses that are worth another attempt
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Never wait longer than this for a single Retry-After, whatever the server says
+MAX_RETRY_AFTER_SECONDS = 120.0
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status carried by an API error, if any"""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Classify an API call failure.
+
+    Returns one of "rate_limit", "timeout", "connection", "server_error"
+    (all retryable), "circuit_open", "cancelled" or "fatal".
+    """
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, (GenerationCancelled, asyncio.CancelledError)):
+        return "cancelled"
+    if OPENAI_AVAILABLE:
+        if isinstance(error, openai.RateLimitError):
+            return "rate_limit"
+        if isinstance(error, openai.APITimeoutError):
+            return "timeout"
+        if isinstance(error, openai.APIConnectionError):
+            return "connection"
+
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, ConnectionError):
+        return "connection"
+
+    status = error_status(error)
+    if status == 429:
+        return "rate_limit"
+    if status in RETRYABLE_STATUS_CODES:
+        return "server_error"
+    return "fatal"
+
+
+# Error kinds that are never retried
+NON_RETRYABLE_KINDS = ("fatal", "circuit_open", "cancelled")
+
+
+def is_retryable(error: BaseException) -> bool:
+    return classify_error(error) not in NON_RETRYABLE_KINDS
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Server-requested delay from Retry-After / retry-after-ms headers, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    How provider calls are retried.
+
+    Backoff for attempt k (1-based) is uniform in
+    [0, min(max_delay, base_delay * multiplier ** (k - 1))] ("full jitter").
+    A Retry-After header overrides the backoff when it is longer. No retry
+    is started that could not finish before deadline_seconds; each attempt
+    is also given the remaining deadline as its request timeout.
+    """
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    multiplier: float = 2.0
+    deadline_seconds: Optional[float] = 300.0
+    respect_retry_after: bool = True
+
+    def backoff(self, attempt: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def delay_for(self, attempt: int, error: BaseException) -> float:
+        delay = self.backoff(attempt)
+        if self.respect_retry_after:
+            retry_after = retry_after_seconds(error)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, MAX_RETRY_AFTER_SECONDS))
+        return delay
+
+
+# Retries disabled: one attempt, no deadline
+NO_RETRY = RetryPolicy(max_attempts=1, deadline_seconds=None)
+
+
+@dataclass
+class RetryStats:
+    """What retrying cost for one call; merged into GenerationResult.metadata"""
+    attempts: int = 0
+    wait_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0   # time held back by client-side rate limiting
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def retry_count(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def as_metadata(self) -> Dict[str, Any]:
+        metadata: Dict[str, Any] = {
+            "retry_count": self.retry_count,
+            "retry_wait_seconds": round(self.wait_seconds, 3),
+        }
+        if self.queue_wait_seconds:
+            metadata["rate_limit_wait_seconds"] = round(self.queue_wait_seconds, 3)
+        if self.errors:
+            metadata["retry_errors"] = list(self.errors)
+        return metadata
+
+
+def _request_options(policy: RetryPolicy, start_time: float) -> Dict[str, Any]:
+    """Per-attempt SDK options (the remaining deadline as the request timeout)"""
+    if policy.deadline_seconds is None:
+        return {}
+    remaining = policy.deadline_seconds - (time.monotonic() - start_time)
+    return {"timeout": max(remaining, 0.001)}
+
+
+def _next_delay(
+    policy: RetryPolicy,
+    stats: RetryStats,
+    error: BaseException,
+    start_time: float
+) -> Optional[float]:
+    """Delay before the next attempt, or None to give up and re-raise"""
+    kind = classify_error(error)
+    stats.errors.append(kind if error_status(error) is None else f"{kind}:{error_status(error)}")
+    if kind in NON_RETRYABLE_KINDS or stats.attempts >= policy.max_attempts:
+        return None
+
+    delay = policy.delay_for(stats.attempts, error)
+    if policy.deadline_seconds is not None:
+        elapsed = time.monotonic() - start_time
+        if elapsed + delay >= policy.deadline_seconds:
+            return None
+    return delay
+
+
+def call_with_retry(
+    call: Callable[[Dict[str, Any]], Any],
+    policy: RetryPolicy,
+    stats: Optional[RetryStats] = None,
+    cancel_token=None
+) -> Any:
+    """
+    Run call under policy and return its result.
+
+    Args:
+        call: Makes one attempt; receives SDK request options to pass
+            through (e.g. {"timeout": remaining_seconds})
+        policy: Retry policy
+        stats: Filled in with attempts, wait time and error kinds
+        cancel_token: Optional cancellation.CancellationToken; cuts backoff
+            sleeps short (raising GenerationCancelled)
+
+    Raises:
+        The last error once it is fatal, attempts are used up or the
+        deadline would be exceeded
+    """
+    stats = stats if stats is not None else RetryStats()
+    start_time = time.monotonic()
+    while True:
+        stats.attempts += 1
+        try:
+            return call(_request_options(policy, start_time))
+        except Exception as e:
+            delay = _next_delay(policy, stats, e, start_time)
+            if delay is None:
+                raise
+        if cancel_token is not None:
+            cancel_token.sleep(delay)
+        else:
+            time.sleep(delay)
+        stats.wait_seconds += delay
+
+
+async def call_with_retry_async(
+    call: Callable[[Dict[str, Any]], Awaitable[Any]],
+    policy: RetryPolicy,
+    stats: Optional[RetryStats] = None,
+    cancel_token=None
+) -> Any:
+    """asyncio counterpart of call_with_retry"""
+    stats = stats if stats is not None else RetryStats()
+    start_time = time.monotonic()
+    while True:
+        stats.attempts += 1
+        try:
+            return await call(_request_options(policy, start_time))
+        except Exception as e:
+            delay = _next_delay(policy, stats, e, start_time)
+            if delay is None:
+                raise
+        if cancel_token is not None:
+            await cancel_token.sleep_async(delay)
+        else:
+            await asyncio.sleep(delay)
+        stats.wait_seconds += delay
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while a circuit is open"""
+
+    def __init__(self, key: str, retry_in: float, failures: int):
+        self.key = key
+        self.retry_in = retry_in
+        super().__init__(
+            f"Circuit open for {key} after {failures} consecutive failures; "
+            f"next probe in {retry_in:.1f}s"
+        )
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """When a circuit opens and how it recovers"""
+    failure_threshold: int = 5          # consecutive failures that open the circuit
+    reset_timeout_seconds: float = 30.0  # open -> half-open after this long
+    half_open_max_calls: int = 1        # probes allowed while half-open
+    # Error kinds (see classify_error) that count as provider failures.
+    # Rate limits are left to the rate limiter; fatal errors are our fault.
+    trip_on: tuple = ("server_error", "timeout", "connection")
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one (provider, model) key"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, key: str, config: Optional[CircuitBreakerConfig] = None):
+        self.key = key
+        self.config = config or CircuitBreakerConfig()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.fast_failures = 0
+        self.cancellations = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Admit a call or fail fast.
+
+        Raises:
+            CircuitOpenError: while open, or half-open with its probes in flight
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                elapsed = time.monotonic() - self.opened_at
+                if elapsed < self.config.reset_timeout_seconds:
+                    self.fast_failures += 1
+                    raise CircuitOpenError(
+                        self.key, self.config.reset_timeout_seconds - elapsed,
+                        self.consecutive_failures
+                    )
+                self.state = self.HALF_OPEN
+                self._probes = 0
+
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.config.half_open_max_calls:
+                    self.fast_failures += 1
+                    raise CircuitOpenError(self.key, 0.0, self.consecutive_failures)
+                self._probes += 1
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self, error: BaseException):
+        kind = classify_error(error)
+        with self._lock:
+            if kind == "cancelled":
+                # Our caller gave up; says nothing about the provider
+                self.cancellations += 1
+            if kind not in self.config.trip_on:
+                # Not the provider's fault; just free a half-open probe slot
+                if self.state == self.HALF_OPEN:
+                    self._probes = max(0, self._probes - 1)
+                return
+            self.consecutive_failures += 1
+            if (self.state == self.HALF_OPEN
+                    or self.consecutive_failures >= self.config.failure_threshold):
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """A call admitted by before_call() never reached the provider"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def is_open(self) -> bool:
+        """True if a call made now would fail fast"""
+        with self._lock:
+            return (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at < self.config.reset_timeout_seconds
+            )
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "fast_failures": self.fast_failures,
+                "cancellations": self.cancellations,
+            }
+
+
+class CircuitBreakers:
+    """
+    One CircuitBreaker per (provider, model), plus optional fallbacks.
+
+    Args:
+        config: Thresholds shared by every breaker
+        fallbacks: Short model name -> model to use while its circuit is
+            open, e.g. {"nano-banana-pro": "nano-banana"}
+    """
+
+    def __init__(
+        self,
+        config: Optional[CircuitBreakerConfig] = None,
+        fallbacks: Optional[Dict[str, str]] = None
+    ):
+        self.config = config or CircuitBreakerConfig()
+        self.fallbacks = dict(fallbacks or {})
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str, model: str) -> CircuitBreaker:
+        key = f"{provider}|{model}"
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(key, self.config)
+                self._breakers[key] = breaker
+            return breaker
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.key: breaker.metrics() for breaker in breakers}
+
+
+# Process-wide breakers shared by all generators
+_default_breakers: Optional[CircuitBreakers] = None
+_default_lock = threading.Lock()
+
+
+def get_default_circuit_breakers() -> CircuitBreakers:
+    """The shared CircuitBreakers (created on first use, no fallbacks)"""
+    global _default_breakers
+    with _default_lock:
+        if _default_breakers is None:
+            _default_breakers = CircuitBreakers()
+        return _default_breakers
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Flyer HTTP Server
+
+asyncio HTTP/JSON API for app backends: submit a FlyerProject and get a
+job id back at once, poll (or long-poll) the job, fetch its image, and
+refine / reformat a finished flyer the way main.py's post-generation
+loop does. No request holds a worker while an image renders: jobs wait
+in a bounded queue for a fixed number of generation slots, and when the
+queue is full submissions get 503 with Retry-After. On SIGTERM / Ctrl+C
+the server stops taking jobs, finishes the queued and running ones (up
+to --drain-timeout), then exits.
+
+Built on asyncio streams only (no web framework dependency); HTTP/1.1
+with keep-alive, Content-Length bodies.
+
+Endpoints:
+    POST   /jobs                    FlyerProject JSON (models.project_to_dict)
+                                    or {"project": {...}} -> 202 {"job_id", ...}
+    GET    /jobs/<id>[?wait=30]     Job status; wait long-polls until it finishes
+    GET    /jobs/<id>/image         The flyer (with its QR code, if enabled)
+    POST   /jobs/<id>/refine        {"feedback": "...", "mode": "edit" | "new"} -> 202
+    POST   /jobs/<id>/reformat      {"aspect_ratio": "9:16"} -> 202
+    DELETE /jobs/<id>               Cancel a queued or running job
+    GET    /health                  Queue depth and state
+
+Usage:
+    python server.py --port 8080 --openrouter
+    python server.py --mock --concurrency 2 --max-queue 20
+"""
+import argparse
+import asyncio
+import json
+import signal
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import qr_service
+from models import AspectRatio, project_from_dict
+from prompt_builder import FlyerPromptBuilder, RefinementPromptBuilder
+from image_generator import create_generator, GenerationResult
+from image_assets import sniff_mime_type
+from generation_cache import GenerationCache, DEFAULT_CACHE_DIR
+from cancellation import CancellationToken
+
+
+# Defaults
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_CONCURRENCY = 4           # generations running at once
+DEFAULT_MAX_QUEUE = 50            # jobs waiting for a slot before 503s
+DEFAULT_JOB_TIMEOUT = 300.0       # per-job deadline, seconds
+DEFAULT_DRAIN_TIMEOUT = 120.0     # how long shutdown waits for jobs to finish
+DEFAULT_MAX_JOBS = 1000           # finished jobs kept for polling
+MAX_WAIT_SECONDS = 60.0           # longest long-poll
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """An error response: status code, message and extra headers"""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+        super().__init__(message)
+
+
+@dataclass
+class Job:
+    """One generation (initial, refine or reformat) and its outcome"""
+    job_id: str
+    kind: str
+    request: Dict[str, Any]              # generate() keyword arguments
+    package: Dict[str, str]              # the project's prompt package
+    qr_url: Optional[str] = None
+    input_images: List[str] = field(default_factory=list)   # logo / photo paths
+    parent_id: Optional[str] = None
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[GenerationResult] = None
+    image_path: Optional[str] = None     # served image (QR composited copy if enabled)
+    error: Optional[str] = None
+    token: CancellationToken = field(default_factory=CancellationToken)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "parent_id": self.parent_id,
+            "aspect_ratio": self.request.get("aspect_ratio"),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "model": self.result.model_used if self.result else None,
+            "generation_time_seconds": self.result.generation_time_seconds if self.result else None,
+            "image_url": f"/jobs/{self.job_id}/image" if self.status == SUCCEEDED else None,
+        }
+
+
+class FlyerServer:
+    """
+    Job queue, generation slots and HTTP routing.
+
+    Args:
+        generator: Async generator (create_generator(async_mode=True))
+        concurrency: Jobs generating at once
+        max_queue: Jobs waiting for a slot; beyond this submissions get 503
+        job_timeout: Deadline per job in seconds
+        output_dir: Where QR-composited copies are written
+        max_jobs: Finished jobs kept for polling (oldest are forgotten)
+    """
+
+    def __init__(
+        self,
+        generator,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        job_timeout: float = DEFAULT_JOB_TIMEOUT,
+        output_dir: str = "./generated",
+        max_jobs: int = DEFAULT_MAX_JOBS
+    ):
+        self.generator = generator
+        self.concurrency = max(1, concurrency)
+        self.job_timeout = job_timeout
+        self.output_dir = Path(output_dir)
+        self.max_jobs = max_jobs
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.draining = False
+        self.running = 0
+        self._avg_job_seconds = 20.0
+        self._workers: List[asyncio.Task] = []
+        self._connections = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"flyer-slot-{i}")
+            for i in range(self.concurrency)
+        ]
+        self._server = await asyncio.start_server(
+            self._handle_connection, host, port, limit=MAX_HEADER_BYTES
+        )
+        return self._server
+
+    async def drain(self, timeout: float = DEFAULT_DRAIN_TIMEOUT):
+        """
+        Stop accepting jobs and connections, let queued and running jobs
+        finish (cancelling whatever is left after timeout), then close.
+        """
+        self.draining = True
+        if self._server is not None:
+            self._server.close()
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            for job in self.jobs.values():
+                if job.status not in FINISHED_STATES:
+                    job.token.cancel("server shutting down")
+            await self.queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for writer in list(self._connections):
+            writer.close()
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    def _submit(self, job: Job) -> Job:
+        if self.draining:
+            raise HTTPError(503, "Server is shutting down", {"Retry-After": "30"})
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            retry_after = max(1, round(
+                self._avg_job_seconds * (self.queue.qsize() + self.running) / self.concurrency
+            ))
+            raise HTTPError(503, "Too many jobs queued", {"Retry-After": str(retry_after)})
+        self.jobs[job.job_id] = job
+        self._evict()
+        return job
+
+    def _evict(self):
+        """Forget the oldest finished jobs beyond max_jobs"""
+        excess = len(self.jobs) - self.max_jobs
+        for job_id in [j.job_id for j in self.jobs.values() if j.status in FINISHED_STATES][:max(0, excess)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status == QUEUED:
+                    self.running += 1
+                    try:
+                        await self._run(job)
+                    finally:
+                        self.running -= 1
+            except Exception as e:
+                job.status, job.error = FAILED, f"{type(e).__name__}: {e}"
+            finally:
+                if job.status not in FINISHED_STATES:
+                    job.status = CANCELLED if job.token.cancelled else FAILED
+                job.finished_at = job.finished_at or time.time()
+                job.done.set()
+                self.queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status, job.started_at = RUNNING, time.time()
+        deadline = CancellationToken(timeout_seconds=self.job_timeout, parent=job.token)
+        results = await self.generator.generate(**job.request, cancel_token=deadline)
+        result = next((r for r in results if r.success), results[0] if results else None)
+        image_path = result.wait_until_saved() if result and result.success else None
+
+        if image_path and job.qr_url:
+            # Composite onto a copy: refinements edit the image without the QR code
+            served = Path(image_path).with_name(f"{Path(image_path).stem}_qr{Path(image_path).suffix}")
+            try:
+                image_path = await asyncio.to_thread(
+                    qr_service.composite_qr_onto_flyer, image_path, job.qr_url, served
+                )
+            except Exception as e:
+                print(f"Warning: QR compositing failed for job {job.job_id}: {e}")
+
+        job.result = result
+        job.finished_at = time.time()
+        if image_path:
+            job.status, job.image_path = SUCCEEDED, image_path
+            elapsed = job.finished_at - job.started_at
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+        elif result is not None and result.metadata.get("cancelled"):
+            job.status, job.error = CANCELLED, result.error_message
+        else:
+            job.status = FAILED
+            job.error = (result.error_message if result else None) or "No image generated"
+
+    def _job(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"No job {job_id}")
+        return job
+
+    def _finished_parent(self, job_id: str) -> Job:
+        parent = self._job(job_id)
+        if parent.status != SUCCEEDED:
+            raise HTTPError(409, f"Job {job_id} is {parent.status}; only finished flyers can be changed")
+        return parent
+
+    def _new_job(self, kind: str, request: Dict[str, Any], package: Dict[str, str], **kwargs) -> Job:
+        return Job(job_id=uuid.uuid4().hex, kind=kind, request=request, package=package, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+
+    async def submit_project(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        data = body.get("project", body)
+        try:
+            project = project_from_dict(data)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+        package = FlyerPromptBuilder(project).build()
+        input_images = [
+            path for path in (project.logo_path, project.user_photo_path)
+            if path and Path(path).exists()
+        ]
+        qr = project.qr_settings
+        job = self._submit(self._new_job(
+            "generate",
+            {
+                "prompt": package["main_prompt"],
+                "negative_prompt": package["negative_prompt"],
+                "model": package["model"],
+                "aspect_ratio": package["aspect_ratio"],
+                "quality": package["quality"],
+                "input_images": input_images or None,
+            },
+            package,
+            qr_url=qr.url if qr and qr.enabled and qr.url else None,
+            input_images=input_images
+        ))
+        return 202, job.to_dict()
+
+    async def refine(self, job_id: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Mirrors main.py's refine step: edit the image, or start over, with feedback"""
+        parent = self._finished_parent(job_id)
+        feedback = str(body.get("feedback") or "").strip()
+        mode = body.get("mode", "edit")
+        if not feedback:
+            raise HTTPError(400, '"feedback" is required')
+        if mode not in ("edit", "new"):
+            raise HTTPError(400, '"mode" must be "edit" or "new"')
+
+        prompt = RefinementPromptBuilder.build_refinement(parent.package["main_prompt"], feedback)
+        input_images: List[Any] = list(parent.input_images)
+        if mode == "edit":
+            input_images.append(parent.result)
+            prompt = RefinementPromptBuilder.build_edit(prompt, feedback)
+
+        job = self._submit(self._new_job(
+            "refine",
+            {**parent.request, "prompt": prompt, "input_images": input_images or None},
+            parent.package,
+            qr_url=parent.qr_url,
+            input_images=parent.input_images,
+            parent_id=parent.job_id
+        ))
+        return 202, job.to_dict()
+
+    async def reformat(self, job_id: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Mirrors main.py's reformat step: the same flyer at another aspect ratio"""
+        parent = self._finished_parent(job_id)
+        target = body.get("aspect_ratio")
+        if target not in [ratio.value for ratio in AspectRatio]:
+            raise HTTPError(400, f'"aspect_ratio" must be one of {", ".join(r.value for r in AspectRatio)}')
+
+        job = self._submit(self._new_job(
+            "reformat",
+            {
+                "prompt": RefinementPromptBuilder.build_reformat(target),
+                "aspect_ratio": target,
+                "input_images": [parent.result],
+            },
+            parent.package,
+            qr_url=parent.qr_url,
+            input_images=parent.input_images,
+            parent_id=parent.job_id
+        ))
+        return 202, job.to_dict()
+
+    async def job_status(self, job_id: str, query: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        job = self._job(job_id)
+        try:
+            wait = min(float(query.get("wait", ["0"])[0]), MAX_WAIT_SECONDS)
+        except ValueError:
+            raise HTTPError(400, '"wait" must be a number of seconds')
+        if wait > 0 and job.status not in FINISHED_STATES:
+            try:
+                await asyncio.wait_for(job.done.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        return 200, job.to_dict()
+
+    async def cancel(self, job_id: str) -> Tuple[int, Dict[str, Any]]:
+        job = self._job(job_id)
+        if job.status in FINISHED_STATES:
+            raise HTTPError(409, f"Job {job_id} already {job.status}")
+        job.token.cancel("cancelled by client")
+        if job.status == QUEUED:
+            # Still in the queue: the slot that picks it up just skips it
+            job.status, job.error, job.finished_at = CANCELLED, "Cancelled: cancelled by client", time.time()
+            job.done.set()
+        return 200, job.to_dict()
+
+    async def image(self, job_id: str) -> Tuple[bytes, str]:
+        job = self._job(job_id)
+        if job.status != SUCCEEDED:
+            raise HTTPError(409, f"Job {job_id} is {job.status}")
+        try:
+            data = await asyncio.to_thread(Path(job.image_path).read_bytes)
+        except OSError:
+            raise HTTPError(404, "Image file is no longer available")
+        return data, sniff_mime_type(data) or "application/octet-stream"
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "draining" if self.draining else "ok",
+            "queued": self.queue.qsize(),
+            "running": self.running,
+            "max_queue": self.queue.maxsize,
+            "concurrency": self.concurrency,
+        }
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _route(self, method: str, target: str, body: bytes):
+        """Returns (status, headers, body bytes)"""
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+
+        def payload() -> Dict[str, Any]:
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid JSON: {e}")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "Expected a JSON object")
+            return data
+
+        if parts == ["health"] and method == "GET":
+            return self._json(200, self.health())
+        if parts == ["jobs"] and method == "POST":
+            return self._json(*await self.submit_project(payload()))
+        if len(parts) == 2 and parts[0] == "jobs":
+            if method == "GET":
+                return self._json(*await self.job_status(parts[1], query))
+            if method == "DELETE":
+                return self._json(*await self.cancel(parts[1]))
+        if len(parts) == 3 and parts[0] == "jobs":
+            if parts[2] == "image" and method == "GET":
+                data, content_type = await self.image(parts[1])
+                return 200, {"Content-Type": content_type}, data
+            if parts[2] == "refine" and method == "POST":
+                return self._json(*await self.refine(parts[1], payload()))
+            if parts[2] == "reformat" and method == "POST":
+                return self._json(*await self.reformat(parts[1], payload()))
+        if parts[:1] in (["jobs"], ["health"]):
+            raise HTTPError(405, f"{method} not allowed on {url.path}")
+        raise HTTPError(404, f"No route for {url.path}")
+
+    def _json(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        return status, {"Content-Type": "application/json", **(headers or {})}, body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    and version.upper() == "HTTP/1.1"
+                )
+
+                try:
+                    length = int(headers.get("content-length", "0"))
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    status, response_headers, data = await self._route(method.upper(), target, body)
+                except HTTPError as e:
+                    status, response_headers, data = self._json(e.status, {"error": e.message}, e.headers)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except ValueError:
+                    keep_alive = False
+                    status, response_headers, data = self._json(400, {"error": "Bad Content-Length"})
+                except Exception as e:
+                    print(f"Warning: Request {method} {target} failed: {e}")
+                    status, response_headers, data = self._json(500, {"error": "Internal error"})
+
+                if self.draining:
+                    keep_alive = False
+                head_lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+                head_lines += [f"{name}: {value}" for name, value in response_headers.items()]
+                head_lines += [f"Content-Length: {len(data)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                writer.write(("\r\n".join(head_lines) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+
+async def serve(args):
+    generator = create_generator(
+        mock=args.mock,
+        use_openrouter=args.openrouter,
+        max_concurrency=max(1, args.concurrency),
+        async_mode=True,
+        cache=GenerationCache(args.cache) if args.cache else None,
+        # Images stay on disk; the server keeps only paths in memory
+        spill_to_disk=True
+    )
+    server = FlyerServer(
+        generator,
+        concurrency=args.concurrency,
+        max_queue=args.max_queue,
+        job_timeout=args.job_timeout,
+        output_dir=str(getattr(generator, "output_dir", "./generated"))
+    )
+    await server.start(args.host, args.port)
+    print(f"\n🌐 Flyer server on http://{args.host}:{args.port} "
+          f"({args.concurrency} slots, queue {args.max_queue})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print(f"\n⏸️  Draining: finishing {server.queue.qsize() + server.running} job(s) "
+          f"(up to {args.drain_timeout:.0f}s)...")
+    await server.drain(args.drain_timeout)
+    print("👋 Server stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flyer generation HTTP server")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Bind address (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Generations running at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help=f"Jobs waiting before submissions get 503 (default: {DEFAULT_MAX_QUEUE})")
+    parser.add_argument("--job-timeout", type=float, default=DEFAULT_JOB_TIMEOUT, metavar="SECONDS",
+                        help=f"Deadline per job (default: {DEFAULT_JOB_TIMEOUT:.0f})")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT, metavar="SECONDS",
+                        help=f"How long shutdown waits for jobs (default: {DEFAULT_DRAIN_TIMEOUT:.0f})")
+    parser.add_argument("--mock", action="store_true",
+                        help="Use mock generator (no API key needed)")
+    parser.add_argument("--openrouter", action="store_true",
+                        help="Use OpenRouter API instead of OpenAI directly")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                        help=f"Reuse results for identical requests (default dir: {DEFAULT_CACHE_DIR})")
+    args = parser.parse_args()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
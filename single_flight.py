@@ -0,0 +1,251 @@
+"""
+Single-Flight Coalescing
+
+Collapses identical concurrent generate() calls into one provider call.
+The first caller for a request fingerprint (see
+generation_cache.request_fingerprint) starts the call; callers arriving
+while it is in flight wait for it and each receive their own copy of the
+results, with their own image files.
+
+The call runs on its own (a thread, or a task on the caller's loop)
+under a flight token that no single caller owns. Each caller waits with
+its own cancellation token and leaves when that fires, getting
+GenerationCancelled; the provider call is cancelled only once every
+caller waiting on it has left.
+
+Usage:
+    from single_flight import SingleFlight
+    from image_generator import create_generator
+
+    generator = create_generator(single_flight=SingleFlight())
+"""
+import asyncio
+import shutil
+import threading
+import uuid
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Awaitable, Optional
+
+from cancellation import CancellationToken, GenerationCancelled
+from generation_cache import request_fingerprint
+from image_generator import GenerationResult, ImageHandle
+
+
+def copy_result(result: GenerationResult, output_dir: Path) -> GenerationResult:
+    """
+    Independent copy of a result for another caller.
+
+    A saved image is copied to a new file in output_dir so each caller can
+    move or delete its own; in-memory payloads are shared (strings are
+    immutable) and metadata is copied.
+    """
+    image_path = result.wait_until_saved() if result.image_path else None
+    image_handle = None
+    if image_path and Path(image_path).exists():
+        source = Path(image_path)
+        dest = Path(output_dir) / f"{source.stem}_{uuid.uuid4().hex[:8]}{source.suffix}"
+        shutil.copyfile(source, dest)
+        image_path = str(dest)
+        if result.image_handle is not None:
+            image_handle = ImageHandle.from_file(dest)
+    else:
+        image_path = None
+
+    copied = result.copy(image_path=image_path, image_handle=image_handle, save_future=None)
+    copied.metadata["coalesced"] = True
+    return copied
+
+
+class _Flight:
+    """One in-flight call: its outcome, its token and who is waiting on it"""
+
+    def __init__(self, outcome):
+        self.outcome = outcome      # concurrent.futures.Future or asyncio.Task
+        self.token = CancellationToken()
+        self.waiters = 0
+        self.claimed = False        # the first caller to collect takes the originals
+
+
+class SingleFlight:
+    """
+    In-process coalescing of identical in-flight generate() calls.
+
+    Shared by threads (run) and by asyncio tasks on the same loop
+    (run_async). Calls only coalesce while in flight; finished results are
+    not reused (that is GenerationCache's job).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+        self._async_calls: Dict[Any, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def key(self, scope: str, **request: Any) -> Optional[str]:
+        """
+        Flight key: caller scope (provider, save mode) + request
+        fingerprint; None if an input image can't be fingerprinted (the
+        request then runs uncoalesced)
+        """
+        try:
+            return f"{scope}:{request_fingerprint(**request)}"
+        except (OSError, TypeError, ValueError):
+            return None
+
+    def run(
+        self,
+        key: str,
+        call: Callable[[CancellationToken], List[GenerationResult]],
+        output_dir: Path,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[GenerationResult]:
+        """
+        Run call(flight_token) on a thread, or join the identical call
+        already in flight, and wait for its results.
+
+        Raises:
+            GenerationCancelled: if cancel_token fires first (the call
+                carries on while other callers still wait for it)
+        """
+        while True:
+            with self._lock:
+                flight = self._calls.get(key)
+                if flight is None:
+                    flight = self._start(key, call)
+                else:
+                    self.coalesced += 1
+                flight.waiters += 1
+
+            woke = threading.Event()
+            flight.outcome.add_done_callback(lambda f: woke.set())
+            remove = cancel_token.add_callback(woke.set) if cancel_token is not None else None
+            try:
+                woke.wait(cancel_token.remaining() if cancel_token is not None else None)
+            finally:
+                if remove is not None:
+                    remove()
+
+            if not flight.outcome.done():
+                self._leave(self._calls, key, flight)
+                raise GenerationCancelled(cancel_token.reason or "deadline exceeded")
+            if self._cancelled_under(flight, cancel_token):
+                continue    # every earlier caller left; start the call again
+            results = flight.outcome.result()
+            return self._collect(flight, results, output_dir)
+
+    def _start(self, key: str, call: Callable[[CancellationToken], List[GenerationResult]]) -> _Flight:
+        """New flight for key, its call running on a daemon thread (caller holds the lock)"""
+        flight = _Flight(Future())
+        self._calls[key] = flight
+        self.leaders += 1
+
+        def worker():
+            try:
+                flight.outcome.set_result(call(flight.token))
+            except BaseException as e:
+                flight.outcome.set_exception(e)
+            finally:
+                with self._lock:
+                    if self._calls.get(key) is flight:
+                        del self._calls[key]
+
+        threading.Thread(target=worker, name="single-flight", daemon=True).start()
+        return flight
+
+    async def run_async(
+        self,
+        key: str,
+        call: Callable[[CancellationToken], Awaitable[List[GenerationResult]]],
+        output_dir: Path,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> List[GenerationResult]:
+        """
+        asyncio counterpart of run(). The call runs as its own task, so
+        cancelling one caller's task (e.g. a disconnected HTTP client) only
+        removes that caller.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        while True:
+            with self._lock:
+                flight = self._async_calls.get(flight_key)
+                if flight is None:
+                    flight = _Flight(None)
+                    flight.outcome = loop.create_task(self._run_flight(flight_key, flight, call))
+                    self._async_calls[flight_key] = flight
+                    self.leaders += 1
+                else:
+                    self.coalesced += 1
+                flight.waiters += 1
+
+            # shield: leaving must not cancel the shared task
+            waiting = asyncio.shield(flight.outcome)
+            try:
+                if cancel_token is not None:
+                    results = await cancel_token.run_async(waiting)
+                else:
+                    results = await waiting
+            except asyncio.CancelledError:
+                if flight.outcome.cancelled() and not asyncio.current_task().cancelling():
+                    continue    # the shared task was cancelled, not this caller: lead a new one
+                self._leave(self._async_calls, flight_key, flight)
+                raise
+            except GenerationCancelled:
+                self._leave(self._async_calls, flight_key, flight)
+                raise
+            if self._cancelled_under(flight, cancel_token):
+                continue    # every earlier caller left; start the call again
+            return await asyncio.to_thread(self._collect, flight, results, output_dir)
+
+    async def _run_flight(self, flight_key, flight: _Flight, call) -> List[GenerationResult]:
+        try:
+            return await call(flight.token)
+        finally:
+            with self._lock:
+                if self._async_calls.get(flight_key) is flight:
+                    del self._async_calls[flight_key]
+
+    def _leave(self, calls: Dict[Any, _Flight], key, flight: _Flight):
+        """A caller stopped waiting; cancel the call once nobody waits for it"""
+        with self._lock:
+            flight.waiters -= 1
+            abandoned = flight.waiters == 0
+            if abandoned and calls.get(key) is flight:
+                # Later callers start afresh rather than join a cancelled call
+                del calls[key]
+        if abandoned:
+            flight.token.cancel("every coalesced caller cancelled")
+
+    def _cancelled_under(self, flight: _Flight, cancel_token: Optional[CancellationToken]) -> bool:
+        """
+        True if the flight was cancelled because all its callers left,
+        while this caller (which arrived in between) still wants results
+        """
+        return flight.token.cancelled and not (cancel_token is not None and cancel_token.cancelled)
+
+    def _collect(
+        self, flight: _Flight, results: List[GenerationResult], output_dir: Path
+    ) -> List[GenerationResult]:
+        """The originals for the first caller to collect, copies for the rest"""
+        with self._lock:
+            first = not flight.claimed
+            flight.claimed = True
+        if first:
+            return results
+        return [copy_result(result, output_dir) for result in results]
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls made vs. requests coalesced onto them"""
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "calls": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "coalesce_rate": self.coalesced / total if total else 0.0,
+            }
@@ -0,0 +1,33 @@
+"""Tests for batch.run_batch with the mock generator"""
+import json
+
+from batch import run_batch
+from image_generator import MockFlyerGenerator
+from job_store import JobStore, job_id, DONE
+from models import FlyerProject, FlyerCategory, QRCodeSettings, project_to_dict
+
+
+def test_qr_failure_does_not_fail_the_item(tmp_path):
+    # The mock generator saves text files, so compositing a QR code onto them fails
+    project = FlyerProject(
+        category=FlyerCategory.EVENT,
+        qr_settings=QRCodeSettings(enabled=True, url="https://example.com")
+    )
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(json.dumps({"id": "spring", "project": project_to_dict(project)}) + "\n")
+    store = JobStore(str(tmp_path / "state.db"))
+    generator = MockFlyerGenerator(str(tmp_path / "generated"))
+
+    stats = run_batch(
+        generator, str(manifest), output_path=str(tmp_path / "results.jsonl"),
+        output_dir=str(tmp_path / "out"), job_store=store
+    )
+
+    record = json.loads((tmp_path / "results.jsonl").read_text())
+    assert stats.succeeded == 1 and stats.failed == 0
+    assert record["success"] and record["error"] is None
+    assert len(record["image_paths"]) == 1
+    assert record["qr_error"]
+    # Done, so a re-run doesn't pay for the generation again
+    job = job_id(project, provider=None, apply_qr=True)
+    assert store.status(job)["status"] == DONE
@@ -0,0 +1,88 @@
+"""Tests for FlyerImageGenerator.generate_batch on a fake Batch API"""
+from cancellation import CancellationToken
+
+
+def batch_requests(*prompts):
+    return [{"prompt": prompt, "model": "gpt-image-1", "quality": "low"} for prompt in prompts]
+
+
+def direct_calls(fake_client):
+    return [kwargs for endpoint, kwargs in fake_client.calls if endpoint == "images.generate"]
+
+
+def test_batch_returns_results_in_request_order(fake_client, make_generator):
+    generator = make_generator()
+
+    outcomes = generator.generate_batch(batch_requests("Spring sale", "Jazz night"), poll_interval=0.01)
+
+    assert [[r.success for r in results] for results in outcomes] == [[True], [True]]
+    assert all(r.metadata.get("batch_id") == "batch-0" for results in outcomes for r in results)
+    assert all(r.image_path and r.image_handle for results in outcomes for r in results)
+    assert direct_calls(fake_client) == []
+
+
+def test_failed_line_falls_back_to_generate(fake_client, make_generator):
+    generator = make_generator()
+
+    outcomes = generator.generate_batch(
+        batch_requests("Spring sale", "FAIL this one", "Jazz night"), poll_interval=0.01
+    )
+
+    assert [[r.success for r in results] for results in outcomes] == [[True], [True], [True]]
+    fallback = outcomes[1][0]
+    assert fallback.metadata["batch_error"] == "Rejected by the fake batch"
+    assert "batch_id" not in fallback.metadata
+    assert "batch_error" not in outcomes[0][0].metadata
+    # Only the failed line was generated again, directly
+    calls = direct_calls(fake_client)
+    assert len(calls) == 1 and "FAIL this one" in calls[0]["prompt"]
+    assert generator.metrics()["succeeded"] == 3
+
+
+def test_expired_batch_falls_back_for_every_line(fake_client, make_generator):
+    fake_client.batch_status = "expired"
+    generator = make_generator()
+
+    outcomes = generator.generate_batch(batch_requests("Spring sale", "Jazz night"), poll_interval=0.01)
+
+    assert [[r.success for r in results] for results in outcomes] == [[True], [True]]
+    assert all(r.metadata["batch_error"] == "Batch expired" for results in outcomes for r in results)
+    assert len(direct_calls(fake_client)) == 2
+
+
+def test_identical_requests_share_one_line(fake_client, make_generator):
+    generator = make_generator()
+
+    outcomes = generator.generate_batch(batch_requests("Spring sale", "Spring sale"), poll_interval=0.01)
+
+    assert outcomes[0][0].success and outcomes[1][0].success
+    assert outcomes[1][0].metadata.get("coalesced")
+    assert len(fake_client.uploads["file-0"].splitlines()) == 1
+
+
+def test_cancelled_batch_is_not_regenerated(fake_client, make_generator):
+    fake_client.batch_status = "in_progress"
+    generator = make_generator()
+    token = CancellationToken(timeout_seconds=0.2)
+
+    outcomes = generator.generate_batch(
+        batch_requests("Spring sale"), poll_interval=0.01, cancel_token=token
+    )
+
+    assert not outcomes[0][0].success
+    assert outcomes[0][0].metadata.get("cancelled")
+    assert fake_client.batch_objects["batch-0"].status == "cancelled"
+    assert direct_calls(fake_client) == []
+
+
+def test_nano_banana_requests_are_generated_directly(fake_client, make_generator):
+    generator = make_generator()
+
+    outcomes = generator.generate_batch(
+        [{"prompt": "Spring sale", "model": "nano-banana"}, *batch_requests("Jazz night")],
+        poll_interval=0.01
+    )
+
+    assert outcomes[0][0].success and outcomes[1][0].success
+    assert fake_client.calls_to("nano-banana") == 1
+    assert "batch_id" in outcomes[1][0].metadata
@@ -26,6 +26,7 @@ from models import (
 )
 from prompt_builder import FlyerPromptBuilder
 from image_generator import create_generator
+from generation_cache import GenerationCache, DEFAULT_CACHE_DIR
 import qr_service
 
 
@@ -1736,7 +1737,8 @@ def run_test(
     disable_logo: bool = False,
     disable_qr: bool = False,
     user_photo_override: str = None,
-    disable_user_photo: bool = False
+    disable_user_photo: bool = False,
+    cache_dir: str = None
 ):
     """Run a single test case."""
     if test_num not in TEST_CASES:
@@ -1793,7 +1795,8 @@ def run_test(
     # Generate image
     print(f"\n⏳ Generating image (using {'OpenRouter' if use_openrouter else 'OpenAI'})...")
 
-    generator = create_generator(mock=False, use_openrouter=use_openrouter)
+    cache = GenerationCache(cache_dir) if cache_dir else None
+    generator = create_generator(mock=False, use_openrouter=use_openrouter, cache=cache)
 
     # Prepare input images (for logo and user photo)
     input_images = []
@@ -1864,6 +1867,7 @@ Examples:
     python test_flyer.py 1 --photo photo.jpg    # Run with custom user photo
     python test_flyer.py 1 --qr https://...     # Run with custom QR URL
     python test_flyer.py 1 --no-qr              # Run without QR code
+    python test_flyer.py 1 --cache              # Reuse a previous identical generation
     python test_flyer.py 27                     # Run user photo test case
     python test_flyer.py 29                     # Run imagery description test case
         """
@@ -1884,6 +1888,8 @@ Examples:
                         help="Disable user photo even if test case has one")
     parser.add_argument("--no-qr", action="store_true",
                         help="Disable QR code even if test case has one")
+    parser.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                        help="Reuse results for identical requests instead of re-generating")
 
     args = parser.parse_args()
 
@@ -1909,7 +1915,8 @@ Examples:
                 disable_logo=args.no_logo,
                 disable_qr=args.no_qr,
                 user_photo_override=args.photo,
-                disable_user_photo=args.no_photo
+                disable_user_photo=args.no_photo,
+                cache_dir=args.cache
             )
             results[num] = success
 
@@ -1931,7 +1938,8 @@ Examples:
                 disable_logo=args.no_logo,
                 disable_qr=args.no_qr,
                 user_photo_override=args.photo,
-                disable_user_photo=args.no_photo
+                disable_user_photo=args.no_photo,
+                cache_dir=args.cache
             )
         except ValueError:
             print(f"❌ Invalid test number: {args.test}")
@@ -0,0 +1,59 @@
+"""Tests for generation_cache with a generator on a fake API client"""
+from conftest import FakeAPIError
+from generation_cache import GenerationCache
+from image_generator import GenerationResult, MockFlyerGenerator
+
+
+def test_cache_hit_skips_the_api(tmp_path, fake_client, make_generator):
+    cache = GenerationCache(str(tmp_path / "cache"))
+    generator = make_generator(cache=cache)
+
+    first = generator.generate("Spring sale", model="gpt-image-1", n=2)
+    second = generator.generate("Spring sale", model="gpt-image-1", n=2)
+
+    assert fake_client.calls_to("gpt-image-1") == 1
+    assert [r.success for r in first] == [True, True]
+    assert [r.metadata.get("cache") for r in second] == ["hit", "hit"]
+    assert all(r.image_base64 for r in second)
+    assert cache.stats()["hits"] == 1
+
+
+def test_different_request_misses(tmp_path, fake_client, make_generator):
+    generator = make_generator(cache=GenerationCache(str(tmp_path / "cache")))
+
+    generator.generate("Spring sale", model="gpt-image-1")
+    generator.generate("Summer sale", model="gpt-image-1")
+
+    assert fake_client.calls_to("gpt-image-1") == 2
+
+
+def test_failures_are_not_cached(tmp_path, fake_client, make_generator):
+    generator = make_generator(cache=GenerationCache(str(tmp_path / "cache")))
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(400)]
+
+    failed = generator.generate("Spring sale", model="gpt-image-1")
+    retried = generator.generate("Spring sale", model="gpt-image-1")
+
+    assert not failed[0].success
+    assert retried[0].success and retried[0].metadata.get("cache") is None
+    assert fake_client.calls_to("gpt-image-1") == 2
+
+
+def test_input_without_content_is_not_cached(tmp_path, fake_client, make_generator):
+    cache = GenerationCache(str(tmp_path / "cache"))
+    generator = make_generator(cache=cache)
+    unsaved = GenerationResult(success=True, image_url="http://example.invalid/flyer.png")
+
+    for _ in range(2):
+        results = generator.generate("Make it blue", input_images=[unsaved])
+        assert results[0].success
+
+    assert fake_client.calls_to("nano-banana") == 2
+    assert cache.stats()["hits"] == 0
+
+
+def test_mock_generator_with_unsaved_input(tmp_path):
+    generator = MockFlyerGenerator(str(tmp_path / "generated"), cache=GenerationCache(str(tmp_path / "cache")))
+    unsaved = GenerationResult(success=True, image_url="http://example.invalid/flyer.png")
+
+    assert generator.generate(prompt="p", input_images=[unsaved])[0].success
@@ -0,0 +1,127 @@
+"""Tests for image_download against a local HTTP server"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cancellation import CancellationToken, GenerationCancelled
+from conftest import PNG
+from image_download import ImageDownloader, DownloadError
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers each GET with the next scripted status (then 200 with PNG)"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        status = server.script.pop(0) if server.script else 200
+        if status == "truncated":
+            # Promise more bytes than are sent, then hang up
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(PNG) + 100))
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(PNG)
+            self.close_connection = True
+            return
+        body = PNG if status == 200 else b"error"
+        self.send_response(status)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    server.script = []
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def downloader():
+    downloader = ImageDownloader(timeout=5, retries=2, backoff_seconds=0.01)
+    yield downloader
+    downloader.close()
+
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_port}/image.png"
+
+
+def test_download_reports_checksum(server, downloader, tmp_path):
+    target = tmp_path / "image.png"
+    stats = downloader.download(url(server), target)
+
+    assert target.read_bytes() == PNG
+    assert stats.sha256 == hashlib.sha256(PNG).hexdigest()
+    assert stats.bytes == len(PNG)
+    assert stats.attempts == 1
+
+
+def test_pooled_connection_is_reused(server, downloader, tmp_path):
+    downloader.download(url(server), tmp_path / "a.png")
+    stats = downloader.download(url(server), tmp_path / "b.png")
+
+    assert stats.reused_connection
+
+
+def test_retryable_status_is_retried(server, downloader, tmp_path):
+    server.script = [503, 429]
+    stats = downloader.download(url(server), tmp_path / "image.png")
+
+    assert stats.attempts == 3
+    assert server.requests == 3
+    assert stats.sha256 == hashlib.sha256(PNG).hexdigest()
+
+
+def test_truncated_body_is_retried(server, downloader, tmp_path):
+    server.script = ["truncated"]
+    target = tmp_path / "image.png"
+    stats = downloader.download(url(server), target)
+
+    assert stats.attempts == 2
+    assert target.read_bytes() == PNG
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_gives_up_after_retries(server, downloader, tmp_path):
+    server.script = [503, 503, 503]
+    with pytest.raises(DownloadError):
+        downloader.download(url(server), tmp_path / "image.png")
+
+    assert server.requests == 3
+    assert not (tmp_path / "image.png").exists()
+
+
+def test_fatal_status_is_not_retried(server, downloader, tmp_path):
+    server.script = [404]
+    with pytest.raises(DownloadError):
+        downloader.download(url(server), tmp_path / "image.png")
+
+    assert server.requests == 1
+
+
+def test_cancel_cuts_backoff_short(server, tmp_path):
+    downloader = ImageDownloader(timeout=5, retries=2, backoff_seconds=5)
+    server.script = [503]
+    token = CancellationToken(timeout_seconds=0.2)
+    started = time.monotonic()
+    with pytest.raises(GenerationCancelled):
+        downloader.download(url(server), tmp_path / "image.png", cancel_token=token)
+
+    assert time.monotonic() - started < 2
+    downloader.close()
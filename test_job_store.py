@@ -0,0 +1,66 @@
+"""Tests for job_store leases, attempts and skip reasons"""
+import time
+
+from job_store import JobStore, DONE, IN_FLIGHT, FAILED, PENDING, OUT_OF_ATTEMPTS
+
+
+def store(tmp_path, **kwargs) -> JobStore:
+    return JobStore(str(tmp_path / "state.db"), **kwargs)
+
+
+def test_done_job_is_not_claimed_again(tmp_path):
+    jobs = store(tmp_path)
+    claim = jobs.claim("job-1", item_id="spring")
+
+    assert jobs.complete(claim, {"success": True})
+    assert jobs.try_claim("job-1") == (None, DONE)
+    assert jobs.status("job-1")["record"] == {"success": True}
+
+
+def test_live_lease_is_skipped_as_in_flight(tmp_path):
+    jobs = store(tmp_path)
+    assert jobs.claim("job-1") is not None
+
+    # Another run (its own connection) sees the lease
+    assert store(tmp_path).try_claim("job-1") == (None, IN_FLIGHT)
+
+
+def test_failed_job_is_retried_until_out_of_attempts(tmp_path):
+    jobs = store(tmp_path, max_attempts=2)
+
+    first = jobs.claim("job-1")
+    assert jobs.fail(first, "HTTP 503")
+    second = jobs.claim("job-1")
+    assert second.attempt == 2
+    assert jobs.fail(second, "HTTP 503")
+
+    assert jobs.try_claim("job-1") == (None, OUT_OF_ATTEMPTS)
+    assert jobs.status("job-1")["status"] == FAILED
+
+
+def test_expired_lease_counts_as_an_attempt(tmp_path):
+    jobs = store(tmp_path, max_attempts=2, lease_seconds=0.1)
+    stale = jobs.claim("job-1")
+    time.sleep(0.15)
+
+    retry = jobs.claim("job-1")
+
+    assert retry.attempt == 2
+    # The stale worker lost its lease, so it can't overwrite the retry
+    assert not jobs.complete(stale, {"success": True})
+    assert jobs.status("job-1")["status"] == IN_FLIGHT
+
+    time.sleep(0.15)
+    assert jobs.try_claim("job-1") == (None, OUT_OF_ATTEMPTS)
+    status = jobs.status("job-1")
+    assert status["status"] == FAILED and "Lease expired" in status["error"]
+
+
+def test_release_gives_the_attempt_back(tmp_path):
+    jobs = store(tmp_path, max_attempts=1)
+    claim = jobs.claim("job-1")
+
+    assert jobs.release(claim)
+    assert jobs.status("job-1")["status"] == PENDING
+    assert jobs.claim("job-1").attempt == 1
+    assert jobs.counts() == {IN_FLIGHT: 1}
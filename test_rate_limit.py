@@ -0,0 +1,43 @@
+"""Tests for rate limit waits, through generators on a fake API client"""
+import asyncio
+import threading
+import time
+
+from cancellation import CancellationToken
+from rate_limit import RateLimiter, RateLimit
+
+
+def one_per_minute():
+    return RateLimiter(default=RateLimit(requests_per_minute=1, burst=1))
+
+
+def test_cancel_ends_a_rate_limit_wait(fake_client, make_generator):
+    generator = make_generator(rate_limiter=one_per_minute())
+    assert generator.generate("Spring sale", model="gpt-image-1")[0].success
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel, args=("client went away",)).start()
+
+    started = time.monotonic()
+    results = generator.generate("Jazz night", model="gpt-image-1", cancel_token=token)
+
+    assert time.monotonic() - started < 1
+    assert results[0].metadata.get("cancelled")
+    assert "client went away" in results[0].error_message
+    assert fake_client.calls_to("gpt-image-1") == 1
+
+
+def test_cancel_ends_an_async_rate_limit_wait(fake_client, make_async_generator):
+    generator = make_async_generator(rate_limiter=one_per_minute())
+
+    async def main():
+        await generator.generate("Spring sale", model="gpt-image-1")
+        token = CancellationToken()
+        asyncio.get_running_loop().call_later(0.1, token.cancel, "client went away")
+        return await generator.generate("Jazz night", model="gpt-image-1", cancel_token=token)
+
+    started = time.monotonic()
+    results = asyncio.run(main())
+
+    assert time.monotonic() - started < 1
+    assert results[0].metadata.get("cancelled")
+    assert fake_client.calls_to("gpt-image-1") == 1
@@ -0,0 +1,141 @@
+"""Tests for retries and circuit breakers, through a generator on a fake API client"""
+import time
+
+from conftest import FakeAPIError
+from resilience import (
+    RetryPolicy, RetryStats, CircuitBreakers, CircuitBreakerConfig, call_with_retry
+)
+
+
+def test_transient_errors_are_retried(fake_client, make_generator):
+    generator = make_generator()
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(503), FakeAPIError(429)]
+
+    results = generator.generate("Spring sale", model="gpt-image-1")
+
+    assert results[0].success
+    assert fake_client.calls_to("gpt-image-1") == 3
+    assert results[0].metadata["retry_count"] == 2
+    assert results[0].metadata["retry_errors"] == ["server_error:503", "rate_limit:429"]
+
+
+def test_retries_stop_at_max_attempts(fake_client, make_generator):
+    generator = make_generator(retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(503)] * 3
+
+    results = generator.generate("Spring sale", model="gpt-image-1")
+
+    assert not results[0].success
+    assert fake_client.calls_to("gpt-image-1") == 2
+
+
+def test_fatal_errors_are_not_retried(fake_client, make_generator):
+    generator = make_generator()
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(400)]
+
+    results = generator.generate("Spring sale", model="gpt-image-1")
+
+    assert not results[0].success
+    assert fake_client.calls_to("gpt-image-1") == 1
+
+
+def test_retry_after_is_honoured(fake_client, make_generator):
+    # Zero backoff, so any wait comes from the header
+    generator = make_generator(retry_policy=RetryPolicy(base_delay=0.0))
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(429, {"retry-after": "0.3"})]
+
+    started = time.monotonic()
+    results = generator.generate("Spring sale", model="gpt-image-1")
+
+    assert results[0].success
+    assert time.monotonic() - started >= 0.3
+    assert results[0].metadata["retry_wait_seconds"] >= 0.3
+
+
+def test_retry_after_ms_is_honoured():
+    error = FakeAPIError(429, {"retry-after-ms": "150"})
+    assert RetryPolicy(base_delay=0.0).delay_for(1, error) == 0.15
+
+
+def test_no_retry_past_the_deadline():
+    policy = RetryPolicy(base_delay=0.0, deadline_seconds=0.2)
+    stats = RetryStats()
+    attempts = []
+
+    def call(options):
+        attempts.append(options)
+        raise FakeAPIError(429, {"retry-after": "5"})
+
+    started = time.monotonic()
+    try:
+        call_with_retry(call, policy, stats)
+    except FakeAPIError:
+        pass
+    assert len(attempts) == 1
+    assert time.monotonic() - started < 1
+    assert 0 < attempts[0]["timeout"] <= 0.2
+
+
+def test_circuit_opens_and_falls_back(fake_client, make_generator):
+    breakers = CircuitBreakers(
+        CircuitBreakerConfig(failure_threshold=2, reset_timeout_seconds=60),
+        fallbacks={"nano-banana-pro": "nano-banana"}
+    )
+    generator = make_generator(
+        retry_policy=RetryPolicy(max_attempts=1), circuit_breakers=breakers
+    )
+    fake_client.errors["nano-banana-pro"] = [FakeAPIError(503)] * 2
+
+    for _ in range(2):
+        assert not generator.generate("Spring sale", model="nano-banana-pro")[0].success
+    assert breakers.breaker("openai", "nano-banana-pro").is_open()
+
+    results = generator.generate("Spring sale", model="nano-banana-pro")
+
+    assert results[0].success
+    assert results[0].metadata["fallback_from"] == "nano-banana-pro"
+    assert fake_client.calls_to("nano-banana-pro") == 2
+    assert fake_client.calls_to("nano-banana") == 1
+
+
+def test_open_circuit_fails_fast_without_fallback(fake_client, make_generator):
+    breakers = CircuitBreakers(CircuitBreakerConfig(failure_threshold=1, reset_timeout_seconds=60))
+    generator = make_generator(
+        retry_policy=RetryPolicy(max_attempts=1), circuit_breakers=breakers
+    )
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(500)]
+
+    generator.generate("Spring sale", model="gpt-image-1")
+    results = generator.generate("Spring sale", model="gpt-image-1")
+
+    assert not results[0].success
+    assert "Circuit open" in results[0].error_message
+    assert fake_client.calls_to("gpt-image-1") == 1
+
+
+def test_rate_limits_do_not_trip_the_circuit(fake_client, make_generator):
+    breakers = CircuitBreakers(CircuitBreakerConfig(failure_threshold=1))
+    generator = make_generator(
+        retry_policy=RetryPolicy(max_attempts=1), circuit_breakers=breakers
+    )
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(429)]
+
+    generator.generate("Spring sale", model="gpt-image-1")
+
+    assert not breakers.breaker("openai", "gpt-image-1").is_open()
+    assert generator.generate("Spring sale", model="gpt-image-1")[0].success
+
+
+def test_half_open_probe_closes_the_circuit(fake_client, make_generator):
+    breakers = CircuitBreakers(CircuitBreakerConfig(failure_threshold=1, reset_timeout_seconds=0.1))
+    generator = make_generator(
+        retry_policy=RetryPolicy(max_attempts=1), circuit_breakers=breakers
+    )
+    fake_client.errors["gpt-image-1"] = [FakeAPIError(502)]
+
+    generator.generate("Spring sale", model="gpt-image-1")
+    time.sleep(0.15)
+    results = generator.generate("Spring sale", model="gpt-image-1")
+
+    assert results[0].success
+    assert breakers.breaker("openai", "gpt-image-1").metrics()["state"] == "closed"
@@ -0,0 +1,128 @@
+"""Tests for the FlyerServer HTTP API on an ephemeral port, with a fake API client"""
+import asyncio
+import json
+
+from models import FlyerProject, FlyerCategory, project_to_dict
+from server import FlyerServer, HTTPError, QUEUED, RUNNING, SUCCEEDED, CANCELLED
+
+
+PROJECT = project_to_dict(FlyerProject(category=FlyerCategory.EVENT))
+
+
+async def request(port, method, path, body=None):
+    """One HTTP/1.1 request; returns (status, lower-case headers, decoded JSON body)"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+        f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = {
+        name.strip().lower(): value.strip()
+        for name, value in (line.split(":", 1) for line in header_lines)
+    }
+    return int(status_line.split()[1]), headers, json.loads(payload)
+
+
+async def started(generator, tmp_path, **kwargs):
+    """A running FlyerServer on an ephemeral port, and that port"""
+    server = FlyerServer(generator, output_dir=str(tmp_path / "served"), **kwargs)
+    listener = await server.start("127.0.0.1", 0)
+    return server, listener.sockets[0].getsockname()[1]
+
+
+def test_full_queue_gets_503_with_retry_after(fake_client, make_async_generator, tmp_path):
+    fake_client.delay = 0.3
+    generator = make_async_generator()
+
+    async def main():
+        server, port = await started(generator, tmp_path, concurrency=1, max_queue=1)
+        running = await request(port, "POST", "/jobs", PROJECT)
+        await asyncio.sleep(0.05)    # the only slot picks it up
+        queued = await request(port, "POST", "/jobs", PROJECT)
+        rejected = await request(port, "POST", "/jobs", PROJECT)
+        health = await request(port, "GET", "/health")
+        await server.drain(timeout=5)
+        return running, queued, rejected, health
+
+    running, queued, rejected, health = asyncio.run(main())
+
+    assert running[0] == 202 and queued[0] == 202
+    status, headers, body = rejected
+    assert status == 503
+    assert int(headers["retry-after"]) >= 1
+    assert body["error"] == "Too many jobs queued"
+    assert health[2]["queued"] == 1 and health[2]["running"] == 1
+
+
+def test_cancelled_queued_job_is_never_generated(fake_client, make_async_generator, tmp_path):
+    fake_client.delay = 0.3
+    generator = make_async_generator()
+
+    async def main():
+        server, port = await started(generator, tmp_path, concurrency=1)
+        _, _, first = await request(port, "POST", "/jobs", PROJECT)
+        await asyncio.sleep(0.05)
+        _, _, second = await request(port, "POST", "/jobs", PROJECT)
+        cancelled = await request(port, "DELETE", f"/jobs/{second['job_id']}")
+        again = await request(port, "DELETE", f"/jobs/{second['job_id']}")
+        _, _, finished = await request(port, "GET", f"/jobs/{first['job_id']}?wait=5")
+        _, _, skipped = await request(port, "GET", f"/jobs/{second['job_id']}")
+        await server.drain(timeout=5)
+        return second, cancelled, again, finished, skipped
+
+    second, cancelled, again, finished, skipped = asyncio.run(main())
+
+    assert second["status"] == QUEUED
+    assert cancelled[0] == 200 and cancelled[2]["status"] == CANCELLED
+    assert again[0] == 409
+    assert finished["status"] == SUCCEEDED
+    assert skipped["status"] == CANCELLED and skipped["started_at"] is None
+    assert len(fake_client.calls) == 1
+
+
+def test_drain_finishes_queued_jobs_and_refuses_new_ones(fake_client, make_async_generator, tmp_path):
+    fake_client.delay = 0.1
+    generator = make_async_generator()
+
+    async def main():
+        server, port = await started(generator, tmp_path, concurrency=1)
+        submitted = [(await request(port, "POST", "/jobs", PROJECT))[2] for _ in range(3)]
+        await server.drain(timeout=5)
+        try:
+            await server.submit_project(PROJECT)
+            refused = None
+        except HTTPError as e:
+            refused = e
+        return server, submitted, refused
+
+    server, submitted, refused = asyncio.run(main())
+
+    assert [server.jobs[job["job_id"]].status for job in submitted] == [SUCCEEDED] * 3
+    assert refused.status == 503 and "Retry-After" in refused.headers
+    assert len(fake_client.calls) == 3
+
+
+def test_drain_timeout_cancels_unfinished_jobs(fake_client, make_async_generator, tmp_path):
+    fake_client.delay = 5
+    generator = make_async_generator()
+
+    async def main():
+        server, port = await started(generator, tmp_path, concurrency=1)
+        _, _, job = await request(port, "POST", "/jobs", PROJECT)
+        await asyncio.sleep(0.05)
+        assert server.jobs[job["job_id"]].status == RUNNING
+        started_at = asyncio.get_running_loop().time()
+        await server.drain(timeout=0.1)
+        return server.jobs[job["job_id"]], asyncio.get_running_loop().time() - started_at
+
+    job, elapsed = asyncio.run(main())
+
+    assert elapsed < 2
+    assert job.status == CANCELLED
+    assert "server shutting down" in job.error
@@ -0,0 +1,123 @@
+"""Tests for single_flight coalescing through generators on a fake API client"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cancellation import CancellationToken
+from single_flight import SingleFlight
+
+
+def generate_together(generator, tokens, **request):
+    """Call generate() from one thread per token, all at once"""
+    request.setdefault("model", "gpt-image-1")
+    with ThreadPoolExecutor(len(tokens)) as pool:
+        futures = [
+            pool.submit(generator.generate, "Spring sale", cancel_token=token, **request)
+            for token in tokens
+        ]
+        return [future.result() for future in futures]
+
+
+def test_token_carrying_calls_coalesce(fake_client, make_generator):
+    fake_client.delay = 0.3
+    flights = SingleFlight()
+    generator = make_generator(single_flight=flights)
+
+    outcomes = generate_together(generator, [CancellationToken(), CancellationToken(timeout_seconds=30)])
+
+    assert fake_client.calls_to("gpt-image-1") == 1
+    assert all(results[0].success for results in outcomes)
+    assert [results[0].metadata.get("coalesced") for results in outcomes].count(True) == 1
+    # Each caller owns its own file
+    paths = [results[0].image_path for results in outcomes]
+    assert len(set(paths)) == 2 and all(Path(path).exists() for path in paths)
+    assert flights.stats()["coalesced"] == 1
+
+
+def test_cancelled_follower_leaves_the_call_running(fake_client, make_generator):
+    fake_client.delay = 0.4
+    generator = make_generator(single_flight=SingleFlight())
+    follower_token = CancellationToken()
+    threading.Timer(0.1, follower_token.cancel, args=("client went away",)).start()
+
+    leader, follower = generate_together(generator, [CancellationToken(), follower_token])
+
+    assert leader[0].success
+    assert follower[0].metadata.get("cancelled")
+    assert "client went away" in follower[0].error_message
+    assert fake_client.calls_to("gpt-image-1") == 1
+
+
+def test_call_is_cancelled_when_every_caller_leaves(fake_client, make_generator):
+    fake_client.delay = 0.5
+    flights = SingleFlight()
+    generator = make_generator(single_flight=flights)
+    tokens = [CancellationToken(timeout_seconds=0.1), CancellationToken(timeout_seconds=0.1)]
+
+    started = time.monotonic()
+    outcomes = generate_together(generator, tokens)
+
+    assert time.monotonic() - started < 0.4
+    assert all(results[0].metadata.get("cancelled") for results in outcomes)
+    assert flights.in_flight() == 0
+
+    # A later caller starts a fresh call instead of joining the cancelled one
+    results = generator.generate("Spring sale", model="gpt-image-1")
+    assert results[0].success
+    assert fake_client.calls_to("gpt-image-1") == 2
+
+
+def test_async_token_carrying_calls_coalesce(fake_client, make_async_generator):
+    fake_client.delay = 0.2
+    generator = make_async_generator(single_flight=SingleFlight())
+
+    async def main():
+        return await asyncio.gather(*(
+            generator.generate("Spring sale", model="gpt-image-1", cancel_token=CancellationToken())
+            for _ in range(3)
+        ))
+
+    outcomes = asyncio.run(main())
+
+    assert fake_client.calls_to("gpt-image-1") == 1
+    assert all(results[0].success for results in outcomes)
+
+
+def test_async_followers_survive_a_cancelled_leader(fake_client, make_async_generator):
+    fake_client.delay = 0.3
+    generator = make_async_generator(single_flight=SingleFlight())
+
+    async def main():
+        leader = asyncio.create_task(generator.generate("Spring sale", model="gpt-image-1"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(generator.generate("Spring sale", model="gpt-image-1"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(main())
+
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower[0].success
+    assert fake_client.calls_to("gpt-image-1") == 1
+
+
+def test_async_follower_leads_again_if_the_shared_call_is_cancelled(fake_client, make_async_generator):
+    fake_client.delay = 0.3
+    flights = SingleFlight()
+    generator = make_async_generator(single_flight=flights)
+
+    async def main():
+        follower = asyncio.create_task(generator.generate("Spring sale", model="gpt-image-1"))
+        await asyncio.sleep(0.05)
+        # Cancel the shared task itself (e.g. loop shutdown), not any caller
+        for flight in list(flights._async_calls.values()):
+            flight.outcome.cancel()
+        return await follower
+
+    results = asyncio.run(main())
+
+    assert results[0].success
+    assert flights.stats()["calls"] == 2
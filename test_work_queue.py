@@ -0,0 +1,77 @@
+"""Tests for SQLiteWorkQueue redelivery, dead-lettering and redrive"""
+import time
+
+from work_queue import SQLiteWorkQueue, QUEUED, DUPLICATE, DEAD_LETTERED
+
+
+def make_queue(tmp_path, **kwargs) -> SQLiteWorkQueue:
+    return SQLiteWorkQueue(str(tmp_path / "queue.db"), **kwargs)
+
+
+def test_enqueue_is_idempotent_per_message_id(tmp_path):
+    queue = make_queue(tmp_path)
+
+    assert queue.enqueue({"n": 1}, message_id="spring") == QUEUED
+    assert queue.enqueue({"n": 2}, message_id="spring") == DUPLICATE
+    assert queue.receive().body == {"n": 1}
+
+
+def test_unacked_message_is_redelivered_after_the_visibility_timeout(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.1)
+    queue.enqueue({"n": 1}, message_id="spring")
+
+    first = queue.receive()
+    assert queue.receive() is None
+    time.sleep(0.15)
+    second = queue.receive()
+
+    assert second.message_id == "spring" and second.attempts == 2
+    # The first lease is stale: its ack is ignored
+    assert not queue.ack(first)
+    assert queue.ack(second)
+    assert queue.stats() == {"ready": 0, "in_flight": 0, "delayed": 0, "dead": 0}
+
+
+def test_nack_retries_after_the_delay(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue({"n": 1})
+
+    assert queue.nack(queue.receive(), "HTTP 503", delay=0.1)
+    assert queue.receive() is None
+    assert queue.stats()["delayed"] == 1
+    time.sleep(0.15)
+    assert queue.receive().attempts == 2
+
+
+def test_nack_on_the_last_attempt_dead_letters(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.enqueue({"n": 1}, message_id="spring")
+
+    queue.nack(queue.receive(), "HTTP 503")
+    queue.nack(queue.receive(), "HTTP 500")
+
+    assert queue.receive() is None
+    [dead] = queue.dead_letters()
+    assert dead["message_id"] == "spring" and dead["attempts"] == 2 and dead["error"] == "HTTP 500"
+    assert queue.enqueue({"n": 1}, message_id="spring") == DEAD_LETTERED
+
+
+def test_expired_last_lease_is_dead_lettered(tmp_path):
+    queue = make_queue(tmp_path, visibility_timeout=0.1, max_attempts=1)
+    queue.enqueue({"n": 1}, message_id="spring")
+    queue.receive()
+    time.sleep(0.15)
+
+    assert queue.receive() is None
+    assert "Visibility timeout expired" in queue.dead_letters()[0]["error"]
+
+
+def test_redrive_requeues_with_fresh_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    queue.enqueue({"n": 1}, message_id="spring")
+    queue.reject(queue.receive(), "Invalid project")
+
+    assert queue.redrive() == 1
+    assert queue.dead_letters() == []
+    message = queue.receive()
+    assert message.message_id == "spring" and message.attempts == 1
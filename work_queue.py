@@ -0,0 +1,379 @@
+"""
+Work Queue
+
+A durable queue of flyer jobs that several worker processes can consume
+(see worker.py). Messages are leased rather than removed: a received
+message is invisible to other workers for a visibility timeout and is
+deleted only when the worker acknowledges it. If the worker dies the
+message reappears once the timeout passes; after max_attempts receives
+it is moved to a dead-letter table for inspection and redrive.
+
+SQLiteWorkQueue needs no external service: by default the database runs
+in WAL mode, which suits processes on one host. WAL relies on shared
+memory, so for hosts sharing a network volume pass wal=False (rollback
+journal, coarser locking).
+
+Usage:
+    from work_queue import SQLiteWorkQueue
+
+    queue = SQLiteWorkQueue("./flyer_queue.db")
+    queue.enqueue({"project": project_to_dict(project)}, message_id="spring-sale")
+
+    message = queue.receive()
+    if message:
+        ...
+        queue.ack(message)          # or queue.nack(message, "error text")
+"""
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List
+
+
+DEFAULT_QUEUE_PATH = "./flyer_queue.db"
+DEFAULT_QUEUE_NAME = "flyers"
+
+# Long enough for one generation (with retries); workers give up on an
+# item before its message would become visible again
+DEFAULT_VISIBILITY_TIMEOUT = 900.0
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+# What enqueue() did with a message
+QUEUED = "queued"
+DUPLICATE = "duplicate"           # already queued under that message_id
+DEAD_LETTERED = "dead_lettered"   # dead-lettered under that id; redrive it instead
+
+
+@dataclass
+class QueueMessage:
+    """A received message; receipt identifies this lease of it"""
+    message_id: str
+    body: Dict[str, Any]
+    attempts: int
+    receipt: str
+    visible_at: float
+
+
+class WorkQueue(abc.ABC):
+    """
+    Interface for work queue backends.
+
+    receive() leases the oldest visible message for visibility_timeout
+    seconds. ack() deletes it, nack() makes it visible again (or
+    dead-letters it once it has used max_attempts), release() hands it
+    back without using up the attempt, reject() dead-letters it at once
+    (it can never succeed), and extend() pushes the lease out for
+    long-running work. Calls with a stale receipt are ignored and
+    return False.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, body: Dict[str, Any], message_id: Optional[str] = None,
+                delay: float = 0.0) -> str:
+        """Add a message; QUEUED, or DUPLICATE / DEAD_LETTERED if message_id is taken"""
+
+    @abc.abstractmethod
+    def receive(self, visibility_timeout: Optional[float] = None) -> Optional[QueueMessage]:
+        """Lease the oldest visible message, or None if there is none"""
+
+    @abc.abstractmethod
+    def ack(self, message: QueueMessage) -> bool:
+        """Delete a finished message"""
+
+    @abc.abstractmethod
+    def nack(self, message: QueueMessage, error: str, delay: float = 0.0) -> bool:
+        """Make a failed message visible again after delay (or dead-letter it)"""
+
+    @abc.abstractmethod
+    def release(self, message: QueueMessage) -> bool:
+        """Hand a message back without using up the attempt"""
+
+    @abc.abstractmethod
+    def reject(self, message: QueueMessage, error: str) -> bool:
+        """Dead-letter a message that can never succeed"""
+
+    @abc.abstractmethod
+    def extend(self, message: QueueMessage, seconds: float) -> bool:
+        """Push the lease out by seconds"""
+
+    @abc.abstractmethod
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recently dead-lettered messages, with their last error"""
+
+    @abc.abstractmethod
+    def redrive(self, message_ids: Optional[List[str]] = None) -> int:
+        """Move dead letters (all, or message_ids) back onto the queue"""
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Message counts: ready, in_flight, delayed, dead"""
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    Work queue in a SQLite file, shared by every process that opens it.
+
+    Receives run in BEGIN IMMEDIATE transactions, so no two workers lease
+    the same message. Wall-clock time is used since monotonic clocks
+    aren't comparable across processes.
+
+    Args:
+        path: Database file
+        queue: Queue name (several queues can share a file)
+        visibility_timeout: Default lease length in seconds
+        max_attempts: Receives before a message is dead-lettered
+        wal: Use WAL journaling (one host); False for network volumes
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_QUEUE_PATH,
+        queue: str = DEFAULT_QUEUE_NAME,
+        visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        wal: bool = True
+    ):
+        self.path = path
+        self.queue = queue
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.wal = wal
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " queue TEXT NOT NULL, id TEXT NOT NULL, body TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, visible_at REAL NOT NULL,"
+            " receipt TEXT, enqueued_at REAL NOT NULL, last_error TEXT,"
+            " PRIMARY KEY (queue, id))"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS messages_visible ON messages (queue, visible_at, enqueued_at)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letters ("
+            " queue TEXT NOT NULL, id TEXT NOT NULL, body TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL, error TEXT, failed_at REAL NOT NULL,"
+            " PRIMARY KEY (queue, id))"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            if self.wal:
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, body: Dict[str, Any], message_id: Optional[str] = None,
+                delay: float = 0.0) -> str:
+        """
+        Add a message. With a message_id, a message already queued or
+        dead-lettered under that id is left as is.
+
+        Returns:
+            QUEUED, DUPLICATE (already queued) or DEAD_LETTERED
+        """
+        conn = self._connect()
+        message_id = message_id or uuid.uuid4().hex
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            dead = conn.execute(
+                "SELECT 1 FROM dead_letters WHERE queue = ? AND id = ?", (self.queue, message_id)
+            ).fetchone()
+            outcome = DEAD_LETTERED
+            if not dead:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO messages (queue, id, body, visible_at, enqueued_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (self.queue, message_id, json.dumps(body, ensure_ascii=False), now + delay, now)
+                )
+                outcome = QUEUED if cursor.rowcount == 1 else DUPLICATE
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return outcome
+
+    def receive(self, visibility_timeout: Optional[float] = None) -> Optional[QueueMessage]:
+        """Lease the oldest visible message, or return None if there is none"""
+        conn = self._connect()
+        timeout = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            message = None
+            while message is None:
+                row = conn.execute(
+                    "SELECT id, body, attempts FROM messages WHERE queue = ? AND visible_at <= ?"
+                    " ORDER BY visible_at, enqueued_at LIMIT 1",
+                    (self.queue, now)
+                ).fetchone()
+                if row is None:
+                    break
+                message_id, body, attempts = row
+                if attempts >= self.max_attempts:
+                    # Its last lease expired without an ack (the worker died)
+                    self._dead_letter(conn, message_id, "Visibility timeout expired on the last attempt", now)
+                    continue
+                message = QueueMessage(
+                    message_id=message_id,
+                    body=json.loads(body),
+                    attempts=attempts + 1,
+                    receipt=uuid.uuid4().hex,
+                    visible_at=now + timeout
+                )
+                conn.execute(
+                    "UPDATE messages SET attempts = ?, receipt = ?, visible_at = ?"
+                    " WHERE queue = ? AND id = ?",
+                    (message.attempts, message.receipt, message.visible_at, self.queue, message_id)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return message
+
+    def ack(self, message: QueueMessage) -> bool:
+        """Delete a finished message"""
+        cursor = self._connect().execute(
+            "DELETE FROM messages WHERE queue = ? AND id = ? AND receipt = ?",
+            (self.queue, message.message_id, message.receipt)
+        )
+        return cursor.rowcount == 1
+
+    def nack(self, message: QueueMessage, error: str, delay: float = 0.0) -> bool:
+        """Record a failed attempt: retry after delay, or dead-letter if out of attempts"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            held = conn.execute(
+                "SELECT 1 FROM messages WHERE queue = ? AND id = ? AND receipt = ?",
+                (self.queue, message.message_id, message.receipt)
+            ).fetchone()
+            if held and message.attempts >= self.max_attempts:
+                self._dead_letter(conn, message.message_id, error, now)
+            elif held:
+                conn.execute(
+                    "UPDATE messages SET receipt = NULL, visible_at = ?, last_error = ?"
+                    " WHERE queue = ? AND id = ?",
+                    (now + delay, error, self.queue, message.message_id)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return bool(held)
+
+    def release(self, message: QueueMessage) -> bool:
+        """Make a message visible again without using up the attempt"""
+        cursor = self._connect().execute(
+            "UPDATE messages SET receipt = NULL, visible_at = ?, attempts = attempts - 1"
+            " WHERE queue = ? AND id = ? AND receipt = ?",
+            (time.time(), self.queue, message.message_id, message.receipt)
+        )
+        return cursor.rowcount == 1
+
+    def reject(self, message: QueueMessage, error: str) -> bool:
+        """Dead-letter a message straight away (e.g. its body is invalid)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            held = conn.execute(
+                "SELECT 1 FROM messages WHERE queue = ? AND id = ? AND receipt = ?",
+                (self.queue, message.message_id, message.receipt)
+            ).fetchone()
+            if held:
+                self._dead_letter(conn, message.message_id, error, time.time())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return bool(held)
+
+    def extend(self, message: QueueMessage, seconds: float) -> bool:
+        """Keep a message invisible for another `seconds` from now"""
+        visible_at = time.time() + seconds
+        cursor = self._connect().execute(
+            "UPDATE messages SET visible_at = ? WHERE queue = ? AND id = ? AND receipt = ?",
+            (visible_at, self.queue, message.message_id, message.receipt)
+        )
+        if cursor.rowcount == 1:
+            message.visible_at = visible_at
+            return True
+        return False
+
+    def _dead_letter(self, conn: sqlite3.Connection, message_id: str, error: str, now: float):
+        conn.execute(
+            "INSERT OR REPLACE INTO dead_letters (queue, id, body, attempts, error, failed_at)"
+            " SELECT queue, id, body, attempts, ?, ? FROM messages WHERE queue = ? AND id = ?",
+            (error, now, self.queue, message_id)
+        )
+        conn.execute("DELETE FROM messages WHERE queue = ? AND id = ?", (self.queue, message_id))
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recently dead-lettered messages"""
+        rows = self._connect().execute(
+            "SELECT id, body, attempts, error, failed_at FROM dead_letters WHERE queue = ?"
+            " ORDER BY failed_at DESC LIMIT ?",
+            (self.queue, limit)
+        ).fetchall()
+        return [
+            {"message_id": message_id, "body": json.loads(body), "attempts": attempts,
+             "error": error, "failed_at": failed_at}
+            for message_id, body, attempts, error, failed_at in rows
+        ]
+
+    def redrive(self, message_ids: Optional[List[str]] = None) -> int:
+        """Move dead letters (all, or the given ids) back onto the queue with fresh attempts"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if message_ids is None:
+                message_ids = [row[0] for row in conn.execute(
+                    "SELECT id FROM dead_letters WHERE queue = ?", (self.queue,)
+                )]
+            moved = 0
+            for message_id in message_ids:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO messages (queue, id, body, visible_at, enqueued_at)"
+                    " SELECT queue, id, body, ?, ? FROM dead_letters WHERE queue = ? AND id = ?",
+                    (now, now, self.queue, message_id)
+                )
+                conn.execute(
+                    "DELETE FROM dead_letters WHERE queue = ? AND id = ?", (self.queue, message_id)
+                )
+                moved += cursor.rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return moved
+
+    def stats(self) -> Dict[str, int]:
+        """Message counts: ready, in_flight (leased), delayed (waiting to retry) and dead"""
+        conn = self._connect()
+        (ready, in_flight, delayed) = conn.execute(
+            "SELECT COALESCE(SUM(visible_at <= :now), 0),"
+            " COALESCE(SUM(visible_at > :now AND receipt IS NOT NULL), 0),"
+            " COALESCE(SUM(visible_at > :now AND receipt IS NULL), 0)"
+            " FROM messages WHERE queue = :queue",
+            {"now": time.time(), "queue": self.queue}
+        ).fetchone()
+        (dead,) = conn.execute(
+            "SELECT COUNT(*) FROM dead_letters WHERE queue = ?", (self.queue,)
+        ).fetchone()
+        return {"ready": ready, "in_flight": in_flight, "delayed": delayed, "dead": dead}
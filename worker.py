@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Flyer Worker
+
+Consumes the work queue (work_queue.py): each message is one FlyerProject
+to build a prompt for, generate and QR-composite, exactly as batch.py
+does for a manifest. Start as many worker processes as the provider
+limits allow; they share the queue file and never take the same message.
+
+A message is acknowledged once its flyer is saved. Failures are retried
+with a growing delay and dead-lettered after --max-attempts; if a worker
+dies its messages reappear after the visibility timeout. Ctrl+C (or
+SIGTERM) stops taking new work and lets in-flight items finish; a second
+Ctrl+C cancels them and returns their messages to the queue.
+
+Usage:
+    python worker.py enqueue manifest.jsonl       # queue a batch.py-style manifest
+    python worker.py run --concurrency 4          # work until stopped
+    python worker.py run --exit-when-empty --mock
+    python worker.py stats
+    python worker.py dead                         # list dead letters
+    python worker.py dead --redrive               # queue them again
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from models import project_to_dict, project_from_dict
+from image_generator import create_generator
+from generation_cache import GenerationCache, DEFAULT_CACHE_DIR
+from cancellation import CancellationToken
+from job_store import job_id
+from batch import BatchItem, BatchStats, read_manifest, process_item, DEFAULT_OUTPUT_DIR
+from work_queue import (
+    WorkQueue, QueueMessage, SQLiteWorkQueue, QUEUED, DUPLICATE, DEAD_LETTERED,
+    DEFAULT_QUEUE_PATH, DEFAULT_QUEUE_NAME, DEFAULT_VISIBILITY_TIMEOUT, DEFAULT_MAX_ATTEMPTS
+)
+
+
+DEFAULT_WORKER_OUTPUT = "worker_results.jsonl"
+DEFAULT_POLL_SECONDS = 2.0
+
+# Base delay before a failed message is retried (times the attempt number)
+DEFAULT_RETRY_DELAY = 30.0
+
+# Items must finish within this share of the visibility timeout, so a
+# message never reappears while its worker is still on it
+DEADLINE_SHARE = 0.9
+
+
+def enqueue_manifest(queue: WorkQueue, manifest_path: str) -> Dict[str, int]:
+    """
+    Queue every valid project in a manifest. Message ids are job IDs, so
+    a project already waiting in the queue isn't queued twice.
+
+    Returns:
+        Counts of queued, duplicate (already queued), dead_lettered
+        (needs a redrive) and invalid lines
+    """
+    counts = {QUEUED: 0, DUPLICATE: 0, DEAD_LETTERED: 0, "invalid": 0}
+    for item in read_manifest(manifest_path):
+        if item.project is None:
+            print(f"⚠️  Warning: line {item.line_number}: {item.error}")
+            counts["invalid"] += 1
+            continue
+        body = {"id": item.item_id, "line": item.line_number, "project": project_to_dict(item.project)}
+        counts[queue.enqueue(body, message_id=job_id(item.project))] += 1
+    return counts
+
+
+def handle_message(
+    queue: WorkQueue,
+    generator,
+    message: QueueMessage,
+    output_dir: Path,
+    apply_qr: bool = True,
+    cancel_token: Optional[CancellationToken] = None,
+    retry_delay: float = DEFAULT_RETRY_DELAY
+) -> Optional[Dict[str, Any]]:
+    """
+    Process one message and ack / nack / release it.
+
+    Returns:
+        The item's result record (None if the message was handed back
+        because the worker is shutting down)
+    """
+    body = message.body
+    try:
+        project = project_from_dict(body.get("project"))
+    except ValueError as e:
+        queue.reject(message, f"Invalid project: {e}")
+        return {"id": body.get("id"), "message_id": message.message_id, "success": False,
+                "image_paths": [], "error": f"Invalid project: {e}"}
+
+    item = BatchItem(str(body.get("id") or message.message_id), body.get("line", 0), project=project)
+    visibility = message.visible_at - time.time()
+    token = CancellationToken(timeout_seconds=max(visibility * DEADLINE_SHARE, 1.0), parent=cancel_token)
+    try:
+        record = process_item(generator, item, output_dir, apply_qr, token)
+    except Exception as e:
+        record = {"id": item.item_id, "line": item.line_number, "success": False,
+                  "image_paths": [], "error": f"{type(e).__name__}: {e}"}
+    record["message_id"], record["attempt"] = message.message_id, message.attempts
+
+    if record["success"]:
+        queue.ack(message)
+    elif cancel_token is not None and cancel_token.cancelled:
+        queue.release(message)
+        return None
+    else:
+        queue.nack(message, record["error"] or "failed", delay=retry_delay * message.attempts)
+    return record
+
+
+def run_worker(
+    queue: WorkQueue,
+    generator,
+    output_path: str = DEFAULT_WORKER_OUTPUT,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    concurrency: int = 1,
+    apply_qr: bool = True,
+    poll_interval: float = DEFAULT_POLL_SECONDS,
+    retry_delay: float = DEFAULT_RETRY_DELAY,
+    exit_when_empty: bool = False,
+    stop_event: Optional[threading.Event] = None,
+    cancel_token: Optional[CancellationToken] = None
+) -> BatchStats:
+    """
+    Work the queue with concurrency threads until stop_event is set (or,
+    with exit_when_empty, the queue has nothing visible).
+
+    Args:
+        queue: Queue to consume
+        generator: Generator shared by the threads
+        output_path: JSONL results file, appended to (one line per item)
+        output_dir: Directory for finished flyers
+        concurrency: Items processed at once in this process
+        apply_qr: Composite QR codes for projects that enable them
+        poll_interval: Sleep between receives while the queue is empty
+        retry_delay: Failed items are retried after retry_delay * attempt
+        exit_when_empty: Return once no message is visible
+        stop_event: Set to stop taking new messages (in-flight items finish)
+        cancel_token: Cancel to abort in-flight items too (their messages
+            are released back to the queue)
+
+    Returns:
+        BatchStats for this worker
+    """
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stop_event = stop_event or threading.Event()
+    cancel_token = cancel_token or CancellationToken()
+    stats = BatchStats(started_at=time.monotonic())
+    lock = threading.Lock()
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+
+    def loop():
+        while not stop_event.is_set() and not cancel_token.cancelled:
+            message = queue.receive()
+            if message is None:
+                if exit_when_empty:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            record = handle_message(
+                queue, generator, message, out_dir, apply_qr, cancel_token, retry_delay
+            )
+            if record is None:
+                continue
+            record["worker"] = worker_name
+            record["completed_at"] = time.time()
+            with lock:
+                # One write per line, so lines from other processes don't interleave
+                with open(output_path, "a", encoding="utf-8") as out:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                stats.record(record)
+                status = "✅" if record["success"] else "❌"
+                print(f"   {status} {record['id']} (attempt {record['attempt']}) - {stats.summary()}")
+
+    threads = [
+        threading.Thread(target=loop, name=f"flyer-worker-{i}")
+        for i in range(max(1, concurrency))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flyer work queue: enqueue manifests and run workers")
+    parser.add_argument("--queue-db", default=DEFAULT_QUEUE_PATH, metavar="PATH",
+                        help=f"Queue database (default: {DEFAULT_QUEUE_PATH})")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_NAME, metavar="NAME",
+                        help=f"Queue name (default: {DEFAULT_QUEUE_NAME})")
+    parser.add_argument("--visibility-timeout", type=float, default=DEFAULT_VISIBILITY_TIMEOUT,
+                        metavar="SECONDS",
+                        help=f"How long a received message stays hidden (default: {DEFAULT_VISIBILITY_TIMEOUT:.0f})")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"Attempts before a message is dead-lettered (default: {DEFAULT_MAX_ATTEMPTS})")
+    parser.add_argument("--shared-volume", action="store_true",
+                        help="Queue file is on a network volume shared by hosts (disables WAL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue every project in a JSONL manifest")
+    enqueue.add_argument("manifest", help="JSONL file, one project per line (see batch.py)")
+
+    run = commands.add_parser("run", help="Process queued projects")
+    run.add_argument("--concurrency", type=int, default=1,
+                     help="Items processed at once by this worker (default: 1)")
+    run.add_argument("--output", default=DEFAULT_WORKER_OUTPUT, metavar="PATH",
+                     help=f"JSONL results file, appended to (default: {DEFAULT_WORKER_OUTPUT})")
+    run.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, metavar="DIR",
+                     help=f"Directory for finished flyers (default: {DEFAULT_OUTPUT_DIR})")
+    run.add_argument("--no-qr", action="store_true",
+                     help="Skip QR compositing even for projects that enable it")
+    run.add_argument("--retry-delay", type=float, default=DEFAULT_RETRY_DELAY, metavar="SECONDS",
+                     help=f"Failed items wait this times their attempt number (default: {DEFAULT_RETRY_DELAY:.0f})")
+    run.add_argument("--exit-when-empty", action="store_true",
+                     help="Stop once the queue has nothing ready instead of waiting for more")
+    run.add_argument("--mock", action="store_true",
+                     help="Use mock generator (no API key needed)")
+    run.add_argument("--openrouter", action="store_true",
+                     help="Use OpenRouter API instead of OpenAI directly")
+    run.add_argument("--cache", nargs="?", const=DEFAULT_CACHE_DIR, metavar="DIR",
+                     help=f"Reuse results for identical requests (default dir: {DEFAULT_CACHE_DIR})")
+
+    commands.add_parser("stats", help="Show queue depth")
+
+    dead = commands.add_parser("dead", help="List dead-lettered messages")
+    dead.add_argument("--redrive", action="store_true", help="Move them back onto the queue")
+
+    args = parser.parse_args()
+    queue = SQLiteWorkQueue(
+        args.queue_db,
+        queue=args.queue,
+        visibility_timeout=args.visibility_timeout,
+        max_attempts=args.max_attempts,
+        wal=not args.shared_volume
+    )
+
+    if args.command == "enqueue":
+        counts = enqueue_manifest(queue, args.manifest)
+        print(f"📥 Queued {counts[QUEUED]}, already queued {counts[DUPLICATE]}, "
+              f"dead-lettered {counts[DEAD_LETTERED]}, invalid {counts['invalid']}")
+        if counts[DEAD_LETTERED]:
+            print("⚠️  Warning: dead-lettered projects were not requeued; use 'worker.py dead --redrive'")
+    elif args.command == "stats":
+        print(json.dumps(queue.stats()))
+    elif args.command == "dead":
+        if args.redrive:
+            print(f"🔁 Requeued {queue.redrive()} message(s)")
+        else:
+            for letter in queue.dead_letters():
+                print(f"   {letter['message_id']} ({letter['body'].get('id')}): "
+                      f"{letter['attempts']} attempt(s) - {letter['error']}")
+    else:
+        generator = create_generator(
+            mock=args.mock,
+            use_openrouter=args.openrouter,
+            max_concurrency=max(1, args.concurrency),
+            cache=GenerationCache(args.cache) if args.cache else None
+        )
+        stop_event = threading.Event()
+        token = CancellationToken()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+        print(f"\n🛠️  Worker {socket.gethostname()}:{os.getpid()} on {args.queue_db} "
+              f"({args.concurrency} at a time)")
+
+        stats_box = []
+        runner = threading.Thread(
+            target=lambda: stats_box.append(run_worker(
+                queue, generator,
+                output_path=args.output,
+                output_dir=args.output_dir,
+                concurrency=args.concurrency,
+                apply_qr=not args.no_qr,
+                retry_delay=args.retry_delay,
+                exit_when_empty=args.exit_when_empty,
+                stop_event=stop_event,
+                cancel_token=token
+            )),
+            name="flyer-worker"
+        )
+        runner.start()
+        while runner.is_alive():
+            try:
+                runner.join(0.5)
+            except KeyboardInterrupt:
+                if not stop_event.is_set():
+                    print("\n⏸️  Finishing in-flight items (Ctrl+C again to cancel them)...")
+                    stop_event.set()
+                else:
+                    print("\n⏹️  Cancelling in-flight items...")
+                    token.cancel("worker stopped")
+        if stats_box:
+            print(f"\n✅ {stats_box[0].summary()}")
+
+
+if __name__ == "__main__":
+    main()